@@ -0,0 +1,83 @@
+"""Auth overhead of authenticated page views with database sessions and a plain ModelBackend ("before")
+against cached_db sessions and main.backends.CachedModelBackend ("after"). Each mode runs in its own
+process against the same seeded database, logging in once and then loading pages.
+
+    python benchmarks/auth_cache.py --requests 300
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from common import setup_django
+
+PATHS = ['/', '/api/analytics/'] # Dashboard is served from its cache, the analytics API reads rollups
+AUTH_TABLES = ('django_session', 'auth_user')
+
+
+def child(args):
+    setup_django(args.db)
+    from django.conf import settings
+    if args.mode == 'before':
+        settings.SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+        settings.AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from common import summarize
+
+    client = Client()
+    response = client.post('/login/', {'username': 'bench', 'password': 'bench-pass-123'})
+    assert response.status_code == 302, response.status_code
+    for path in PATHS: # Warm the page caches, so the difference left is the auth work
+        client.get(path)
+
+    samples, queries, auth_queries = [], 0, 0
+    for i in range(args.requests):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = client.get(PATHS[i % len(PATHS)])
+            samples.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+        queries += len(ctx)
+        auth_queries += sum(any(table in query['sql'] for table in AUTH_TABLES) for query in ctx.captured_queries)
+    result = summarize(samples)
+    result['queries_per_request'] = round(queries / args.requests, 2)
+    result['auth_queries_per_request'] = round(auth_queries / args.requests, 2)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--mode', choices=['before', 'after'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return child(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / 'bench.sqlite3'
+        setup_django(db)
+        from common import migrate, seed_user
+        migrate()
+        seed_user()
+
+        report = {}
+        for mode in ('before', 'after'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--db', str(db), '--requests', str(args.requests)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+    report['saved_queries_per_request'] = round(
+        report['before']['queries_per_request'] - report['after']['queries_per_request'], 2
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
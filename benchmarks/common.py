@@ -0,0 +1,60 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Run the scripts from the repository root, e.g. ``python benchmarks/wsgi_vs_asgi.py``.
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def setup_django(db_path=None, **env):
+    # Configure Django against a file-backed SQLite database, env entries become environment variables
+    if db_path:
+        env['SQLITE_PATH'] = db_path
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'life_tracker.settings')
+    import django
+    from django.conf import settings
+    django.setup()
+    settings.ALLOWED_HOSTS.append('testserver') # Host used by the Django test clients
+
+
+def migrate():
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def seed_user(username='bench', expenses=2000, todos=300, reminders=300, schedule=300, rules=0, seed=1):
+    # One user with realistic row counts spread over the last ~90 days (see main/seeding.py)
+    from django.contrib.auth.models import User
+    from main.rollups import rebuild_rollups
+    from main.seeding import seed_rows
+
+    user = User.objects.create_user(username, password='bench-pass-123')
+    seed_rows([user], expenses=expenses, todos=todos, reminders=reminders, schedule=schedule, rules=rules, seed=seed)
+    rebuild_rollups(user) # bulk_create skips the rollup signals
+    return user
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    # Latency summary in milliseconds
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0,
+    }
@@ -0,0 +1,310 @@
+"""Latency (p50/p95/p99), queries per request and peak Python memory for every route in main/urls.py,
+driven through the Django test client at several data scales. Each scale gets a fresh SQLite database
+seeded by main/seeding.py (the same code as ``manage.py seed_load_data``) with the per-user volumes
+multiplied by the scale factor. Results are written as JSON so runs from different commits can be diffed.
+
+    python benchmarks/routes.py --scales 0.1 1 4 --requests 30
+    python benchmarks/routes.py --compare benchmarks/results/routes-abc1234.json benchmarks/results/routes-def5678.json
+
+The dashboard/planner cache is disabled unless --warm-cache is given, so repeated requests measure the
+queries rather than cache hits. Routes that write are given a fresh target per request (created outside
+the timed section). events/ answers 204 under the test client's WSGI handler, streams are not timed here.
+A route that raises is reported as failed while the others are still measured, and the run exits non-zero.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from common import ROOT, migrate, setup_django, summarize
+
+BASE_VOLUMES = {'expenses': 2000, 'todos': 300, 'reminders': 300, 'schedule': 300, 'rules': 10}
+AUTH_ROUTES = {'login', 'logout'} # Change the session, the client logs back in after each
+IMPORT_ROWS = 50
+
+
+def build_cases(user):
+    # Route name -> callable returning (method, path, data) for one request, any setup runs before the timer starts
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.utils import timezone
+    from main.models import Expense, MonthlyBudget, Notification, Reminder, ScheduleItem, ScheduleRule, Todo
+    from main.seeding import DEFAULT_PASSWORD
+
+    now = timezone.now()
+    today = timezone.localdate()
+    day = today.isoformat()
+    counter = itertools.count()
+    MonthlyBudget.objects.get_or_create(user=user, year=today.year, month=today.month)
+    todo = Todo.objects.create(user=user, title='Bench todo')
+    reminder = Reminder.objects.create(user=user, title='Bench reminder', due_date=now + datetime.timedelta(days=1))
+    notification = Notification.objects.create(user=user, title='Bench reminder', due_date=now)
+    rule = ScheduleRule.objects.create(user=user, title='Bench routine', start_time=datetime.time(7),
+                                       end_time=datetime.time(7, 30), start_date=today)
+    csv = 'title,amount,category,date\n' + ''.join(f'Imported {i},{i + 1}.50,FOOD,{day}\n' for i in range(IMPORT_ROWS))
+
+    def fresh(model, **fields):
+        return model.objects.create(user=user, **fields).pk
+
+    def fresh_rule():
+        return fresh(ScheduleRule, title='Bench series', start_time=datetime.time(8), end_time=datetime.time(9),
+                     start_date=today)
+
+    def bulk_ids():
+        return [str(fresh(Todo, title=f'Bulk {i}')) for i in range(10)]
+
+    return {
+        'register': lambda: ('post', '/register/', {
+            'first_name': 'Bench', 'username': f'bench-register-{next(counter)}',
+            'password1': 'Bench-pass-12345', 'password2': 'Bench-pass-12345',
+        }),
+        'login': lambda: ('post', '/login/', {'username': user.username, 'password': DEFAULT_PASSWORD}),
+        'logout': lambda: ('get', '/logout/', None),
+        'dashboard': lambda: ('get', '/', None),
+        'expenses': lambda: ('get', '/expenses/', None),
+        'analytics': lambda: ('get', '/expenses/analytics/', None),
+        'analytics_api': lambda: ('get', '/api/analytics/', None),
+        'planner': lambda: ('get', '/planner/', None),
+        'planner_page': lambda: ('get', f'/planner/{day}/', None),
+        'planner_week': lambda: ('get', '/planner/week/', None),
+        'planner_week_page': lambda: ('get', f'/planner/week/{day}/', None),
+        'planner_month': lambda: ('get', '/planner/month/', None),
+        'planner_month_page': lambda: ('get', f'/planner/month/{day}/', None),
+        'cache_stats': lambda: ('get', '/cache-stats/', None),
+        'api_dashboard': lambda: ('get', '/api/v1/dashboard/', None),
+        'api_planner': lambda: ('get', '/api/v1/planner/', None),
+        'api_planner_page': lambda: ('get', f'/api/v1/planner/{day}/?fields=title,done', None),
+        'api_expenses': lambda: ('get', '/api/v1/expenses/', None),
+        'api_changes': lambda: ('get', '/api/v1/changes/?limit=200', None),
+        'events': lambda: ('get', '/events/', None),
+        'update_budget': lambda: ('post', '/update-budget/', {
+            'year': today.year, 'month': today.month, 'total_income': 5000, 'savings_goal': next(counter) % 1000,
+        }),
+        'add_expense': lambda: ('post', '/add-expense/', {'title': 'Bench', 'amount': '12.50', 'category': 'FOOD', 'date': day}),
+        'delete_expense': lambda: ('get', f'/delete-expense/{fresh(Expense, title="Bench", amount=1, date=today)}/', None),
+        'import_expenses': lambda: ('post', '/import-expenses/', {'file': SimpleUploadedFile('bench.csv', csv.encode())}),
+        'export_data': lambda: ('get', '/export/', {'format': 'csv'}),
+        'add_schedule_event': lambda: ('post', '/add-schedule/', {
+            'title': 'Bench event', 'start_time': '10:00', 'end_time': '11:00', 'date': day, 'view_date': day,
+        }),
+        'delete_schedule_event': lambda: ('get', f'/delete-schedule/{fresh(ScheduleItem, title="Bench", date=today, start_time=datetime.time(9), end_time=datetime.time(10))}/', None),
+        'skip_occurrence': lambda: ('get', f'/skip-occurrence/{rule.pk}/{today + datetime.timedelta(days=next(counter))}/', None),
+        'delete_schedule_rule': lambda: ('get', f'/delete-schedule-rule/{fresh_rule()}/', None),
+        'schedule_conflicts': lambda: ('get', '/schedule/conflicts/', {'date': day, 'start': '09:00', 'end': '17:00'}),
+        'free_slots': lambda: ('get', '/schedule/free-slots/', {'start': day, 'days': 7, 'from': '08:00', 'to': '18:00'}),
+        'add_todo': lambda: ('post', '/add-todo/', {'title': 'Bench todo', 'view_date': day}),
+        'delete_todo': lambda: ('get', f'/delete-todo/{fresh(Todo, title="Bench")}/', None),
+        'toggle_todo': lambda: ('get', f'/toggle-todo/{todo.pk}/', None),
+        'add_reminder': lambda: ('post', '/add-reminder/', {
+            'title': 'Bench reminder', 'due_date': f'{day}T18:00', 'priority': 'MEDIUM', 'view_date': day,
+        }),
+        'delete_reminder': lambda: ('get', f'/delete-reminder/{fresh(Reminder, title="Bench", due_date=now)}/', None),
+        'toggle_reminder': lambda: ('get', f'/toggle-reminder/{reminder.pk}/', None),
+        'completed_reminders': lambda: ('get', '/reminders/completed/', None),
+        'archive': lambda: ('get', '/archive/', {'q': 'dentist'}),
+        'search': lambda: ('get', '/search/', {'q': 'pay ren', 'format': 'json'}),
+        'read_notification': lambda: ('get', f'/read-notification/{notification.pk}/', None),
+        'bulk_action': lambda: ('post', '/bulk/', {'op': 'complete', 'todo_ids': bulk_ids(), 'format': 'json'}),
+    }
+
+
+def route_names():
+    from main.urls import urlpatterns
+    return [pattern.name for pattern in urlpatterns]
+
+
+def send(client, case):
+    method, path, data = case()
+    start = time.perf_counter()
+    response = getattr(client, method)(path, data)
+    if response.streaming:
+        b''.join(response.streaming_content) # Exports stream, time the whole body
+    return response, time.perf_counter() - start
+
+
+def measure(client, user, name, case, requests, memory_requests):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def request():
+        with CaptureQueriesContext(connection) as queries:
+            response, elapsed = send(client, case)
+        if name in AUTH_ROUTES:
+            client.force_login(user)
+        return response, elapsed, len(queries)
+
+    request() # Warm up (first template render, lazy imports)
+    samples, counts, statuses = [], [], Counter()
+    for _ in range(requests):
+        response, elapsed, count = request()
+        samples.append(elapsed)
+        counts.append(count)
+        statuses[response.status_code] += 1
+
+    peak = 0 # Separate pass, tracemalloc slows every allocation down
+    tracemalloc.start()
+    try:
+        for _ in range(memory_requests):
+            tracemalloc.reset_peak()
+            request()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    method, path, _ = case()
+    return {
+        'method': method.upper(),
+        'path': path,
+        'status': dict(statuses),
+        **summarize(samples),
+        'queries_mean': round(sum(counts) / len(counts), 1),
+        'queries_max': max(counts),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def child(args):
+    setup_django(args.db, DASHBOARD_CACHE_TIMEOUT=3600 if args.warm_cache else 0)
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from main.seeding import seed_users
+
+    migrate()
+    volumes = {key: max(1, round(count * args.scale)) for key, count in BASE_VOLUMES.items()}
+    started = time.perf_counter()
+    seed_users(args.users, prefix='load', **volumes)
+    seeded = time.perf_counter() - started
+
+    user = User.objects.get(username='load0')
+    user.is_staff = True # cache_stats is staff only
+    user.save(update_fields=['is_staff'])
+    client = Client()
+    client.force_login(user)
+    cases = build_cases(user)
+
+    routes, missing, failed = {}, [], {}
+    for name in route_names():
+        if name not in cases:
+            missing.append(name)
+            continue
+        try:
+            routes[name] = measure(client, user, name, cases[name], args.requests, args.memory_requests)
+        except Exception as exc: # One broken view is reported, the other routes are still measured
+            failed[name] = f'{type(exc).__name__}: {exc}'
+            client.force_login(user)
+    print(json.dumps({
+        'scale': args.scale, 'users': args.users, 'rows_per_user': volumes, 'seed_seconds': round(seeded, 2),
+        'routes': routes, 'missing_cases': missing, 'failed': failed,
+    }))
+
+
+def git_revision():
+    def git(*command):
+        return subprocess.run(['git', *command], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return git('rev-parse', '--short', 'HEAD') or 'unknown', bool(git('status', '--porcelain', '--untracked-files=no'))
+
+
+def compare(base_path, new, threshold):
+    # Print routes whose p95 grew by more than threshold percent or that issue more queries, returns the count
+    base = json.loads(Path(base_path).read_text())
+    base_scales = {run['scale']: run.get('routes', {}) for run in base['scales']}
+    print(f"{base['commit']} -> {new['commit']}")
+    regressions = 0
+    for run in new['scales']:
+        before_routes = base_scales.get(run['scale'], {})
+        for name, after in run.get('routes', {}).items():
+            before = before_routes.get(name)
+            if not before:
+                continue
+            slower = before['p95_ms'] and (after['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 > threshold
+            more_queries = after['queries_max'] > before['queries_max']
+            if slower or more_queries:
+                regressions += 1
+                print(f"  x{run['scale']:<5} {name:<24} p95 {before['p95_ms']:>8.2f} -> {after['p95_ms']:>8.2f} ms  "
+                      f"queries {before['queries_max']} -> {after['queries_max']}")
+    print(f"{regressions} regression(s) above {threshold}% p95 or in query count")
+    return regressions
+
+
+def print_table(run):
+    print(f"scale x{run['scale']} ({run['users']} users, {run['rows_per_user']} rows each, seeded in {run['seed_seconds']}s)")
+    print(f"  {'route':<24} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'peak KiB':>9}")
+    for name, result in run['routes'].items():
+        print(f"  {name:<24} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['queries_max']:>8} {result['peak_kib']:>9.1f}")
+    for name in run['missing_cases']:
+        print(f"  {name:<24} no benchmark case, add one to build_cases()")
+    for name, error in run.get('failed', {}).items():
+        print(f"  {name:<24} FAILED {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.1, 1, 4],
+                        help="Multipliers for the per-user row counts, one fresh database each.")
+    parser.add_argument('--users', type=int, default=3, help="Seeded users per scale (requests run as the first).")
+    parser.add_argument('--requests', type=int, default=30, help="Timed requests per route.")
+    parser.add_argument('--memory-requests', type=int, default=3, help="Extra requests per route traced for peak memory.")
+    parser.add_argument('--warm-cache', action='store_true', help="Keep the dashboard/planner cache enabled.")
+    parser.add_argument('--output', help="JSON results path (default benchmarks/results/routes-<commit>.json).")
+    parser.add_argument('--compare', nargs='+', metavar='JSON',
+                        help="Baseline results to compare against, optionally followed by the results to check "
+                             "(otherwise a new run is made). Exits non-zero on regressions.")
+    parser.add_argument('--threshold', type=float, default=20, help="Allowed p95 growth in percent for --compare.")
+    parser.add_argument('--scale', type=float, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.scale is not None:
+        return child(args)
+    if args.compare and len(args.compare) > 1:
+        sys.exit(1 if compare(args.compare[0], json.loads(Path(args.compare[1]).read_text()), args.threshold) else 0)
+
+    import django
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit + ('-dirty' if dirty else ''),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'requests': args.requests,
+        'warm_cache': args.warm_cache,
+        'scales': [],
+    }
+    failures = 0
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory() as tmp:
+            process = subprocess.run(
+                [sys.executable, __file__, '--scale', str(scale), '--db', str(Path(tmp) / 'bench.sqlite3'),
+                 '--users', str(args.users), '--requests', str(args.requests),
+                 '--memory-requests', str(args.memory_requests), *(['--warm-cache'] if args.warm_cache else [])],
+                capture_output=True, text=True,
+            )
+        if process.returncode: # Seeding or setup broke, keep going with the other scales
+            failures += 1
+            report['scales'].append({'scale': scale, 'error': process.stderr.strip().splitlines()[-1:]})
+            print(f"scale x{scale} FAILED\n{process.stderr}", file=sys.stderr)
+            continue
+        run = json.loads(process.stdout.strip().splitlines()[-1])
+        failures += len(run['failed'])
+        report['scales'].append(run)
+        print_table(run)
+
+    output = Path(args.output) if args.output else ROOT / 'benchmarks' / 'results' / f"routes-{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], report, args.threshold) or failures else 0)
+    if failures:
+        sys.exit(f"{failures} route(s) or scale(s) failed")
+
+
+if __name__ == '__main__':
+    main()
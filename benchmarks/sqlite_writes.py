@@ -0,0 +1,82 @@
+"""Write throughput of concurrent add_expense calls on SQLite, with the stock connection settings
+("before") and with SQLITE_PRAGMAS + BEGIN IMMEDIATE ("after"). Each mode gets a fresh database file.
+
+    python benchmarks/sqlite_writes.py --threads 8 --writes 200
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common import migrate, setup_django
+
+
+def child(args):
+    setup_django(args.db)
+    from django.conf import settings
+    if args.mode == 'before':
+        settings.SQLITE_PRAGMAS = {} # Rollback journal, synchronous=FULL, default cache
+        settings.DATABASES['default']['OPTIONS'].pop('transaction_mode', None)
+    migrate()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from main.models import Expense
+
+    users = [User.objects.create_user(f'writer{i}', password='bench-pass-123') for i in range(args.threads)]
+    with connection.cursor() as cursor:
+        journal = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+
+    def worker(user):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        failures = 0
+        for i in range(args.writes):
+            response = client.post('/add-expense/', {
+                'title': f'Coffee {i}', 'amount': '3.50', 'category': 'FOOD', 'date': '2025-06-15',
+            })
+            failures += response.status_code != 302
+        return failures
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        failures = sum(pool.map(worker, users))
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'journal_mode': journal,
+        'writes': Expense.objects.count(),
+        'failed_requests': failures,
+        'seconds': round(elapsed, 2),
+        'writes_per_second': round(Expense.objects.count() / elapsed, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help="add_expense calls per thread")
+    parser.add_argument('--mode', choices=['before', 'after'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return child(args)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('before', 'after'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--db', str(Path(tmp) / f'{mode}.sqlite3'),
+                 '--threads', str(args.threads), '--writes', str(args.writes)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps({'threads': args.threads, **report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compare dashboard/planner latency through the WSGI handler (sync views, one thread per client)
+and the ASGI handler (async views, queries run concurrently) against a file-backed SQLite database.
+
+    python benchmarks/wsgi_vs_asgi.py --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from common import setup_django
+
+PATHS = ['/', '/planner/']
+
+
+def run_wsgi(user, total, concurrency):
+    from django.test import Client
+
+    def worker(count):
+        client = Client()
+        client.force_login(user)
+        client.get(PATHS[0]) # Warm up the connection for this thread
+        samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            response = client.get(PATHS[i % len(PATHS)])
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        return samples
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(worker, [total // concurrency] * concurrency))
+        elapsed = time.perf_counter() - started
+    return [sample for samples in results for sample in samples], elapsed
+
+
+def run_asgi(user, total, concurrency):
+    from django.test import AsyncClient
+
+    clients = []
+    for _ in range(concurrency):
+        client = AsyncClient()
+        client.force_login(user)
+        clients.append(client)
+
+    async def worker(client, count):
+        await client.get(PATHS[0])
+        samples = []
+        for i in range(count):
+            start = time.perf_counter()
+            response = await client.get(PATHS[i % len(PATHS)])
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+        return samples
+
+    async def main():
+        return await asyncio.gather(*(worker(client, total // concurrency) for client in clients))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    return [sample for samples in results for sample in samples], elapsed
+
+
+def child(args):
+    # One mode per process, ASYNC_VIEWS decides which views the URLconf routes to
+    setup_django(args.db, ASYNC_VIEWS=args.mode == 'asgi', DASHBOARD_CACHE_TIMEOUT=0)
+    from django.contrib.auth.models import User
+    from common import summarize
+
+    user = User.objects.get(username='bench')
+    runner = run_asgi if args.mode == 'asgi' else run_wsgi
+    samples, elapsed = runner(user, args.requests, args.concurrency)
+    result = summarize(samples)
+    result['throughput_rps'] = round(len(samples) / elapsed, 1)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return child(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / 'bench.sqlite3'
+        setup_django(db)
+        from common import migrate, seed_user
+        migrate()
+        seed_user()
+
+        report = {}
+        for mode in ('wsgi', 'asgi'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--db', str(db),
+                 '--requests', str(args.requests), '--concurrency', str(args.concurrency)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            report[mode] = json.loads(output.strip().splitlines()[-1])
+    print(json.dumps({'concurrency': args.concurrency, **report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,9 @@ ASGI config for life_tracker project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Set ASYNC_VIEWS=true to serve the dashboard and planner from main/async_views.py,
+which run their independent queries concurrently.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
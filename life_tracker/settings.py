@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import warnings
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -45,8 +46,18 @@ INSTALLED_APPS = [
     'main',
 ]
 
+# Per-request instrumentation (main/middleware.py): Server-Timing header, slow request log, repeated query
+# warnings and per-view histograms written to PERF_STATS_DIR (read them with manage.py dump_performance_stats)
+PERF_INSTRUMENTATION = os.getenv('PERF_INSTRUMENTATION', 'False').lower() == 'true'
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', 500))
+PERF_REPEATED_QUERY_THRESHOLD = int(os.getenv('PERF_REPEATED_QUERY_THRESHOLD', 10)) # Same SQL shape this often in one request
+PERF_STATS_DIR = os.getenv('PERF_STATS_DIR', BASE_DIR / 'perf_stats') # One JSON file per process
+PERF_STATS_FLUSH_SECONDS = int(os.getenv('PERF_STATS_FLUSH_SECONDS', 30))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'main.middleware.PerformanceMiddleware', # Drops out unless PERF_INSTRUMENTATION is on
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,7 +70,8 @@ ROOT_URLCONF = 'life_tracker.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'main.instrumentation.TimedDjangoTemplates' if PERF_INSTRUMENTATION # Adds render time to Server-Timing
+        else 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,18 +86,99 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'life_tracker.wsgi.application'
 
+# Serve dashboard and planner from main/async_views.py (meant for ASGI deployments)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+ASYNC_ORM_WORKERS = int(os.getenv('ASYNC_ORM_WORKERS', 8)) # Threads running concurrent ORM queries for async views
+
+# Live updates over Server-Sent Events (/events/, served best by the ASGI app)
+EVENT_BROKER = os.getenv('EVENT_BROKER', 'main.events.LocalBroker') # Dotted path, swap for a shared broker across processes
+EVENT_KEEPALIVE_SECONDS = int(os.getenv('EVENT_KEEPALIVE_SECONDS', 15)) # Comment line sent on idle streams
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# PostgreSQL in production, SQLite (WAL mode, see SQLITE_PRAGMAS) everywhere else
+
+if PRODUCTION:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'life_tracker'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)), # Reuse connections across requests
+            'CONN_HEALTH_CHECKS': True, # Drop dead persistent connections before use
+            'OPTIONS': {'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5))},
+        }
     }
+    if os.getenv('DB_POOL', 'False').lower() == 'true':
+        # Driver-side pool from psycopg_pool (the psycopg[pool] extra), replaces CONN_MAX_AGE
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        }
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE'}, # Take the write lock up front instead of failing on upgrade
+        }
+    }
+
+# Applied to every new SQLite connection by main/signals.py
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL', # Readers don't block the writer
+    'synchronous': 'NORMAL', # Safe with WAL, fsync only at checkpoints
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -20000)), # Negative means KiB
 }
 
 
+# Cache
+# Local memory by default, set CACHE_DIR to share the cache between worker processes on one host
+
+CACHE_DIR = os.getenv('CACHE_DIR')
+
+if CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'life-tracker',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Sessions are read from the cache with the database copy as fallback (signed_cookies also needs no query), and
+# main.backends.CachedModelBackend caches request.user, so a warm authenticated request runs no auth queries
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+AUTHENTICATION_BACKENDS = ['main.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 300)) # Seconds, saves and logouts also drop the entry
+
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 3600)) # Seconds, entries are also versioned per user
+API_ETAG_MAX_AGE = int(os.getenv('API_ETAG_MAX_AGE', 300)) # Seconds an /api/v1/ ETag can stay valid, bounds out-of-order commits
+
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 30)) # Completed todos/reminders older than this move to ArchivedItem
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', 500)) # Rows moved per transaction
+SYNC_SETTLE_SECONDS = int(os.getenv('SYNC_SETTLE_SECONDS', 30)) # Change feed holds back rows stamped this recently
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 90)) # Deletions kept this long, older cursors must resync
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 1000)) # Expense rows per bulk INSERT during CSV imports
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -122,6 +215,31 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# In production collectstatic writes content-hashed copies plus .gz/.br variants (brotli when the package is
+# installed) and WhiteNoise serves the hashed names with a far-future immutable Cache-Control.
+# Dev and tests use plain names so they work without running collectstatic first.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage' if PRODUCTION
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    },
+}
+if not PRODUCTION:
+    warnings.filterwarnings('ignore', message='No directory at: .*staticfiles') # STATIC_ROOT only exists after collectstatic
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'main.performance': {'handlers': ['console'], 'level': 'INFO', 'propagate': False}, # Slow request / N+1 records
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
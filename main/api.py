@@ -0,0 +1,198 @@
+import hashlib
+import time
+from datetime import date
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from . import caching, rollups, sync
+from .models import Expense, MonthlyBudget, Tombstone
+from .views import _dashboard_context, _dashboard_queries, _merge_schedule, _planner_date, _planner_queries
+
+# Read-only JSON API (/api/v1/) over the dashboard, planner and expenses pages, plus the change feed (sync.py).
+# The ETag comes from one indexed query for per-user change markers (caching.change_markers) plus the cache
+# version, so an unchanged resource is answered with 304 before its queries run or anything is serialized.
+# The markers live in the database, so writes from other processes (scheduler, archive sweep, other workers)
+# change the ETag even when the cache is per process
+
+COMPACT = {'separators': (',', ':')}
+CHANGES_PAGE_SIZE = 200
+CHANGES_MAX_PAGE_SIZE = 1000
+
+TODO_FIELDS = {
+    'id': lambda todo: todo.pk,
+    'title': lambda todo: todo.title,
+    'done': lambda todo: todo.done,
+    'priority': lambda todo: todo.priority,
+    'planned_date': lambda todo: todo.planned_date.isoformat(),
+}
+REMINDER_FIELDS = {
+    'id': lambda reminder: reminder.pk,
+    'title': lambda reminder: reminder.title,
+    'due_date': lambda reminder: reminder.due_date.isoformat(),
+    'is_completed': lambda reminder: reminder.is_completed,
+    'priority': lambda reminder: reminder.priority,
+}
+EVENT_FIELDS = {
+    'id': lambda event: None if getattr(event, 'is_recurring', False) else event.pk, # Repeating events have rule_id
+    'rule_id': lambda event: getattr(event, 'rule_id', None),
+    'title': lambda event: event.title,
+    'date': lambda event: event.date.isoformat(),
+    'start_time': lambda event: event.start_time.strftime('%H:%M'),
+    'end_time': lambda event: event.end_time.strftime('%H:%M'),
+}
+EXPENSE_FIELDS = {
+    'id': lambda expense: expense.pk,
+    'title': lambda expense: expense.title,
+    'amount': lambda expense: float(expense.amount),
+    'category': lambda expense: expense.category,
+    'date': lambda expense: expense.date.isoformat(),
+}
+NOTIFICATION_FIELDS = {
+    'id': lambda notification: notification.pk,
+    'title': lambda notification: notification.title,
+    'due_date': lambda notification: notification.due_date.isoformat(),
+    'read': lambda notification: notification.read,
+}
+BUDGET_FIELDS = {
+    'id': lambda budget: budget.pk,
+    'year': lambda budget: budget.year,
+    'month': lambda budget: budget.month,
+    'total_income': lambda budget: float(budget.total_income),
+    'savings_goal': lambda budget: float(budget.savings_goal),
+}
+SYNC_FIELDS = {
+    Tombstone.EXPENSE: EXPENSE_FIELDS,
+    Tombstone.TODO: TODO_FIELDS,
+    Tombstone.REMINDER: REMINDER_FIELDS,
+    Tombstone.SCHEDULE: EVENT_FIELDS,
+    Tombstone.BUDGET: BUDGET_FIELDS,
+}
+ALL_FIELDS = {*TODO_FIELDS, *REMINDER_FIELDS, *EVENT_FIELDS, *EXPENSE_FIELDS, *NOTIFICATION_FIELDS, *BUDGET_FIELDS}
+
+class InvalidQuery(ValueError):
+    pass
+
+def _selected_fields(request):
+    # ?fields=title,date keeps those item fields (plus id) in every list, None keeps everything
+    names = {name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()}
+    if not names:
+        return None
+    unknown = names - ALL_FIELDS
+    if unknown:
+        raise InvalidQuery(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return names | {'id'}
+
+def _rows(items, fields, selected):
+    getters = [(name, getter) for name, getter in fields.items() if selected is None or name in selected]
+    return [{name: getter(item) for name, getter in getters} for item in items]
+
+def _month(request):
+    now = timezone.localdate()
+    try:
+        year, month = int(request.GET.get('year', now.year)), int(request.GET.get('month', now.month))
+        date(year, month, 1)
+    except ValueError:
+        raise InvalidQuery("year and month must form a valid date")
+    return year, month
+
+def _etag(request, date_str=None):
+    # The body depends on the data, the day and the query; the time bucket caps how long a write committed out of
+    # order (stamped before the markers were read, visible after) can hide behind an old ETag
+    today = timezone.localdate().isoformat()
+    params = sorted(request.GET.lists())
+    bucket = int(time.time() // settings.API_ETAG_MAX_AGE)
+    user_id = request.user.pk
+    key = (f'{user_id}:{caching.user_version(user_id)}:{caching.change_markers(user_id)}:{today}:{bucket}:'
+           f'{request.path}:{params}')
+    return hashlib.md5(key.encode()).hexdigest()
+
+def api_view(view):
+    # Login, GET only, conditional on _etag, always revalidated, compact JSON, InvalidQuery -> 400,
+    # CursorExpired -> 410 telling the client to drop its copy and sync from the start
+    def wrapped(request, *args, **kwargs):
+        try:
+            return JsonResponse(view(request, *args, **kwargs), json_dumps_params=COMPACT)
+        except InvalidQuery as error:
+            return HttpResponseBadRequest(str(error))
+        except sync.CursorExpired as error:
+            return JsonResponse({'error': str(error), 'resync': True}, status=410)
+    wrapped = condition(etag_func=_etag)(wrapped)
+    wrapped = cache_control(private=True, no_cache=True)(wrapped)
+    return login_required(require_GET(wrapped), login_url='/login/')
+
+@api_view
+def dashboard(request):
+    selected = _selected_fields(request)
+    now = timezone.now()
+    queries = _dashboard_queries(request.user, now)
+    context = caching.cached_for_user( # Same entry as the HTML page, keyed on the same change markers as the ETag
+        request.user.pk, 'dashboard', lambda: _dashboard_context({name: query() for name, query in queries.items()}, now),
+        timeout=settings.DASHBOARD_CACHE_TIMEOUT, suffix=now.date().isoformat(),
+    )
+    return {
+        'month': context['current_month_name'],
+        'total_spent': context['total_spent'],
+        'category_totals': dict(zip(context['chart_labels'], context['chart_data'])),
+        'todos': _rows(context['recent_todos'], TODO_FIELDS, selected),
+        'reminders': _rows(context['reminders'], REMINDER_FIELDS, selected),
+        'schedule': _rows(context['todays_schedule'], EVENT_FIELDS, selected),
+        'notifications': _rows(context['notifications'], NOTIFICATION_FIELDS, selected),
+    }
+
+@api_view
+def planner(request, date_str=None):
+    selected = _selected_fields(request)
+    view_date = _planner_date(date_str)
+    results = {name: query() for name, query in _planner_queries(request.user, view_date).items()}
+    return {
+        'date': view_date.isoformat(),
+        'schedule': _rows(_merge_schedule(results['schedule_items'], results['occurrences']), EVENT_FIELDS, selected),
+        'reminders': _rows(results['reminders'], REMINDER_FIELDS, selected),
+        'earlier_reminders': results['earlier_reminders'],
+        'todos': _rows(results['simple_todos'], TODO_FIELDS, selected),
+    }
+
+@api_view
+def expenses(request):
+    selected = _selected_fields(request)
+    year, month = _month(request)
+    budget = MonthlyBudget.objects.filter(user=request.user, year=year, month=month).first() # Read-only, never created
+    spendable = budget.spendable_budget() if budget else 0
+    category_totals = rollups.category_totals(request.user, year, month)
+    total_spent = sum(category_totals.values())
+    rows = Expense.objects.filter( # Plain range on expense_user_date_idx
+        user=request.user, date__gte=date(year, month, 1), date__lt=date(year + month // 12, month % 12 + 1, 1)
+    ).order_by('-date', '-id')
+    return {
+        'year': year,
+        'month': month,
+        'spendable': float(spendable),
+        'total_spent': float(total_spent),
+        'remaining': float(spendable - total_spent),
+        'category_totals': {category: float(total) for category, total in category_totals.items()},
+        'expenses': _rows(rows, EXPENSE_FIELDS, selected),
+    }
+
+@api_view
+def changes(request):
+    # Delta sync: rows changed or deleted after ?since=<cursor>, oldest first, resume with the returned cursor
+    selected = _selected_fields(request)
+    try:
+        limit = min(max(int(request.GET.get('limit', CHANGES_PAGE_SIZE)), 1), CHANGES_MAX_PAGE_SIZE)
+    except ValueError:
+        raise InvalidQuery("limit must be a number")
+    try:
+        entries, cursor, has_more = sync.changes(request.user, request.GET.get('since'), limit)
+    except ValueError as error: # Malformed cursor
+        raise InvalidQuery(str(error))
+    rows = []
+    for kind, row, deleted in entries:
+        if deleted:
+            rows.append({'kind': kind, 'id': row.object_id, 'deleted': True, 'updated_at': row.deleted_at.isoformat()})
+        else:
+            rows.append({'kind': kind, 'id': row.pk, 'deleted': False, 'updated_at': row.updated_at.isoformat(),
+                         'data': _rows([row], SYNC_FIELDS[kind], selected)[0]})
+    return {'changes': rows, 'cursor': cursor, 'has_more': has_more}
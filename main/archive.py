@@ -0,0 +1,62 @@
+import datetime
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import caching, search, sync
+from .models import ArchivedItem, Notification, Reminder, Todo
+
+# Moves todos and reminders completed long ago into ArchivedItem, keeping the live tables (and the planner's
+# sorts over them) small. Run by the archive_completed command, once or on a loop
+
+ARCHIVE_SOURCES = {
+    ArchivedItem.TODO: (Todo, 'done', 'created_time'), # Model, completion flag, field stored as ArchivedItem.date
+    ArchivedItem.REMINDER: (Reminder, 'is_completed', 'due_date'),
+}
+
+def archive_batch(kind, cutoff, batch_size):
+    # Copy then delete the oldest batch_size rows completed before cutoff, returns the number moved
+    model, flag, date_field = ARCHIVE_SOURCES[kind]
+    with transaction.atomic():
+        rows = list(
+            model.objects.select_for_update() # Rows can't be reopened between the copy and the delete
+            .filter(**{flag: True}, completed_at__lt=cutoff).order_by('completed_at') # Partial completed_at index
+            .only('id', 'user_id', 'title', 'priority', 'completed_at', date_field)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedItem.objects.bulk_create([
+            ArchivedItem(user_id=row.user_id, kind=kind, original_id=row.pk, title=row.title, priority=row.priority,
+                         date=getattr(row, date_field), completed_at=row.completed_at)
+            for row in rows
+        ])
+        ids = [row.pk for row in rows]
+        if model is Reminder:
+            Notification.objects.filter(reminder_id__in=ids).update(reminder=None) # What on_delete=SET_NULL would do
+        # Plain DELETE: the per-row signals would only journal closed reminders and bump caches row by row
+        model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+        search.unindex(model, ids) # Archived rows are found through the archive page instead
+        sync.record_deletions(model, rows) # Gone from the live tables as far as synced clients are concerned
+        users = {row.user_id for row in rows}
+
+        def bump_versions(): # Same-process readers, others see the tombstones in caching.change_markers
+            for user_id in users:
+                caching.bump_user_version(user_id)
+        transaction.on_commit(bump_versions)
+    return len(rows)
+
+def archive_completed(days=None, batch_size=None, now=None, pause=0.0):
+    # Archive everything completed more than days ago in short transactions, returns {kind: rows moved}
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=days)
+    moved = {}
+    for kind in ARCHIVE_SOURCES:
+        moved[kind] = 0
+        while True:
+            count = archive_batch(kind, cutoff, batch_size)
+            moved[kind] += count
+            if count < batch_size:
+                break
+            time.sleep(pause) # Let other writers in between batches (SQLite has a single writer)
+    return moved
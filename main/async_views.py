@@ -0,0 +1,89 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+from . import caching, events
+from .views import (
+    _calendar_queries, _calendar_response, _calendar_window, _dashboard_context, _dashboard_queries, _planner_context,
+    _planner_date, _planner_queries
+)
+
+# Async versions of the read-heavy pages for ASGI deployments (enabled with ASYNC_VIEWS=true)
+
+_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_ORM_WORKERS, thread_name_prefix='async-orm')
+
+def _run_query(query):
+    # Each pool thread keeps its own connection, recycled by the usual CONN_MAX_AGE rules
+    close_old_connections()
+    try:
+        return query()
+    finally:
+        close_old_connections()
+
+async def gather_queries(queries):
+    # Run independent ORM queries concurrently on the bounded pool, returns {name: result}
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(*( # Each query gets a copy of the request context (timings, see main/instrumentation.py)
+        loop.run_in_executor(_executor, contextvars.copy_context().run, _run_query, query) for query in queries.values()
+    ))
+    return dict(zip(queries, results))
+
+@login_required(login_url='/login/')
+async def dashboard(request):
+    user = await request.auser()
+    now = timezone.now()
+    key, context = await sync_to_async(caching.get_cached)(user.pk, 'dashboard', now.date().isoformat())
+    if context is None:
+        context = _dashboard_context(await gather_queries(_dashboard_queries(user, now)), now)
+        await cache.aset(key, context, settings.DASHBOARD_CACHE_TIMEOUT)
+    context = {**context, 'last_login': await request.session.aget('last_login', 'Never')}
+    return await sync_to_async(render)(request, 'main/dashboard.html', context) # Context processors may touch the DB
+
+@login_required(login_url='/login/')
+async def planner_page(request, date_str=None):
+    user = await request.auser()
+    view_date = _planner_date(date_str)
+    results = await gather_queries(_planner_queries(user, view_date))
+    return await sync_to_async(render)(request, 'main/planner.html', _planner_context(results, view_date))
+
+@login_required(login_url='/login/')
+async def planner_range(request, span, date_str=None):
+    user = await request.auser()
+    anchor = _planner_date(date_str)
+    results = await gather_queries(_calendar_queries(user, *_calendar_window(span, anchor)))
+    return await sync_to_async(_calendar_response)(request, span, anchor, results) # Renders like the sync view
+
+@login_required(login_url='/login/')
+async def event_stream(request):
+    # Server-Sent Events for the user's open pages, an idle stream is just a parked coroutine and a timer
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204) # WSGI would buffer the endless stream, 204 stops EventSource retrying
+    user = await request.auser()
+    broker = events.get_broker()
+
+    async def stream():
+        subscription = broker.subscribe(user.pk)
+        try:
+            yield 'retry: 5000\n\n' # Browser reconnect delay
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), settings.EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n' # Keeps proxies from closing the connection
+                    continue
+                yield events.format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Stop nginx from buffering the stream
+    return response
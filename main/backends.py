@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+# Authentication backend that keeps the logged-in User in the cache, so request.user costs no query on a hit.
+# Entries are dropped when the user is saved or deleted and on logout (see signals.py). Run several processes
+# against a shared cache (CACHE_DIR) or a password change reaches the other processes only after the timeout
+
+USER_KEY = 'auth-user:{}'
+
+def forget_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = USER_KEY.format(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if user is not None and self.user_can_authenticate(user) else None
@@ -0,0 +1,83 @@
+import hashlib
+import time
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from .models import (
+    Expense, MonthlyBudget, Notification, Reminder, ScheduleException, ScheduleItem, ScheduleRule, Todo, Tombstone
+)
+
+# Cached views of a user's data are keyed on two things: a version bumped in the cache after this process's writes
+# (instant, but another process only sees it through a shared cache) and the database change markers, which move
+# with writes from any process (reminder scheduler, archive sweep, other workers) whatever the cache backend
+
+VERSION_KEY = 'user-version:{}'
+STATS_KEY = 'cache-stats:{}:{}'
+
+def _incr(key, initial):
+    try:
+        return cache.incr(key)
+    except ValueError: # Key missing or evicted
+        cache.add(key, initial, timeout=None)
+        return cache.get(key, initial)
+
+def _initial_version():
+    # Millisecond clock, so a version recreated after eviction never matches an older cached entry
+    return int(time.time() * 1000)
+
+def user_version(user_id):
+    version = cache.get(VERSION_KEY.format(user_id))
+    if version is None:
+        cache.add(VERSION_KEY.format(user_id), _initial_version(), timeout=None)
+        version = cache.get(VERSION_KEY.format(user_id))
+    return version
+
+def bump_user_version(user_id):
+    # Invalidate every cached view of this user's data
+    return _incr(VERSION_KEY.format(user_id), _initial_version())
+
+def _latest(model, field, **filters):
+    rows = model.objects.filter(**filters or {'user': OuterRef('pk')})
+    return Subquery(rows.order_by(f'-{field}').values(field)[:1])
+
+def _count(model, **filters):
+    rows = model.objects.filter(user=OuterRef('pk'), **filters).order_by().values('user')
+    return Subquery(rows.annotate(total=Count('pk')).values('total'))
+
+def change_markers(user_id):
+    # Values that move whenever the user's cached or API-served data changes, each one an index lookup
+    return User.objects.filter(pk=user_id).values_list(
+        _latest(Expense, 'updated_at'), _latest(Todo, 'updated_at'), _latest(Reminder, 'updated_at'),
+        _latest(ScheduleItem, 'updated_at'), _latest(MonthlyBudget, 'updated_at'),
+        _latest(Tombstone, 'id'), # Deletes, archiving included
+        _latest(Notification, 'id'), _count(Notification, read=False), # Scheduler inserts, read flags
+        _latest(ScheduleRule, 'id'), _count(ScheduleRule), _latest(ScheduleException, 'id', rule__user=OuterRef('pk')),
+    ).first()
+
+def data_version(user_id):
+    # Short digest of change_markers, one query
+    return hashlib.md5(str(change_markers(user_id)).encode()).hexdigest()
+
+def get_cached(user_id, name, suffix=''):
+    # (key, value) for the user's current version and data, value is None on a miss
+    key = f'{name}:{user_id}:{user_version(user_id)}:{data_version(user_id)}:{suffix}'
+    value = cache.get(key)
+    _incr(STATS_KEY.format(name, 'hits' if value is not None else 'misses'), 1)
+    return key, value
+
+def cached_for_user(user_id, name, build, timeout=None, suffix=''):
+    # Return build() cached under the user's current version, counting hits and misses
+    key, value = get_cached(user_id, name, suffix)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+def cache_stats(name):
+    hits = cache.get(STATS_KEY.format(name, 'hits'), 0)
+    misses = cache.get(STATS_KEY.format(name, 'misses'), 0)
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 3) if total else None}
+
+def reset_cache_stats(name):
+    cache.delete_many([STATS_KEY.format(name, 'hits'), STATS_KEY.format(name, 'misses')])
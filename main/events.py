@@ -0,0 +1,80 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Small per-user change events pushed to open pages over Server-Sent Events (see async_views.event_stream)
+
+class Subscription:
+    # One open stream: a bounded queue owned by the event loop serving it
+    def __init__(self, user_id, max_pending):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_pending)
+
+    def deliver(self, event):
+        if not self.queue.full(): # A stalled client drops events, its next page load catches up
+            self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+class LocalBroker:
+    # In-process fan-out. publish() is thread safe (sync views run in worker threads under ASGI) but only reaches
+    # streams served by this process, point EVENT_BROKER at a shared implementation to run several processes
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.max_pending)
+        with self.lock:
+            self.subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            streams = self.subscriptions.get(subscription.user_id)
+            if streams is not None:
+                streams.discard(subscription)
+                if not streams:
+                    del self.subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        with self.lock:
+            streams = list(self.subscriptions.get(user_id, ()))
+        for subscription in streams:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError: # Loop already closed, the stream is going away
+                pass
+        return len(streams)
+
+    def connections(self):
+        with self.lock:
+            return sum(len(streams) for streams in self.subscriptions.values())
+
+_broker = None
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.EVENT_BROKER)()
+    return _broker
+
+def reset_broker():
+    global _broker
+    _broker = None
+
+def publish(user_id, model, action, **data):
+    # Send {model, action, ...} to the user's open pages once the surrounding transaction commits
+    event = {'model': model, 'action': action, **data}
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
+
+def format_event(event):
+    return f"data: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
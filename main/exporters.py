@@ -0,0 +1,84 @@
+import csv
+import datetime
+import json
+import zlib
+from django.utils import timezone
+from .models import ArchivedItem, Expense, Reminder, ScheduleItem, Todo
+
+# name: (model, exported fields, date field used by start/end filters)
+EXPORT_MODELS = {
+    'expenses': (Expense, ['id', 'title', 'amount', 'category', 'date', 'created_time'], 'date'),
+    'todos': (Todo, ['id', 'title', 'done', 'priority', 'planned_date', 'created_time'], 'planned_date'),
+    'reminders': (Reminder, ['id', 'title', 'due_date', 'is_completed', 'priority'], 'due_date'),
+    'schedule': (ScheduleItem, ['id', 'title', 'date', 'start_time', 'end_time'], 'date'),
+    'archive': (ArchivedItem, ['id', 'kind', 'original_id', 'title', 'priority', 'date', 'completed_at'], 'completed_at'),
+}
+EXPORT_FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 2000 # Rows fetched per database round trip
+BUFFER_SIZE = 64 * 1024 # Bytes handed to the response per yield
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+def export_rows(user, name, start=None, end=None, chunk_size=CHUNK_SIZE):
+    # Server-side cursor over one model as tuples, never materialising the queryset
+    model, fields, date_field = EXPORT_MODELS[name]
+    rows = model.objects.filter(user=user)
+    is_datetime = model._meta.get_field(date_field).get_internal_type() == 'DateTimeField'
+    if start:
+        rows = rows.filter(**{f'{date_field}__gte': _day_start(start) if is_datetime else start})
+    if end: # Inclusive end date
+        end = end + datetime.timedelta(days=1)
+        rows = rows.filter(**{f'{date_field}__lt': _day_start(end) if is_datetime else end})
+    return rows.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+
+def _plain(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bool) or value is None:
+        return value
+    return value if isinstance(value, (int, str)) else str(value) # Decimal -> "12.50"
+
+def _buffered(lines):
+    # Join small lines into ~64 KB chunks so millions of rows don't mean millions of writes
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+class _Echo:
+    def write(self, value):
+        return value
+
+def csv_lines(user, name, start=None, end=None):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_MODELS[name][1])
+    for row in export_rows(user, name, start, end):
+        yield writer.writerow([_plain(value) for value in row])
+
+def ndjson_lines(user, names, start=None, end=None):
+    for name in names:
+        fields = EXPORT_MODELS[name][1]
+        for row in export_rows(user, name, start, end):
+            record = {'model': name}
+            record.update(zip(fields, (_plain(value) for value in row)))
+            yield json.dumps(record, separators=(',', ':')) + '\n'
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_stream(user, fmt, names, start=None, end=None, gzip=False):
+    # Byte chunks of the export, CSV takes exactly one model
+    lines = csv_lines(user, names[0], start, end) if fmt == 'csv' else ndjson_lines(user, names, start, end)
+    chunks = _buffered(lines)
+    return gzipped(chunks) if gzip else chunks
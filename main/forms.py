@@ -1,8 +1,9 @@
+import calendar
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from .models import Todo, Expense, MonthlyBudget, ScheduleItem, Reminder
+from .models import Todo, Expense, MonthlyBudget, ScheduleItem, ScheduleRule, Reminder
 
 CLASS_INPUT = "auth-input"
 
@@ -88,6 +89,16 @@ class ExpenseForm(forms.ModelForm):
             raise ValidationError("Amount must be greater than zero.") # Spending must be positive 
         return amount
 
+class ExpenseImportForm(forms.Form):
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'modern-input',
+        'accept': '.csv,text/csv'
+    }))
+    start_row = forms.IntegerField(min_value=0, required=False, initial=0, widget=forms.NumberInput(attrs={
+        'class': 'modern-input',
+        'placeholder': 'Skip rows (resume)'
+    }))
+
 class ReminderForm(forms.ModelForm):
     class Meta:
         model = Reminder
@@ -133,4 +144,41 @@ class ScheduleItemForm(forms.ModelForm):
                 'type': 'time'
             }),
             'date': forms.DateInput(attrs={'type': 'hidden'}), # Controlled by UI/URL
-        }
\ No newline at end of file
+        }
+
+class ScheduleRuleForm(forms.ModelForm):
+    # Posted together with ScheduleItemForm on the planner, a frequency turns the event into a repeating rule
+    WEEKDAY_CHOICES = [(str(day), name[:3]) for day, name in enumerate(calendar.day_name)]
+
+    weekdays = forms.MultipleChoiceField(
+        choices=WEEKDAY_CHOICES, required=False, widget=forms.CheckboxSelectMultiple(attrs={'class': 'weekday-check'})
+    )
+
+    class Meta:
+        model = ScheduleRule
+        fields = ['title', 'start_time', 'end_time', 'frequency', 'interval', 'weekdays', 'until', 'count']
+        widgets = {
+            'frequency': forms.Select(attrs={'class': 'glass-input'}),
+            'interval': forms.NumberInput(attrs={'class': 'glass-input', 'min': 1, 'title': 'Repeat every N periods'}),
+            'until': forms.DateInput(attrs={'class': 'glass-input', 'type': 'date'}),
+            'count': forms.NumberInput(attrs={'class': 'glass-input', 'min': 1, 'placeholder': 'Times'}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['frequency'].choices = [('', 'Does not repeat')] + ScheduleRule.FREQUENCY_CHOICES
+        self.fields['frequency'].required = False # Blank means a one-off ScheduleItem
+        self.fields['interval'].required = False
+
+    def clean_weekdays(self):
+        return ''.join(sorted(self.cleaned_data['weekdays'])) # Stored as digits, Monday=0
+
+    def clean_interval(self):
+        return self.cleaned_data.get('interval') or 1
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('start_time'), cleaned_data.get('end_time')
+        if start and end and end <= start:
+            raise ValidationError("End time must be after start time.")
+        return cleaned_data
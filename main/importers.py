@@ -0,0 +1,78 @@
+import csv
+from collections import defaultdict
+from django.db import transaction
+from . import caching, rollups, search
+from .forms import ExpenseForm
+from .models import Expense
+
+IMPORT_FIELDS = ['title', 'amount', 'category', 'date']
+CATEGORY_CODES = {}
+for code, label in Expense.CATEGORY_CHOICES: # Accept "FOOD", "food" or "Food"
+    CATEGORY_CODES[code.lower()] = code
+    CATEGORY_CODES[label.lower()] = code
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.rejected = 0
+        self.last_row = 0 # Last data row read
+        self.committed_row = 0 # Resume with start_row=committed_row after a crash
+
+def _flush(user, batch, result, row_number):
+    # Insert one batch and shift the matching rollups in the same transaction
+    deltas = defaultdict(lambda: [0, 0])
+    for expense in batch:
+        delta = deltas[(expense.date.year, expense.date.month, expense.category)]
+        delta[0] += expense.amount
+        delta[1] += 1
+    with transaction.atomic():
+        Expense.objects.bulk_create(batch) # Skips model signals, so rollups and search tokens are updated here
+        for (year, month, category), (amount, count) in deltas.items():
+            rollups.apply_delta(user.pk, year, month, category, amount, count)
+        search.index_objects(batch)
+        transaction.on_commit(lambda: caching.bump_user_version(user.pk))
+    result.imported += len(batch)
+    result.committed_row = row_number
+
+def import_expenses(user, lines, batch_size=1000, start_row=0, on_error=None, on_batch=None):
+    """Stream CSV lines (title, amount, category, date) into Expense rows for user.
+
+    Rows are validated with ExpenseForm. Rejected rows go to on_error(row_number, row, errors).
+    Memory use is bounded by batch_size, never by the size of the file.
+    """
+    reader = csv.DictReader(lines)
+    missing = [field for field in IMPORT_FIELDS if field not in (reader.fieldnames or []) and field != 'category']
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}.")
+
+    result, batch = ImportResult(), []
+    result.committed_row = start_row
+    for row_number, row in enumerate(reader, start=1):
+        if row_number <= start_row: # Resume after rows imported by an earlier run
+            continue
+        result.last_row = row_number
+        data = {field: (row.get(field) or '').strip() for field in IMPORT_FIELDS}
+        data['category'] = CATEGORY_CODES.get(data['category'].lower(), data['category']) or 'OTHER'
+        form = ExpenseForm(data)
+        if not form.is_valid():
+            result.rejected += 1
+            if on_error:
+                on_error(row_number, row, form.errors)
+            continue
+        expense = form.save(commit=False)
+        expense.user = user
+        batch.append(expense)
+        if len(batch) >= batch_size:
+            _flush(user, batch, result, row_number)
+            batch = []
+            if on_batch:
+                on_batch(result)
+    if batch:
+        _flush(user, batch, result, result.last_row)
+    result.committed_row = max(result.committed_row, result.last_row)
+    if on_batch:
+        on_batch(result)
+    return result
+
+def format_errors(errors):
+    return '; '.join(f"{field}: {' '.join(messages)}" for field, messages in errors.items())
@@ -0,0 +1,187 @@
+import atexit
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+# Per-request timings (DB, templates, view code) collected by main.middleware.PerformanceMiddleware when
+# PERF_INSTRUMENTATION is on. Nothing here is installed otherwise, so the disabled cost is zero
+
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000) # Histogram upper bounds, plus one bucket above the last
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+class RequestTimings:
+    # Totals for one request. Async views run queries on several threads at once, so updates take a lock
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db = 0.0 # Seconds, summed (concurrent queries can add up to more than the wall time)
+        self.template = 0.0
+        self.rendering = False # Set while a top-level template renders, includes are part of it
+        self.shapes = Counter()
+
+    def add_query(self, sql, elapsed):
+        shape = query_shape(sql)
+        with self.lock:
+            self.queries += 1
+            self.db += elapsed
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold):
+        # [(shape, count)] for SQL run at least threshold times, the usual sign of a query inside a loop
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+def query_shape(sql):
+    # SQL with IN lists and inlined numbers collapsed, so a query repeated per row maps to one shape
+    return _NUMBER.sub('N', _IN_LIST.sub('(...)', sql))
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+def end_request(token):
+    _current.reset(token)
+
+# Database -------------------------------------------------------------------------------------------------------------------------------
+def execute_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None: # Management commands, background threads
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - start)
+
+def install(connection):
+    if execute_wrapper not in connection.execute_wrappers: # Connection objects outlive reconnects
+        connection.execute_wrappers.append(execute_wrapper)
+
+def install_all():
+    for connection in connections.all():
+        install(connection)
+
+# Templates ------------------------------------------------------------------------------------------------------------------------------
+class TimedTemplate:
+    # Wraps a backend template so render() time is added to the current request
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.rendering:
+            return self.template.render(context, request)
+        timings.rendering = True
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings.template += time.perf_counter() - start
+            timings.rendering = False
+
+class TimedDjangoTemplates(DjangoTemplates):
+    # Template backend used instead of DjangoTemplates while PERF_INSTRUMENTATION is on
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+# Per-view histograms --------------------------------------------------------------------------------------------------------------------
+_stats = {}
+_stats_lock = threading.Lock()
+_started = int(time.time())
+_last_flush = time.monotonic()
+
+def empty_stats():
+    return {'count': 0, 'buckets': [0] * (len(BUCKETS_MS) + 1), 'total_ms': 0.0, 'max_ms': 0.0,
+            'db_ms': 0.0, 'queries': 0, 'template_ms': 0.0}
+
+def merge_stats(target, source):
+    target['count'] += source['count']
+    target['buckets'] = [a + b for a, b in zip(target['buckets'], source['buckets'])]
+    target['max_ms'] = max(target['max_ms'], source['max_ms'])
+    for key in ('total_ms', 'db_ms', 'queries', 'template_ms'):
+        target[key] += source[key]
+    return target
+
+def bucket_index(ms):
+    for index, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            return index
+    return len(BUCKETS_MS)
+
+def record(view, total_ms, timings):
+    global _last_flush
+    with _stats_lock:
+        stats = _stats.setdefault(view, empty_stats())
+        stats['count'] += 1
+        stats['buckets'][bucket_index(total_ms)] += 1
+        stats['total_ms'] += total_ms
+        stats['max_ms'] = max(stats['max_ms'], total_ms)
+        stats['db_ms'] += timings.db * 1000
+        stats['queries'] += timings.queries
+        stats['template_ms'] += timings.template * 1000
+        due = time.monotonic() - _last_flush >= settings.PERF_STATS_FLUSH_SECONDS
+        if due:
+            _last_flush = time.monotonic()
+    if due:
+        flush()
+
+def stats_path():
+    # One file per process (pid plus start time, pids get reused), merged by the dump_performance_stats command
+    return Path(settings.PERF_STATS_DIR) / f'{os.getpid()}-{_started}.json'
+
+def flush():
+    with _stats_lock:
+        snapshot = json.dumps({'pid': os.getpid(), 'started': _started, 'views': _stats})
+    path = stats_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix('.tmp')
+    partial.write_text(snapshot)
+    os.replace(partial, path) # Readers never see half a file
+
+def reset():
+    with _stats_lock:
+        _stats.clear()
+
+def load_stats(directory):
+    # {view: stats} merged over every process file in directory
+    merged = {}
+    for path in sorted(Path(directory).glob('*.json')):
+        for view, stats in json.loads(path.read_text())['views'].items():
+            merge_stats(merged.setdefault(view, empty_stats()), stats)
+    return merged
+
+def percentile_ms(stats, pct):
+    # Upper bound of the bucket holding the pct-th request (the slowest bucket reports the max seen)
+    if not stats['count']:
+        return 0.0
+    rank = max(1, round(pct / 100 * stats['count']))
+    seen = 0
+    for index, count in enumerate(stats['buckets']):
+        seen += count
+        if seen >= rank:
+            return min(BUCKETS_MS[index], stats['max_ms']) if index < len(BUCKETS_MS) else stats['max_ms']
+    return stats['max_ms']
+
+@atexit.register
+def _flush_at_exit():
+    if _stats:
+        try:
+            flush()
+        except OSError:
+            pass
@@ -0,0 +1,32 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.archive import archive_completed
+from main.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = ("Move todos and reminders completed more than --days ago into the archive table, in batches, and drop "
+            "change feed tombstones older than SYNC_TOMBSTONE_DAYS.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE, help="Rows per transaction.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to wait between batches.")
+        parser.add_argument('--loop', action='store_true', help="Keep running, archiving every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=3600)
+
+    def handle(self, *args, **options):
+        while True:
+            moved = archive_completed(days=options['days'], batch_size=options['batch_size'], pause=options['pause'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {moved['todo']} todos and {moved['reminder']} reminders completed over {options['days']} days ago."
+            ))
+            pruned = prune_tombstones()
+            self.stdout.write(f"Pruned {pruned} tombstones older than {settings.SYNC_TOMBSTONE_DAYS} days.")
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from main.instrumentation import BUCKETS_MS, load_stats, percentile_ms
+
+
+class Command(BaseCommand):
+    help = "Print the per-view latency histograms written by PerformanceMiddleware (merged over every process)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.PERF_STATS_DIR, help="Directory holding the per-process JSON files.")
+        parser.add_argument('--sort', choices=['total', 'count', 'p95', 'queries'], default='total',
+                            help="Order views by summed time, requests, p95 or queries per request.")
+        parser.add_argument('--json', action='store_true', help="Print the merged histograms as JSON.")
+        parser.add_argument('--reset', action='store_true', help="Delete the files after reading them.")
+
+    def handle(self, *args, **options):
+        directory = Path(options['dir'])
+        views = load_stats(directory) if directory.is_dir() else {}
+        if options['json']:
+            self.stdout.write(json.dumps({'buckets_ms': BUCKETS_MS, 'views': views}, indent=2))
+        elif not views:
+            self.stdout.write(f"No performance stats in {directory}.")
+        else:
+            keys = {
+                'total': lambda stats: stats['total_ms'],
+                'count': lambda stats: stats['count'],
+                'p95': lambda stats: percentile_ms(stats, 95),
+                'queries': lambda stats: stats['queries'] / stats['count'],
+            }
+            ordered = sorted(views.items(), key=lambda item: keys[options['sort']](item[1]), reverse=True)
+            self.stdout.write(
+                f"{'view':<28} {'requests':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'mean':>8} {'db':>8} "
+                f"{'queries':>7} {'tpl':>8} {'max':>8}"
+            )
+            for view, stats in ordered:
+                count = stats['count']
+                self.stdout.write(
+                    f"{view:<28} {count:>8} {percentile_ms(stats, 50):>7.1f} {percentile_ms(stats, 95):>7.1f} "
+                    f"{percentile_ms(stats, 99):>7.1f} {stats['total_ms'] / count:>8.1f} {stats['db_ms'] / count:>8.1f} "
+                    f"{stats['queries'] / count:>7.1f} {stats['template_ms'] / count:>8.1f} {stats['max_ms']:>8.1f}"
+                )
+            self.stdout.write("Times in ms, percentiles are histogram bucket bounds.")
+
+        if options['reset'] and directory.is_dir():
+            for path in directory.glob('*.json'):
+                path.unlink()
+            self.stdout.write(self.style.SUCCESS("Performance stats cleared."))
@@ -0,0 +1,43 @@
+import sys
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.exporters import EXPORT_FORMATS, EXPORT_MODELS, export_stream
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a YYYY-MM-DD date.")
+
+
+class Command(BaseCommand):
+    help = "Stream a user's data as CSV or NDJSON, optionally gzipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--model', action='append', choices=list(EXPORT_MODELS),
+                            help="Model to export, repeat for several (CSV takes one). Default: all.")
+        parser.add_argument('--start', type=parse_date, help="First date to include (YYYY-MM-DD).")
+        parser.add_argument('--end', type=parse_date, help="Last date to include (YYYY-MM-DD).")
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', help="File to write, default stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+        names = options['model'] or list(EXPORT_MODELS)
+        if options['format'] == 'csv' and len(names) != 1:
+            raise CommandError("CSV exports one model at a time, pass a single --model.")
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in export_stream(user, options['format'], names, options['start'], options['end'], options['gzip']):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
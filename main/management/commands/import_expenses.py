@@ -0,0 +1,56 @@
+import csv
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.importers import IMPORT_FIELDS, format_errors, import_expenses
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV of expenses (title, amount, category, date) into a user's account."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help="CSV file to import, or - for stdin.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per INSERT/transaction.")
+        parser.add_argument('--start-row', type=int, default=0, help="Skip this many data rows (resume a run).")
+        parser.add_argument('--errors', help="Write rejected rows to this CSV file.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['username']}' does not exist.")
+
+        source = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8-sig')
+        error_file = open(options['errors'], 'w', newline='', encoding='utf-8') if options['errors'] else None
+        error_writer = None
+        if error_file:
+            error_writer = csv.writer(error_file)
+            error_writer.writerow(['row', 'error'] + IMPORT_FIELDS)
+
+        def on_error(row_number, row, errors):
+            if error_writer:
+                error_writer.writerow([row_number, format_errors(errors)] + [row.get(field, '') for field in IMPORT_FIELDS])
+            elif options['verbosity'] > 1:
+                self.stderr.write(f"Row {row_number}: {format_errors(errors)}")
+
+        def on_batch(result):
+            if options['verbosity'] > 0:
+                self.stdout.write(f"Committed through row {result.committed_row} ({result.imported} imported).")
+
+        try:
+            result = import_expenses(
+                user, source, batch_size=options['batch_size'], start_row=options['start_row'],
+                on_error=on_error, on_batch=on_batch,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if error_file:
+                error_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} expenses, rejected {result.rejected}, last row {result.last_row}."
+        ))
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or with --verify, check) the monthly expense rollups from the raw Expense table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only process this username.")
+        parser.add_argument('--verify', action='store_true', help="Report mismatches instead of rebuilding.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+
+        if not options['verify']:
+            count = rebuild_rollups(user, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rollup rows."))
+            return
+
+        mismatches = verify_rollups(user)
+        for (user_id, year, month, category), expected, stored in mismatches:
+            self.stdout.write(f"user={user_id} {year}-{month:02d} {category}: expected {expected}, stored {stored}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} rollup rows are out of sync, run without --verify to rebuild.")
+        self.stdout.write(self.style.SUCCESS("Rollups match the Expense table."))
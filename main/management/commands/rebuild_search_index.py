@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search tokens for todos, reminders, expenses and schedule items from the live tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only process this username.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+        count = rebuild_index(user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} search tokens."))
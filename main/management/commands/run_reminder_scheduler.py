@@ -0,0 +1,32 @@
+import datetime
+from django.core.management.base import BaseCommand
+from main.notifications import CATCHUP, LOOKAHEAD, POLL_SECONDS, ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = "Long-running worker that writes in-app notifications when reminders fall due (run a single instance)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=POLL_SECONDS, help="Seconds between change journal checks.")
+        parser.add_argument('--lookahead-hours', type=float, default=LOOKAHEAD.total_seconds() / 3600,
+                            help="Deadlines loaded into memory at once.")
+        parser.add_argument('--catchup-hours', type=float, default=CATCHUP.total_seconds() / 3600,
+                            help="Deadlines missed while the worker was down that are still notified.")
+        parser.add_argument('--once', action='store_true', help="Run a single scheduling step and exit.")
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(
+            poll_seconds=options['poll'],
+            lookahead=datetime.timedelta(hours=options['lookahead_hours']),
+            catchup=datetime.timedelta(hours=options['catchup_hours']),
+        )
+        if options['once']:
+            scheduler.start()
+            scheduler.run_once()
+        else:
+            self.stdout.write(f"Reminder scheduler started, polling every {options['poll']}s.")
+            try:
+                scheduler.run()
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"Sent {scheduler.sent} notifications."))
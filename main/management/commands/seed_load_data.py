@@ -0,0 +1,40 @@
+import re
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from main.seeding import DEFAULT_PASSWORD, seed_users
+
+
+class Command(BaseCommand):
+    help = "Create N synthetic users with realistic volumes of expenses, todos, reminders and schedule items (bulk inserts)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--expenses', type=int, default=2000, help="Expenses per user.")
+        parser.add_argument('--todos', type=int, default=300, help="Todos per user.")
+        parser.add_argument('--reminders', type=int, default=300, help="Reminders per user.")
+        parser.add_argument('--schedule', type=int, default=300, help="One-off schedule items per user.")
+        parser.add_argument('--rules', type=int, default=10, help="Repeating schedule rules per user.")
+        parser.add_argument('--prefix', default='load', help="Usernames are <prefix>0, <prefix>1, ...")
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, the same seed gives the same data.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true', help="Delete existing <prefix>N users (and their data) first.")
+
+    def handle(self, *args, **options):
+        existing = User.objects.filter(username__regex=rf"^{re.escape(options['prefix'])}[0-9]+$")
+        if existing.exists():
+            if not options['clear']:
+                raise CommandError(f"Users named {options['prefix']}N already exist, pass --clear to replace them.")
+            deleted, _ = existing.delete()
+            self.stdout.write(f"Deleted {deleted} existing rows.")
+
+        users = seed_users(
+            options['users'], prefix=options['prefix'], password=options['password'], batch_size=options['batch_size'],
+            expenses=options['expenses'], todos=options['todos'], reminders=options['reminders'],
+            schedule=options['schedule'], rules=options['rules'], seed=options['seed'],
+        )
+        per_user = sum(options[key] for key in ('expenses', 'todos', 'reminders', 'schedule', 'rules'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users ({options['prefix']}0..{options['prefix']}{len(users) - 1}) "
+            f"with {per_user * len(users)} rows."
+        ))
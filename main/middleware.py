@@ -0,0 +1,70 @@
+import json
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from . import instrumentation
+
+logger = logging.getLogger('main.performance')
+
+class PerformanceMiddleware:
+    # Server-Timing header, slow request log, repeated query (N+1) warnings and per-view histograms.
+    # Removed from the chain at startup unless PERF_INSTRUMENTATION is on
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token, start = self.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, token, start = self.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        return self.finish(request, response, timings, start)
+
+    def begin(self):
+        instrumentation.install_all() # Connections opened before the first request (or in tests) get the wrapper here
+        timings, token = instrumentation.start_request()
+        return timings, token, time.perf_counter()
+
+    def finish(self, request, response, timings, start):
+        total = (time.perf_counter() - start) * 1000
+        db, template = timings.db * 1000, timings.template * 1000
+        own = max(0.0, total - db - template) # View code and the middleware below this one
+        response['Server-Timing'] = (
+            f'db;dur={db:.1f};desc="{timings.queries} queries", tpl;dur={template:.1f}, '
+            f'view;dur={own:.1f}, total;dur={total:.1f}'
+        )
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        instrumentation.record(view, total, timings)
+
+        repeated = timings.repeated(settings.PERF_REPEATED_QUERY_THRESHOLD)
+        if total >= settings.PERF_SLOW_REQUEST_MS or repeated:
+            entry = {
+                'method': request.method, 'path': request.path, 'view': view, 'status': response.status_code,
+                'total_ms': round(total, 1), 'view_ms': round(own, 1), 'db_ms': round(db, 1),
+                'queries': timings.queries, 'template_ms': round(template, 1),
+                'repeated_queries': [{'sql': shape[:300], 'count': count} for shape, count in repeated[:5]],
+            }
+            message = 'Slow request' if total >= settings.PERF_SLOW_REQUEST_MS else 'Repeated queries'
+            logger.warning('%s %s', message, json.dumps(entry), extra={'performance': entry})
+        return response
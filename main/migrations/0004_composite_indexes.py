@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_expenserollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['user', 'is_completed', 'due_date'], name='reminder_user_done_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', 'due_date'], name='reminder_user_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleitem',
+            index=models.Index(fields=['user', 'date', 'start_time'], name='schedule_user_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'done', 'created_time'], name='todo_user_done_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('done', False)), fields=['user', 'created_time'], name='todo_user_pending_idx'),
+        ),
+    ]
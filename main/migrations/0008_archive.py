@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.utils import timezone
+
+
+def backfill_completed_at(apps, schema_editor):
+    # Completion times were never stored, use the closest known date so old rows become archivable
+    Todo = apps.get_model('main', 'Todo')
+    Reminder = apps.get_model('main', 'Reminder')
+    Todo.objects.filter(done=True).update(completed_at=F('created_time'))
+    Reminder.objects.filter(is_completed=True).update(completed_at=Least(F('due_date'), Value(timezone.now())))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_reminder_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('todo', 'Task'), ('reminder', 'Reminder')], max_length=10)),
+                ('original_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('priority', models.CharField(default='MEDIUM', max_length=10)),
+                ('date', models.DateTimeField()),
+                ('completed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['completed_at'], name='reminder_done_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('done', True)), fields=['completed_at'], name='todo_done_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='archiveditem',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archiveditem',
+            index=models.Index(fields=['user', 'completed_at', 'id'], name='archive_user_completed_idx'),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
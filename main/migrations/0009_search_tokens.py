@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:17
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def build_index(apps, schema_editor):
+    # Same tokens as main.search.rebuild_index, written against the historical models
+    SearchToken = apps.get_model('main', 'SearchToken')
+    sources = [('todo', 'Todo', 'created_time'), ('reminder', 'Reminder', 'due_date'),
+               ('expense', 'Expense', 'date'), ('schedule', 'ScheduleItem', 'date')]
+    batch = []
+    for kind, name, date_field in sources:
+        for item in apps.get_model('main', name).objects.only('id', 'user_id', 'title', date_field).iterator(1000):
+            day = getattr(item, date_field)
+            day = timezone.localdate(day) if hasattr(day, 'hour') else day
+            words = dict.fromkeys(word[:32] for word in re.findall(r'\w+', item.title.lower()) if len(word) >= 2)
+            batch.extend(SearchToken(user_id=item.user_id, kind=kind, object_id=item.pk, token=word, date=day)
+                         for word in words)
+            if len(batch) >= 1000:
+                SearchToken.objects.bulk_create(batch)
+                batch = []
+    SearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+                ('kind', models.CharField(choices=[('todo', 'Task'), ('reminder', 'Reminder'), ('expense', 'Expense'), ('schedule', 'Event')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'token', 'kind', 'object_id', 'date'], name='search_user_token_idx'), models.Index(fields=['kind', 'object_id'], name='search_object_idx')],
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
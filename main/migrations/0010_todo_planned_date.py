@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:02
+
+import django.utils.timezone
+from django.db import migrations, models, transaction
+from django.db.models.functions import TruncDate
+
+BATCH_SIZE = 1000
+
+
+def backfill_planned_date(apps, schema_editor):
+    # Todos were tagged to their planner day through created_time, copy its local date in pk-range batches,
+    # each in its own short transaction so large tables never hold one long write lock
+    Todo = apps.get_model('main', 'Todo')
+    last = Todo.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for start in range(0, last, BATCH_SIZE):
+        with transaction.atomic():
+            Todo.objects.filter(pk__gt=start, pk__lte=start + BATCH_SIZE, planned_date__isnull=True).update(
+                planned_date=TruncDate('created_time') # Local date under the active time zone
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False # Every backfill batch commits on its own
+
+    dependencies = [
+        ('main', '0009_search_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='planned_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(backfill_planned_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='todo',
+            name='planned_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_done_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'planned_date', 'done'], name='todo_user_planned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('done', False)), fields=['user', 'planned_date'], name='todo_user_pending_planned_idx'),
+        ),
+    ]
@@ -9,9 +9,13 @@ class MonthlyBudget(models.Model):
     year = models.IntegerField()
     total_income = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     savings_goal = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True) # Change-feed position, update() callers set it themselves
 
     class Meta:
         unique_together = ('user', 'month', 'year') # Prevent multiple budgets for same user/month
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='budget_user_updated_idx'), # Change feed
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.month}/{self.year}"
@@ -36,10 +40,32 @@ class Expense(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='OTHER')
     date = models.DateField()
     created_time = models.DateTimeField(auto_now_add=True) # Date 
+    updated_at = models.DateTimeField(auto_now=True) # Change-feed position, update() callers set it themselves
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='expense_user_date_idx'), # Monthly views
+            models.Index(fields=['user', 'updated_at', 'id'], name='expense_user_updated_idx'), # Change feed
+        ]
 
     def __str__(self):
         return f"{self.title} - ${self.amount}"
 
+class ExpenseRollup(models.Model):
+    # Pre-aggregated monthly spending per category, kept in sync with Expense by main/rollups.py
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    year = models.IntegerField()
+    month = models.IntegerField()
+    category = models.CharField(max_length=20, choices=Expense.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0) # Number of expenses behind the total
+
+    class Meta:
+        unique_together = ('user', 'year', 'month', 'category') # One row per user/month/category
+
+    def __str__(self):
+        return f"{self.user_id} - {self.month}/{self.year} {self.category}: {self.total}"
+
 class Todo(models.Model):
     PRIORITY_CHOICES = [
         ('HIGH', 'High'),
@@ -51,7 +77,20 @@ class Todo(models.Model):
     title = models.CharField(max_length=200)
     done = models.BooleanField(default=False) # Completion status
     created_time = models.DateTimeField(auto_now_add=True)
+    planned_date = models.DateField(default=timezone.localdate) # Planner day the task belongs to
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='MEDIUM')
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False) # Set while done, drives archival
+    updated_at = models.DateTimeField(auto_now=True) # Change-feed position, update() callers set it themselves
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='todo_user_updated_idx'), # Change feed
+            models.Index(fields=['completed_at'], condition=models.Q(done=True), name='todo_done_completed_idx'), # Archival sweep
+            models.Index(fields=['user', 'planned_date', 'done'], name='todo_user_planned_idx'), # Planner day list
+            models.Index(
+                fields=['user', 'planned_date'], condition=models.Q(done=False), name='todo_user_pending_planned_idx'
+            ), # Dashboard pending tasks (matches the NOT done filter)
+        ]
 
     def __str__(self):
         return self.title
@@ -68,16 +107,192 @@ class Reminder(models.Model):
         ('LOW', 'Low'),
     ]
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='MEDIUM')
+    notified_for = models.DateTimeField(null=True, blank=True, editable=False) # due_date the last notification was sent for
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False) # Set while completed, drives archival
+    updated_at = models.DateTimeField(auto_now=True) # Change-feed position, update() callers set it themselves
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='reminder_user_updated_idx'), # Change feed
+            models.Index(
+                fields=['completed_at'], condition=models.Q(is_completed=True), name='reminder_done_completed_idx'
+            ), # Archival sweep
+            models.Index(
+                fields=['user', 'due_date'], condition=models.Q(is_completed=False), name='reminder_user_open_due_idx'
+            ), # Open reminders by deadline
+            models.Index(
+                fields=['due_date'], condition=models.Q(is_completed=False), name='reminder_open_due_idx'
+            ), # All users' upcoming deadlines, read by the reminder scheduler
+            models.Index(
+                fields=['user', 'due_date'], condition=models.Q(is_completed=True), name='reminder_user_closed_due_idx'
+            ), # Completed reminders, paged newest first
+        ]
 
     def __str__(self):
         return self.title
 
+class ReminderChange(models.Model):
+    # Append-only journal of touched reminders, the reminder scheduler reads it by id instead of rescanning
+    reminder_id = models.BigIntegerField() # Plain id so deletions can be journalled too
+
+    def __str__(self):
+        return f"Change #{self.pk} to reminder {self.reminder_id}"
+
+class Notification(models.Model):
+    # In-app notice written by run_reminder_scheduler when a reminder falls due
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    reminder = models.ForeignKey(Reminder, on_delete=models.SET_NULL, null=True, blank=True)
+    title = models.CharField(max_length=200)
+    due_date = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'created_at'], condition=models.Q(read=False), name='notification_user_unread_idx'
+            ), # Dashboard list of unread notices
+        ]
+
+    def __str__(self):
+        return f"{self.title} due {self.due_date}"
+
+class ArchivedItem(models.Model):
+    # Completed todo or reminder moved out of the live tables by archive_completed (see main/archive.py)
+    TODO = 'todo'
+    REMINDER = 'reminder'
+    KIND_CHOICES = [
+        (TODO, 'Task'),
+        (REMINDER, 'Reminder'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    original_id = models.BigIntegerField() # Primary key the row had in its live table
+    title = models.CharField(max_length=200)
+    priority = models.CharField(max_length=10, default='MEDIUM')
+    date = models.DateTimeField() # Todo created_time or reminder due_date
+    completed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'completed_at', 'id'], name='archive_user_completed_idx'), # Browse, newest first
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.title} (completed {self.completed_at:%Y-%m-%d})"
+
+class SearchToken(models.Model):
+    # One word of one item's title, the inverted index read by main/search.py
+    TODO = 'todo'
+    REMINDER = 'reminder'
+    EXPENSE = 'expense'
+    SCHEDULE = 'schedule'
+    KIND_CHOICES = [
+        (TODO, 'Task'),
+        (REMINDER, 'Reminder'),
+        (EXPENSE, 'Expense'),
+        (SCHEDULE, 'Event'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    token = models.CharField(max_length=32) # Lowercased word
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField() # Primary key in the kind's table
+    date = models.DateField() # Recency tiebreak, copied so ranking needs no join
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'token', 'kind', 'object_id', 'date'], name='search_user_token_idx'), # Covers lookups
+            models.Index(fields=['kind', 'object_id'], name='search_object_idx'), # Reindex/delete one item
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.kind} {self.object_id}"
+
 class ScheduleItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     date = models.DateField(default=timezone.now) 
     start_time = models.TimeField()
     end_time = models.TimeField()
+    updated_at = models.DateTimeField(auto_now=True) # Change-feed position, update() callers set it themselves
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'start_time'], name='schedule_user_date_start_idx'), # Day timeline
+            models.Index(fields=['user', 'updated_at', 'id'], name='schedule_user_updated_idx'), # Change feed
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.start_time} - {self.title}"
+
+class ScheduleRule(models.Model):
+    # Repeating event, expanded into occurrences per rendered window by main/recurrence.py (never stored per day)
+    DAILY = 'DAILY'
+    WEEKLY = 'WEEKLY'
+    MONTHLY = 'MONTHLY'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default=DAILY)
+    interval = models.PositiveSmallIntegerField(default=1) # Every N days/weeks/months
+    weekdays = models.CharField(max_length=7, blank=True) # Weekly only, digits with Monday=0 e.g. "024"
+    start_date = models.DateField()
+    until = models.DateField(null=True, blank=True) # Inclusive end date
+    count = models.PositiveIntegerField(null=True, blank=True) # Stop after this many occurrences
+    last_date = models.DateField(null=True, editable=False) # Derived from until/count on save, None when open-ended
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'start_date', 'last_date'], name='schedule_rule_user_range_idx'), # Rules active in a window
+        ]
+
+    def __str__(self):
+        return f"{self.get_frequency_display()} from {self.start_date} | {self.start_time} - {self.title}"
+
+class ScheduleException(models.Model):
+    # A single cancelled occurrence of a ScheduleRule
+    rule = models.ForeignKey(ScheduleRule, on_delete=models.CASCADE, related_name='exceptions')
+    date = models.DateField()
+
+    class Meta:
+        unique_together = ('rule', 'date') # Also serves the per-window lookup
+
+    def __str__(self):
+        return f"{self.rule.title} skipped on {self.date}"
+
+class Tombstone(models.Model):
+    # Deleted row of a synced model, so change-feed clients (main/sync.py) can drop their copy
+    EXPENSE = 'expense'
+    TODO = 'todo'
+    REMINDER = 'reminder'
+    SCHEDULE = 'schedule'
+    BUDGET = 'budget'
+    KIND_CHOICES = [
+        (EXPENSE, 'Expense'),
+        (TODO, 'Task'),
+        (REMINDER, 'Reminder'),
+        (SCHEDULE, 'Event'),
+        (BUDGET, 'Budget'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField() # Primary key the row had
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'), # Change feed
+        ]
 
     def __str__(self):
-        return f"{self.date} | {self.start_time} - {self.title}"
\ No newline at end of file
+        return f"{self.kind} #{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,103 @@
+import datetime
+import heapq
+import time
+from django.db import transaction
+from django.utils import timezone
+from . import events
+from .models import Notification, Reminder, ReminderChange
+
+# Due-reminder notifications, driven by the long-running run_reminder_scheduler worker (run a single instance)
+
+POLL_SECONDS = 5 # How often the change journal is checked between deadlines
+LOOKAHEAD = datetime.timedelta(hours=24) # Deadlines held in memory at once
+CATCHUP = datetime.timedelta(hours=24) # Missed deadlines still notified after a restart
+JOURNAL_BATCH = 1000 # Journal rows applied per poll
+JOURNAL_LIMIT = 10000 # Rows kept when no scheduler consumes the journal, start() reloads from the reminders anyway
+JOURNAL_PRUNE_EVERY = 100 # Journal ids between cap checks
+
+def record_changes(reminder_ids):
+    # Journal reminders touched by update()/bulk_update(), which skip the model signals
+    created = ReminderChange.objects.bulk_create([ReminderChange(reminder_id=pk) for pk in reminder_ids])
+    if created and created[-1].pk and created[-1].pk // JOURNAL_PRUNE_EVERY != (created[0].pk - 1) // JOURNAL_PRUNE_EVERY:
+        ReminderChange.objects.filter(pk__lte=created[-1].pk - JOURNAL_LIMIT).delete() # Primary key range, usually empty
+
+class ReminderScheduler:
+    def __init__(self, poll_seconds=POLL_SECONDS, lookahead=LOOKAHEAD, catchup=CATCHUP, clock=timezone.now):
+        self.poll_seconds = poll_seconds
+        self.lookahead = lookahead
+        self.catchup = catchup
+        self.clock = clock
+        self.heap = [] # (due_date, reminder_id), stale entries are dropped when they fire
+        self.loaded_until = None # Deadlines up to here are in the heap
+        self.sent = 0
+
+    def start(self):
+        now = self.clock()
+        ReminderChange.objects.all().delete() # Committed changes are covered by load(), later ones stay journalled
+        self.loaded_until = now - self.catchup
+        self.load(now + self.lookahead)
+
+    def push(self, reminder):
+        if reminder.notified_for != reminder.due_date:
+            heapq.heappush(self.heap, (reminder.due_date, reminder.pk))
+
+    def load(self, until):
+        # Next slice of open deadlines, one range read on reminder_open_due_idx
+        upcoming = Reminder.objects.filter(
+            is_completed=False, due_date__gt=self.loaded_until, due_date__lte=until
+        ).only('id', 'due_date', 'notified_for')
+        for reminder in upcoming.iterator():
+            self.push(reminder)
+        self.loaded_until = until
+
+    def apply_changes(self):
+        # New or edited reminders since the last poll. Every poll rereads the whole (short) journal and deletes only
+        # the rows it read: sequence ids are handed out before commit, so a lower id can become visible after a
+        # higher one and a high-water mark would skip it
+        changes = list(ReminderChange.objects.order_by('pk').values_list('pk', 'reminder_id')[:JOURNAL_BATCH])
+        if not changes:
+            return 0
+        ids = {reminder_id for _, reminder_id in changes}
+        changed = Reminder.objects.filter(
+            pk__in=ids, is_completed=False, due_date__gt=self.clock() - self.catchup, due_date__lte=self.loaded_until
+        )
+        for reminder in changed.only('id', 'due_date', 'notified_for'):
+            self.push(reminder)
+        ReminderChange.objects.filter(pk__in=[pk for pk, _ in changes]).delete() # Applied, keep the journal short
+        return len(changes)
+
+    def fire(self, due_date, reminder_id):
+        # Claim the deadline with a conditional UPDATE so edits, completions and repeats are skipped
+        with transaction.atomic():
+            claimed = Reminder.objects.filter(pk=reminder_id, is_completed=False, due_date=due_date).exclude(
+                notified_for=due_date
+            ).update(notified_for=due_date)
+            if not claimed:
+                return False
+            reminder = Reminder.objects.only('user_id', 'title').get(pk=reminder_id)
+            notification = Notification.objects.create(
+                user_id=reminder.user_id, reminder=reminder, title=reminder.title, due_date=due_date
+            )
+            events.publish( # Reaches open pages when the broker is shared with the web processes
+                reminder.user_id, 'notification', 'added', id=notification.pk, reminder=reminder_id, title=reminder.title,
+            )
+        self.sent += 1
+        return True
+
+    def run_once(self):
+        # One scheduling step, returns the seconds to sleep before the next
+        self.apply_changes()
+        now = self.clock()
+        if now > self.loaded_until - self.lookahead / 2: # Refill before the window runs dry
+            self.load(now + self.lookahead)
+        while self.heap and self.heap[0][0] <= now:
+            self.fire(*heapq.heappop(self.heap))
+        wake = self.loaded_until - self.lookahead / 2
+        if self.heap:
+            wake = min(wake, self.heap[0][0])
+        return max(0.0, min((wake - self.clock()).total_seconds(), self.poll_seconds))
+
+    def run(self, sleep=time.sleep, should_stop=lambda: False):
+        self.start()
+        while not should_stop():
+            sleep(self.run_once())
@@ -0,0 +1,18 @@
+import base64
+import binascii
+
+def encode_cursor(*values):
+    # Opaque, URL-safe token for a keyset position
+    raw = '|'.join(str(value) for value in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token, parts):
+    # List of string values, or None when the token is missing or malformed
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    values = raw.split('|')
+    return values if len(values) == parts else None
@@ -0,0 +1,92 @@
+import calendar
+import datetime
+from itertools import islice
+from django.db.models import Prefetch, Q
+from .models import ScheduleException, ScheduleRule
+
+# Lazy expansion of ScheduleRule rows: occurrences only exist for the window being rendered
+
+class Occurrence:
+    # One instance of a rule, with the attributes the templates read from a ScheduleItem
+    is_recurring = True
+
+    def __init__(self, rule, day):
+        self.rule_id = rule.pk
+        self.title = rule.title
+        self.date = day
+        self.start_time = rule.start_time
+        self.end_time = rule.end_time
+
+    def __repr__(self):
+        return f"<Occurrence rule={self.rule_id} {self.date} {self.start_time}>"
+
+def _round_up(value, step):
+    return -(-value // step) * step # First multiple of step at or after value
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+def _weekdays(rule):
+    return sorted({int(day) for day in rule.weekdays}) or [rule.start_date.weekday()]
+
+def occurrence_dates(rule, start, end):
+    # Days in [start, end] the rule fires on. Jumps straight to the first period in the window, so the work
+    # is proportional to the window size whatever the rule's age
+    first = max(start, rule.start_date)
+    last = min(end, rule.last_date) if rule.last_date else end
+    if first > last:
+        return
+    step = rule.interval or 1
+    if rule.frequency == ScheduleRule.DAILY:
+        day = rule.start_date + datetime.timedelta(days=_round_up((first - rule.start_date).days, step))
+        while day <= last:
+            yield day
+            day += datetime.timedelta(days=step)
+    elif rule.frequency == ScheduleRule.WEEKLY:
+        anchor = rule.start_date - datetime.timedelta(days=rule.start_date.weekday()) # Monday of the first week
+        week = anchor + datetime.timedelta(weeks=_round_up((first - anchor).days // 7, step))
+        weekdays = _weekdays(rule)
+        while week <= last:
+            for weekday in weekdays:
+                day = week + datetime.timedelta(days=weekday)
+                if first <= day <= last:
+                    yield day
+            week += datetime.timedelta(weeks=step)
+    elif rule.frequency == ScheduleRule.MONTHLY:
+        origin = _month_index(rule.start_date)
+        index = origin + _round_up(_month_index(first) - origin, step)
+        while True:
+            year, month = divmod(index, 12)
+            if datetime.date(year, month + 1, 1) > last:
+                return
+            if rule.start_date.day <= calendar.monthrange(year, month + 1)[1]: # Months without that day are skipped
+                day = datetime.date(year, month + 1, rule.start_date.day)
+                if first <= day <= last: # The month can start in the window and the day fall after it
+                    yield day
+            index += step
+
+def last_date(rule):
+    # Final day the rule can fire on, None when it never ends. Stored on the row so window lookups stay indexed
+    if not rule.count:
+        return rule.until
+    rule.last_date = rule.until # Bound the walk below by until only
+    fired = list(islice(occurrence_dates(rule, rule.start_date, rule.until or datetime.date.max), rule.count))
+    return fired[-1] if fired else rule.start_date
+
+def active_rules(user, start, end):
+    # Rules whose active range overlaps [start, end], served by schedule_rule_user_range_idx
+    return ScheduleRule.objects.filter(user=user, start_date__lte=end).filter(
+        Q(last_date__gte=start) | Q(last_date__isnull=True)
+    )
+
+def expand(user, start, end):
+    # Occurrences of every active rule inside [start, end], minus exceptions, sorted by day and start time
+    exceptions = ScheduleException.objects.filter(date__gte=start, date__lte=end)
+    rules = active_rules(user, start, end).prefetch_related(
+        Prefetch('exceptions', queryset=exceptions, to_attr='window_exceptions')
+    )
+    occurrences = []
+    for rule in rules:
+        skipped = {exception.date for exception in rule.window_exceptions}
+        occurrences.extend(Occurrence(rule, day) for day in occurrence_dates(rule, start, end) if day not in skipped)
+    return sorted(occurrences, key=lambda occurrence: (occurrence.date, occurrence.start_time))
@@ -0,0 +1,118 @@
+import datetime
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from .models import Expense, ExpenseRollup
+
+CATEGORY_LABELS = dict(Expense.CATEGORY_CHOICES)
+CATEGORY_ORDER = [code for code, _ in Expense.CATEGORY_CHOICES]
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value) # Dates assigned as strings before a refresh
+    return value
+
+def _as_amount(value):
+    return value if isinstance(value, Decimal) else Decimal(str(value)) # Form strings and floats before a refresh
+
+def apply_delta(user_id, year, month, category, amount, count):
+    # Shift one rollup row by a signed amount/count without reading it first
+    rows = ExpenseRollup.objects.filter(user_id=user_id, year=year, month=month, category=category)
+    with transaction.atomic():
+        if rows.update(total=F('total') + amount, count=F('count') + count):
+            return
+        try:
+            with transaction.atomic():
+                ExpenseRollup.objects.create(
+                    user_id=user_id, year=year, month=month, category=category, total=amount, count=count
+                )
+        except IntegrityError:
+            rows.update(total=F('total') + amount, count=F('count') + count) # Row created concurrently
+
+def add_expense(expense, sign=1):
+    day = _as_date(expense.date)
+    apply_delta(expense.user_id, day.year, day.month, expense.category, sign * _as_amount(expense.amount), sign)
+
+def move_expense(previous, expense):
+    # previous is a dict of the stored row, expense the instance that replaced it
+    day, prev_day = _as_date(expense.date), previous['date']
+    same_bucket = (
+        previous['user_id'] == expense.user_id and previous['category'] == expense.category
+        and (prev_day.year, prev_day.month) == (day.year, day.month)
+    )
+    if same_bucket:
+        amount = _as_amount(expense.amount)
+        if previous['amount'] != amount:
+            apply_delta(expense.user_id, day.year, day.month, expense.category, amount - previous['amount'], 0)
+        return
+    apply_delta(previous['user_id'], prev_day.year, prev_day.month, previous['category'], -previous['amount'], -1)
+    add_expense(expense)
+
+def category_totals(user, year, month):
+    # {label: Decimal total} in the order of Expense.CATEGORY_CHOICES
+    rows = ExpenseRollup.objects.filter(user=user, year=year, month=month, count__gt=0).values_list('category', 'total')
+    rows = sorted(rows, key=lambda row: CATEGORY_ORDER.index(row[0]) if row[0] in CATEGORY_ORDER else len(CATEGORY_ORDER))
+    return {CATEGORY_LABELS.get(category, category): total for category, total in rows}
+
+def _actual_rollups(user=None):
+    expenses = Expense.objects.all() if user is None else Expense.objects.filter(user=user)
+    return (
+        expenses.annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('user_id', 'year', 'month', 'category')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+def rebuild_rollups(user=None, batch_size=1000):
+    # Recompute every rollup row (for one user or everyone) from the raw Expense table
+    stored = ExpenseRollup.objects.all() if user is None else ExpenseRollup.objects.filter(user=user)
+    with transaction.atomic():
+        stored.delete()
+        batch, created = [], 0
+        for row in _actual_rollups(user).iterator():
+            batch.append(ExpenseRollup(**row))
+            if len(batch) >= batch_size:
+                ExpenseRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ExpenseRollup.objects.bulk_create(batch)
+    return created + len(batch)
+
+def verify_rollups(user=None):
+    # List of (key, expected, stored) tuples where the rollups disagree with Expense
+    stored = ExpenseRollup.objects.all() if user is None else ExpenseRollup.objects.filter(user=user)
+    stored = {
+        (r['user_id'], r['year'], r['month'], r['category']): (r['total'], r['count'])
+        for r in stored.filter(count__gt=0).values('user_id', 'year', 'month', 'category', 'total', 'count')
+    }
+    mismatches = []
+    for row in _actual_rollups(user).iterator():
+        key = (row['user_id'], row['year'], row['month'], row['category'])
+        expected = (row['total'], row['count'])
+        found = stored.pop(key, None)
+        if found != expected:
+            mismatches.append((key, expected, found))
+    mismatches.extend((key, None, found) for key, found in stored.items())
+    return mismatches
+
+def month_range(start, end):
+    # [(year, month), ...] from start to end inclusive, both given as (year, month)
+    months, (year, month) = [], start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def monthly_totals(user, start, end):
+    # {(year, month): {label: Decimal}} for a range of months, read in one query
+    rows = (
+        ExpenseRollup.objects.filter(user=user, year__gte=start[0], year__lte=end[0], count__gt=0)
+        .exclude(year=start[0], month__lt=start[1])
+        .exclude(year=end[0], month__gt=end[1])
+        .values_list('year', 'month', 'category', 'total')
+    )
+    totals = {}
+    for year, month, category, total in rows:
+        totals.setdefault((year, month), {})[CATEGORY_LABELS.get(category, category)] = total
+    return totals
@@ -0,0 +1,45 @@
+import datetime
+import heapq
+from . import recurrence
+from .models import ScheduleItem
+
+# Overlap checks and free time for the planner timeline (one-off items plus expanded repeating events)
+
+def conflicts(user, day, start, end, exclude=None):
+    # Events on day overlapping [start, end), a single range lookup on schedule_user_date_start_idx plus that day's occurrences
+    items = ScheduleItem.objects.filter(user=user, date=day, start_time__lt=end, end_time__gt=start).order_by('start_time')
+    if exclude:
+        items = items.exclude(pk=exclude) # The item being edited
+    occurrences = [o for o in recurrence.expand(user, day, day) if o.start_time < end and o.end_time > start]
+    return sorted([*items, *occurrences], key=lambda item: item.start_time)
+
+def busy_intervals(user, start_date, end_date):
+    # (date, start_time, end_time) of every event in the range as one stream sorted by date and start
+    rows = ScheduleItem.objects.filter(user=user, date__gte=start_date, date__lte=end_date).order_by('date', 'start_time')
+    occurrences = [(o.date, o.start_time, o.end_time) for o in recurrence.expand(user, start_date, end_date)]
+    return heapq.merge(rows.values_list('date', 'start_time', 'end_time').iterator(), occurrences)
+
+def free_slots(user, start_date, end_date, day_start=datetime.time.min, day_end=None, min_minutes=0):
+    # Gaps between events in a single sweep, each day clipped to [day_start, day_end) (day_end None means midnight)
+    min_length = datetime.timedelta(minutes=min_minutes)
+    busy = busy_intervals(user, start_date, end_date)
+    pending = next(busy, None)
+    slots = []
+
+    def add(begin, finish):
+        if finish > begin and finish - begin >= min_length:
+            slots.append((begin, finish))
+
+    day = start_date
+    while day <= end_date:
+        cursor = datetime.datetime.combine(day, day_start)
+        close = datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min)
+        if day_end:
+            close = datetime.datetime.combine(day, day_end)
+        while pending and pending[0] == day:
+            add(cursor, min(datetime.datetime.combine(day, pending[1]), close))
+            cursor = max(cursor, datetime.datetime.combine(day, pending[2])) # Overlapping events extend the busy run
+            pending = next(busy, None)
+        add(cursor, close)
+        day += datetime.timedelta(days=1)
+    return slots
@@ -0,0 +1,126 @@
+import datetime
+import re
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+from django.urls import reverse
+from django.utils import timezone
+from .models import Expense, Reminder, ScheduleItem, SearchToken, Todo
+
+# Inverted index over item titles: one SearchToken row per (item, word), kept in sync by the model signals
+# (signals.py) and by the bulk paths that skip them. Portable across SQLite and PostgreSQL, unlike FTS5
+
+MIN_TOKEN = 2 # Shorter words are not indexed
+MAX_TOKEN = 32 # Longer words are cut, a prefix search still finds them
+MIN_PREFIX = 2 # Query words shorter than this only match whole words
+MAX_TERMS = 5
+PREFIX_END = '\U0010ffff' # Sorts after every character, so [term, term + PREFIX_END) is "starts with term"
+_WORD = re.compile(r'\w+')
+
+SEARCH_SOURCES = {
+    SearchToken.TODO: (Todo, 'planned_date'), # Model, field used for the recency tiebreak
+    SearchToken.REMINDER: (Reminder, 'due_date'),
+    SearchToken.EXPENSE: (Expense, 'date'),
+    SearchToken.SCHEDULE: (ScheduleItem, 'date'),
+}
+KINDS = {model: kind for kind, (model, _) in SEARCH_SOURCES.items()}
+
+def tokenize(text):
+    # Distinct lowercased words in order of appearance
+    words = dict.fromkeys(word[:MAX_TOKEN] for word in _WORD.findall(text.lower()) if len(word) >= MIN_TOKEN)
+    return list(words)
+
+def _as_date(value):
+    return timezone.localdate(value) if isinstance(value, datetime.datetime) else value
+
+def _tokens(instance):
+    kind = KINDS[type(instance)]
+    day = _as_date(getattr(instance, SEARCH_SOURCES[kind][1]))
+    return [
+        SearchToken(user_id=instance.user_id, kind=kind, object_id=instance.pk, token=token, date=day)
+        for token in tokenize(instance.title)
+    ]
+
+def index_objects(instances, batch_size=1000):
+    # (Re)index saved rows of one model, replacing their previous tokens
+    instances = list(instances)
+    if not instances:
+        return
+    kind = KINDS[type(instances[0])]
+    with transaction.atomic():
+        SearchToken.objects.filter(kind=kind, object_id__in=[instance.pk for instance in instances]).delete()
+        SearchToken.objects.bulk_create([token for instance in instances for token in _tokens(instance)],
+                                        batch_size=batch_size)
+
+def unindex(model, ids):
+    SearchToken.objects.filter(kind=KINDS[model], object_id__in=list(ids)).delete()
+
+def redate(model, ids, day):
+    # Bulk moves change the recency key only, the words stay
+    SearchToken.objects.filter(kind=KINDS[model], object_id__in=list(ids)).update(date=_as_date(day))
+
+def rebuild_index(user=None, batch_size=1000):
+    # Recreate every token (for one user or everyone) from the live tables, returns the number of tokens written
+    tokens = SearchToken.objects.all() if user is None else SearchToken.objects.filter(user=user)
+    written = 0
+    with transaction.atomic():
+        tokens.delete()
+        for model, _ in SEARCH_SOURCES.values():
+            rows = model.objects.all() if user is None else model.objects.filter(user=user)
+            batch = []
+            for instance in rows.only('id', 'user_id', 'title', SEARCH_SOURCES[KINDS[model]][1]).iterator(batch_size):
+                batch.extend(_tokens(instance))
+                if len(batch) >= batch_size:
+                    SearchToken.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            SearchToken.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+def search(user, query, page=1, page_size=20):
+    """Ranked matches for query as (results, has_next).
+
+    Every query word must match a title word, whole words score above prefixes and newer items break ties.
+    Runs as one grouped range read per word on search_user_token_idx, then one lookup per kind for the page.
+    """
+    terms = tokenize(query)[:MAX_TERMS]
+    if not terms:
+        return [], False
+    matches = Q()
+    scores = {}
+    for index, term in enumerate(terms):
+        exact = Q(token=term)
+        prefix = Q(token__gte=term, token__lt=term + PREFIX_END) if len(term) >= MIN_PREFIX else exact
+        matches |= Q(user=user) & prefix # user inside each branch, so every branch is an index range
+        scores[f'term{index}'] = Max(Case(When(exact, then=Value(2)), When(prefix, then=Value(1)), default=Value(0)),
+                                     output_field=IntegerField())
+    hits = (
+        SearchToken.objects.filter(matches).values('kind', 'object_id')
+        .annotate(day=Max('date'), **scores).filter(**{f'{name}__gt': 0 for name in scores}) # All words present
+        .annotate(score=sum((F(name) for name in scores), Value(0)))
+        .order_by('-score', '-day', '-object_id')
+    )
+    offset = (page - 1) * page_size
+    rows = list(hits[offset:offset + page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    found = {}
+    for kind, (model, _) in SEARCH_SOURCES.items():
+        ids = [row['object_id'] for row in rows if row['kind'] == kind]
+        if ids:
+            found.update(((kind, item.pk), item) for item in model.objects.filter(user=user, pk__in=ids))
+    results = []
+    for row in rows:
+        item = found.get((row['kind'], row['object_id']))
+        if item is not None: # Deleted since the tokens were read
+            results.append(_result(row['kind'], item, row['score']))
+    return results, has_next
+
+def _result(kind, item, score):
+    day = _as_date(getattr(item, SEARCH_SOURCES[kind][1]))
+    if kind == SearchToken.EXPENSE:
+        url = f"{reverse('expenses')}?year={day.year}&month={day.month}"
+    else:
+        url = reverse('planner_page', args=[day.strftime('%Y-%m-%d')])
+    return {'kind': kind, 'id': item.pk, 'title': item.title, 'date': day, 'url': url, 'score': score}
@@ -0,0 +1,111 @@
+import datetime
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from . import recurrence, search
+from .models import Expense, Reminder, ScheduleItem, ScheduleRule, Todo
+from .rollups import rebuild_rollups
+
+# Synthetic accounts for load tests and benchmarks (seed_load_data command, benchmarks/). Rows are written with
+# bulk_create, which skips the model signals, so the derived data (rollups, rule end dates, search tokens) is
+# filled in here
+
+DEFAULT_PASSWORD = 'load-pass-123'
+HISTORY_DAYS = 90 # Expenses, todos and events are spread over this many past days
+WEEKDAY_SETS = ['0', '024', '13', '01234', '5']
+# Titles are drawn from small vocabularies so searches hit realistic numbers of rows
+VERBS = ['Call', 'Email', 'Buy', 'Fix', 'Clean', 'Book', 'Plan', 'Review', 'Pay', 'Write', 'Read', 'Prepare',
+         'Update', 'Cancel', 'Renew', 'Return', 'Order', 'Finish', 'Check', 'Pick up']
+NOUNS = ['dentist', 'groceries', 'report', 'car', 'insurance', 'flights', 'kitchen', 'garden', 'invoice', 'slides',
+         'taxes', 'birthday gift', 'laptop', 'passport', 'gym membership', 'rent', 'library books', 'bike', 'budget',
+         'doctor', 'plumber', 'hotel', 'tickets', 'landlord', 'bank', 'phone plan', 'website', 'newsletter']
+EXPENSE_TITLES = ['Lunch', 'Coffee', 'Groceries', 'Taxi', 'Train ticket', 'Dinner', 'Electricity bill', 'Internet',
+                  'Movie', 'Pharmacy', 'Books', 'Fuel', 'Parking', 'Gym', 'Snacks', 'Phone credit', 'Haircut', 'Gift',
+                  'Clothes', 'Breakfast']
+EVENT_TITLES = ['Standup', 'Team meeting', 'Gym', 'Yoga', 'Lecture', 'Study group', 'Doctor appointment',
+                'Lunch with friends', 'Client call', 'Dentist', 'Piano lesson', 'Football', 'Planning session',
+                'Code review']
+
+def seed_rows(users, expenses=2000, todos=300, reminders=300, schedule=300, rules=10, seed=1, batch_size=1000):
+    # Per-user volumes of every tracked model for the given users, returns the number of rows written
+    rng = random.Random(seed)
+    now = timezone.now()
+    today = timezone.localdate()
+    categories = [code for code, _ in Expense.CATEGORY_CHOICES]
+    priorities = [code for code, _ in Todo.PRIORITY_CHOICES]
+
+    def day():
+        return today - datetime.timedelta(days=rng.randint(0, HISTORY_DAYS))
+
+    def task():
+        return f'{rng.choice(VERBS)} {rng.choice(NOUNS)}'
+
+    def hour():
+        return datetime.time(rng.randint(6, 20), rng.choice([0, 15, 30, 45]))
+
+    def later(start, minutes):
+        return (datetime.datetime.combine(today, start) + datetime.timedelta(minutes=minutes)).time() # Events start by 20:45, never past midnight
+
+    written = 0
+    with transaction.atomic():
+        for user in users:
+            Expense.objects.bulk_create([
+                Expense(user=user, title=rng.choice(EXPENSE_TITLES), amount=rng.randint(100, 50000) / 100,
+                        category=rng.choice(categories), date=day())
+                for _ in range(expenses)
+            ], batch_size=batch_size)
+
+            planned = [today - datetime.timedelta(days=rng.randint(-7, HISTORY_DAYS)) for _ in range(todos)] # Some upcoming
+            closed = [rng.random() < 0.6 for _ in range(todos)]
+            Todo.objects.bulk_create([
+                Todo(user=user, title=task(), done=done, priority=rng.choice(priorities), planned_date=plan,
+                     completed_at=timezone.make_aware(datetime.datetime.combine(min(plan, today), datetime.time(18)))
+                     if done else None) # Archivable like real data
+                for plan, done in zip(planned, closed)
+            ], batch_size=batch_size)
+
+            due_dates = [now + datetime.timedelta(hours=rng.randint(-24 * HISTORY_DAYS, 24 * 30)) for _ in range(reminders)]
+            closed = [rng.random() < 0.6 for _ in range(reminders)]
+            Reminder.objects.bulk_create([
+                Reminder(user=user, title=task(), priority=rng.choice(priorities), due_date=due,
+                         is_completed=done, completed_at=min(due, now) if done else None)
+                for due, done in zip(due_dates, closed)
+            ], batch_size=batch_size)
+
+            events = []
+            for _ in range(schedule):
+                start = hour()
+                events.append(ScheduleItem(user=user, title=rng.choice(EVENT_TITLES), date=day(), start_time=start,
+                                           end_time=later(start, rng.choice([30, 60, 90]))))
+            ScheduleItem.objects.bulk_create(events, batch_size=batch_size)
+
+            repeating = []
+            for i in range(rules):
+                start = hour()
+                rule = ScheduleRule(user=user, title=f'Routine {i}', start_time=start, end_time=later(start, 30),
+                                    frequency=rng.choice([ScheduleRule.DAILY, ScheduleRule.WEEKLY, ScheduleRule.MONTHLY]),
+                                    interval=rng.choice([1, 1, 2]), start_date=day())
+                if rule.frequency == ScheduleRule.WEEKLY:
+                    rule.weekdays = rng.choice(WEEKDAY_SETS)
+                if rng.random() < 0.3:
+                    rule.count = rng.randint(5, 40)
+                rule.last_date = recurrence.last_date(rule) # pre_save receiver is skipped by bulk_create
+                repeating.append(rule)
+            ScheduleRule.objects.bulk_create(repeating, batch_size=batch_size)
+            search.rebuild_index(user, batch_size=batch_size)
+            written += expenses + todos + reminders + schedule + rules
+    return written
+
+def seed_users(count, prefix='load', password=DEFAULT_PASSWORD, batch_size=1000, **volumes):
+    # Create users prefix0..prefixN-1 (sharing one password hash) and fill them with seed_rows()
+    hashed = make_password(password) # Hashing is deliberately slow, do it once
+    User.objects.bulk_create([
+        User(username=f'{prefix}{i}', password=hashed) for i in range(count)
+    ], batch_size=batch_size)
+    users = list(User.objects.filter(username__in=[f'{prefix}{i}' for i in range(count)]).order_by('pk'))
+    seed_rows(users, batch_size=batch_size, **volumes)
+    for user in users: # Only the seeded accounts, everyone else's rollups are left alone
+        rebuild_rollups(user, batch_size=batch_size)
+    return users
@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from . import backends, caching, events, instrumentation, notifications, recurrence, rollups, search, sync
+from .models import Expense, MonthlyBudget, Notification, Reminder, ScheduleItem, ScheduleRule, Todo, Tombstone
+
+def _deleting_account(origin):
+    # post_delete origin is the instance or queryset delete() was called on, a User means a cascade
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+# Expense rollups ------------------------------------------------------------------------------------------------------------------------
+@receiver(pre_save, sender=Expense)
+def remember_expense(sender, instance, **kwargs):
+    instance._rollup_previous = None
+    if not instance._state.adding and instance.pk: # Only edits need the stored row
+        instance._rollup_previous = (
+            Expense.objects.filter(pk=instance.pk).values('user_id', 'date', 'category', 'amount').first()
+        )
+
+@receiver(post_save, sender=Expense)
+def rollup_saved_expense(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_rollup_previous', None)
+    with transaction.atomic():
+        if previous:
+            rollups.move_expense(previous, instance)
+        else:
+            rollups.add_expense(instance)
+
+@receiver(post_delete, sender=Expense)
+def rollup_deleted_expense(sender, instance, origin=None, **kwargs):
+    if _deleting_account(origin): # The cascade has already removed the user's rollups
+        return
+    with transaction.atomic():
+        rollups.add_expense(instance, sign=-1)
+
+# Schedule rules -------------------------------------------------------------------------------------------------------------------------
+@receiver(pre_save, sender=ScheduleRule)
+def set_rule_last_date(sender, instance, **kwargs):
+    instance.last_date = recurrence.last_date(instance)
+
+# Completion times -----------------------------------------------------------------------------------------------------------------------
+@receiver(pre_save, sender=Todo)
+@receiver(pre_save, sender=Reminder)
+def stamp_completion(sender, instance, **kwargs):
+    # Views flipping the flag with update() set completed_at themselves (views._completion_stamp)
+    completed = instance.done if sender is Todo else instance.is_completed
+    if not completed:
+        instance.completed_at = None
+    elif instance.completed_at is None:
+        instance.completed_at = timezone.now()
+
+# Reminder change journal ----------------------------------------------------------------------------------------------------------------
+@receiver(post_save, sender=Reminder)
+@receiver(post_delete, sender=Reminder)
+def journal_reminder(sender, instance, **kwargs):
+    notifications.record_changes([instance.pk]) # Same transaction as the change, seen by the scheduler once committed
+
+# Search index ---------------------------------------------------------------------------------------------------------------------------
+@receiver(post_save, sender=Todo)
+@receiver(post_save, sender=Reminder)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=ScheduleItem)
+def index_saved_item(sender, instance, **kwargs):
+    search.index_objects([instance])
+
+@receiver(post_delete, sender=Todo)
+@receiver(post_delete, sender=Reminder)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=ScheduleItem)
+def unindex_deleted_item(sender, instance, **kwargs):
+    search.unindex(sender, [instance.pk])
+
+# Per-user cache versions ----------------------------------------------------------------------------------------------------------------
+# Bumps only reach processes sharing this cache; writes from other processes (reminder scheduler, archive sweep,
+# other workers) invalidate through caching.change_markers, which every cache key also carries
+@receiver(post_save, sender=Todo)
+@receiver(post_save, sender=Reminder)
+@receiver(post_save, sender=ScheduleItem)
+@receiver(post_save, sender=ScheduleRule)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=MonthlyBudget)
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Todo)
+@receiver(post_delete, sender=Reminder)
+@receiver(post_delete, sender=ScheduleItem)
+@receiver(post_delete, sender=ScheduleRule)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=MonthlyBudget)
+@receiver(post_delete, sender=Notification)
+def bump_cache_version(sender, instance, **kwargs):
+    transaction.on_commit(lambda: caching.bump_user_version(instance.user_id)) # Readers never cache pre-commit data
+
+# Change feed tombstones -----------------------------------------------------------------------------------------------------------------
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Todo)
+@receiver(post_delete, sender=Reminder)
+@receiver(post_delete, sender=ScheduleItem)
+@receiver(post_delete, sender=MonthlyBudget)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    if _deleting_account(origin): # The tombstones would go with the account
+        return
+    Tombstone.objects.create(user_id=instance.user_id, kind=sync.KINDS[sender], object_id=instance.pk)
+
+# Cached users ---------------------------------------------------------------------------------------------------------------------------
+@receiver(post_save, sender=User) # Password changes, last_login, profile edits
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    transaction.on_commit(lambda: backends.forget_user(instance.pk))
+    backends.forget_user(instance.pk) # And now, so this request doesn't read the old copy either
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        backends.forget_user(user.pk)
+
+# Live events ----------------------------------------------------------------------------------------------------------------------------
+@receiver(setting_changed)
+def reset_event_broker(sender, setting, **kwargs):
+    if setting == 'EVENT_BROKER':
+        events.reset_broker() # Tests swap in a stand-in broker
+
+# Database connections -------------------------------------------------------------------------------------------------------------------
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    if settings.PERF_INSTRUMENTATION:
+        instrumentation.install(connection) # Covers the async views' query threads too
@@ -0,0 +1,99 @@
+import datetime
+import heapq
+from django.conf import settings
+from django.utils import timezone
+from .models import Expense, MonthlyBudget, Reminder, ScheduleItem, Todo, Tombstone
+from .pagination import decode_cursor, encode_cursor
+
+# Change feed for clients keeping a local copy: synced rows carry updated_at and deletions leave a Tombstone.
+# A page merges one keyset range read per source on its (user, updated_at, id) index, so a sync costs what changed
+# since the cursor, not the size of the account.
+# updated_at is stamped in Python before the write commits, so a row stamped T1 can become visible after one stamped
+# T2 > T1. Rows newer than SYNC_SETTLE_SECONDS are held back until every transaction that could still commit an
+# older stamp has finished, so no cursor ever moves past an invisible row. Tombstones are kept SYNC_TOMBSTONE_DAYS
+# (pruned by archive_completed). Besides its position a cursor records the time the client's copy is complete up to
+# (the settle horizon once the feed is drained, even an empty one), and a cursor whose copy is older than the
+# retention gets CursorExpired and the client does a full sync. Idle accounts keep syncing: only idle clients expire
+
+class CursorExpired(Exception):
+    pass
+
+SYNC_SOURCES = { # Kind: model, rows stamped with the same time are merged in this order
+    Tombstone.EXPENSE: Expense,
+    Tombstone.TODO: Todo,
+    Tombstone.REMINDER: Reminder,
+    Tombstone.SCHEDULE: ScheduleItem,
+    Tombstone.BUDGET: MonthlyBudget,
+}
+KINDS = {model: kind for kind, model in SYNC_SOURCES.items()}
+DELETED = 'deleted' # Tombstones are one more source, merged after the models
+SOURCES = [*SYNC_SOURCES, DELETED]
+
+def record_deletions(model, rows):
+    # Tombstones for rows removed without the post_delete signal (raw deletes)
+    Tombstone.objects.bulk_create([Tombstone(user_id=row.user_id, kind=KINDS[model], object_id=row.pk) for row in rows])
+
+def prune_tombstones(days=None, now=None):
+    # Drop deletions older than the retention window, returns the number removed
+    days = settings.SYNC_TOMBSTONE_DAYS if days is None else days
+    cutoff = (now or timezone.now()) - datetime.timedelta(days=days)
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+def _position(cursor):
+    # ((time, source index, id) the page starts after, time the client is complete up to), ValueError when malformed
+    values = decode_cursor(cursor, 4)
+    if values is None:
+        raise ValueError("Malformed change cursor")
+    try:
+        stamp, index, pk = datetime.datetime.fromisoformat(values[0]), int(values[1]), int(values[2])
+        synced = datetime.datetime.fromisoformat(values[3])
+    except ValueError:
+        raise ValueError("Malformed change cursor")
+    if not 0 <= index < len(SOURCES):
+        raise ValueError("Malformed change cursor")
+    return (stamp, index, pk), synced
+
+def _source_rows(user, index, position, horizon, limit):
+    name = SOURCES[index]
+    rows = Tombstone.objects.filter(user=user) if name == DELETED else SYNC_SOURCES[name].objects.filter(user=user)
+    field = 'deleted_at' if name == DELETED else 'updated_at'
+    rows = rows.filter(**{f'{field}__lt': horizon}) # Not settled yet, returned by a later sync
+    if position:
+        stamp, after_index, after_pk = position
+        if index < after_index: # Sources before the cursor's own already returned this instant
+            rows = rows.filter(**{f'{field}__gt': stamp})
+        elif index > after_index:
+            rows = rows.filter(**{f'{field}__gte': stamp})
+        else:
+            rows = rows.filter(**{f'{field}__gte': stamp}).exclude(**{field: stamp, 'id__lte': after_pk})
+    return [(getattr(row, field), index, row.pk, row) for row in rows.order_by(field, 'id')[:limit]]
+
+def changes(user, cursor=None, limit=200):
+    """Rows changed after cursor as ([(kind, row, deleted), ...], next cursor, has_more).
+
+    Every source is read in (time, id) order up to limit + 1 rows and the lists are merged on (time, source, id),
+    which is also what the cursor records. No cursor starts from the beginning (full sync).
+    """
+    now = timezone.now()
+    position, synced = _position(cursor) if cursor else (None, None)
+    if synced and synced < now - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+        raise CursorExpired("Cursor is older than the kept deletions, sync again from the start")
+    horizon = now - datetime.timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    merged = list(heapq.merge(
+        *(_source_rows(user, index, position, horizon, limit + 1) for index in range(len(SOURCES))),
+        key=lambda entry: entry[:3],
+    ))
+    has_more = len(merged) > limit
+    page = merged[:limit]
+    if page:
+        position = page[-1][:3]
+    if position: # No position yet means an empty account, the next sync starts from the beginning again
+        stamp, index, pk = position
+        cursor = encode_cursor(stamp.isoformat(), index, pk, (page[-1][0] if has_more else horizon).isoformat())
+    entries = []
+    for _, index, _, row in page:
+        if SOURCES[index] == DELETED:
+            entries.append((row.kind, row, True))
+        else:
+            entries.append((SOURCES[index], row, False))
+    return entries, cursor, has_more
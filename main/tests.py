@@ -1,3 +1,1438 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import re
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from . import async_views, backends, caching, events, instrumentation, notifications, recurrence, rollups, search, urls
+from .archive import archive_completed
+from .importers import import_expenses
+from .middleware import PerformanceMiddleware
+from .models import (
+    ArchivedItem, Expense, ExpenseRollup, MonthlyBudget, Notification, Reminder, ReminderChange, ScheduleException,
+    ScheduleItem, ScheduleRule, SearchToken, Todo, Tombstone
+)
+from .notifications import ReminderScheduler
+from .pagination import encode_cursor
+from .rollups import verify_rollups
 
-# Create your tests here.
+
+INDEX_USED = re.compile(r' USING (?:COVERING )?INDEX (\w+)')
+
+def main_queries(captured):
+    return [query['sql'] for query in captured if '"main_' in query['sql']]
+
+
+class RecordingBroker:
+    # Stand-in for the live event broker, keeps everything published
+    def __init__(self):
+        self.published = []
+
+    def publish(self, user_id, event):
+        self.published.append((user_id, event))
+
+
+# Query plans -----------------------------------------------------------------------------------------------------------------------------
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTests(TestCase):
+    """Every query the hot views run against main_* tables must be served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('planner', password='secret-pass-123')
+        today = timezone.now().date()
+        Expense.objects.create(user=cls.user, title='Lunch', amount=10, category='FOOD', date=today)
+        Todo.objects.create(user=cls.user, title='Read')
+        Reminder.objects.create(user=cls.user, title='Pay rent', due_date=timezone.now())
+        ScheduleItem.objects.create(
+            user=cls.user, title='Standup', date=today, start_time=datetime.time(9), end_time=datetime.time(10)
+        )
+        rule = ScheduleRule.objects.create(
+            user=cls.user, title='Gym', start_time=datetime.time(18), end_time=datetime.time(19), start_date=today
+        )
+        ScheduleException.objects.create(rule=rule, date=today + datetime.timedelta(days=1))
+
+    def setUp(self):
+        cache.clear() # Cached dashboards would skip the queries under test
+        self.client.force_login(self.user)
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            if callable(url):
+                url()
+            else:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        plans = []
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or '"main_' not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        self.assertTrue(plans, f"{url} ran no queries against main tables")
+        return plans
+
+    def assertIndexedQueries(self, url, expected_indexes):
+        used = set()
+        for sql, details in self.query_plans(url):
+            scans = [detail for detail in details if detail.startswith('SCAN main_')]
+            self.assertFalse(scans, f"{url} scans a whole table:\n{sql}\n{details}")
+            used.update(match[1] for match in (INDEX_USED.search(detail) for detail in details) if match)
+        self.assertLessEqual(expected_indexes, used, f"{url} did not use the composite indexes")
+
+    def test_dashboard_uses_indexes(self):
+        self.assertIndexedQueries('/', {
+            'todo_user_pending_planned_idx', 'reminder_user_open_due_idx', 'schedule_user_date_start_idx',
+            'schedule_rule_user_range_idx', 'notification_user_unread_idx',
+        })
+
+    def test_planner_uses_indexes(self):
+        expected = {
+            'schedule_user_date_start_idx', 'reminder_user_open_due_idx', 'todo_user_planned_idx',
+            'schedule_rule_user_range_idx',
+        }
+        self.assertIndexedQueries('/planner/', expected)
+        self.assertIndexedQueries('/planner/2020-01-01/', expected)
+
+    def test_planner_day_is_an_index_range(self):
+        day = datetime.date(2020, 1, 1)
+        for offset in (-1, 0, 0, 0, 1):
+            Todo.objects.create(user=self.user, title='Plan', planned_date=day + datetime.timedelta(days=offset))
+        Todo.objects.filter(user=self.user, planned_date=day).update(done=True)
+        Todo.objects.create(user=self.user, title='Open', planned_date=day)
+        response = self.client.get('/planner/2020-01-01/')
+        self.assertEqual(len(response.context['simple_todos']), 4) # Only the day's rows come back
+        self.assertFalse(response.context['simple_todos'][0].done) # Open tasks first
+        todo_plans = [details for sql, details in self.query_plans('/planner/2020-01-01/') if 'main_todo' in sql]
+        self.assertEqual(len(todo_plans), 1)
+        self.assertEqual( # Equality on both leading columns, done order comes from the index
+            todo_plans[0][0], 'SEARCH main_todo USING INDEX todo_user_planned_idx (user_id=? AND planned_date=?)'
+        )
+
+    def test_calendar_uses_indexes(self):
+        expected = {
+            'schedule_user_date_start_idx', 'reminder_user_open_due_idx', 'todo_user_planned_idx',
+            'schedule_rule_user_range_idx',
+        }
+        self.assertIndexedQueries('/planner/week/', expected)
+        self.assertIndexedQueries('/planner/month/', expected)
+
+    def test_schedule_conflicts_use_indexes(self):
+        today = timezone.now().date()
+        self.assertIndexedQueries(
+            f'/schedule/conflicts/?date={today}&start=08:30&end=09:30',
+            {'schedule_user_date_start_idx', 'schedule_rule_user_range_idx'},
+        )
+
+    def test_reminder_scheduler_uses_indexes(self):
+        self.assertIndexedQueries(ReminderScheduler().start, {'reminder_open_due_idx'})
+
+    def test_completed_reminders_use_indexes(self):
+        self.assertIndexedQueries('/reminders/completed/', {'reminder_user_closed_due_idx'})
+
+    def test_archive_uses_indexes(self):
+        self.assertIndexedQueries('/archive/?q=rent', {'archive_user_completed_idx'})
+        self.assertIndexedQueries(archive_completed, {'todo_done_completed_idx', 'reminder_done_completed_idx'})
+
+    def test_change_feed_uses_indexes(self):
+        now = timezone.now().isoformat()
+        since = encode_cursor(now, 0, 0, now)
+        self.assertIndexedQueries(f'/api/v1/changes/?since={since}', {
+            'expense_user_updated_idx', 'todo_user_updated_idx', 'reminder_user_updated_idx',
+            'schedule_user_updated_idx', 'budget_user_updated_idx', 'tombstone_user_deleted_idx',
+        })
+
+    def test_search_uses_indexes(self):
+        self.assertIndexedQueries('/search/?q=pay+re', {'search_user_token_idx'})
+
+    def test_expenses_page_uses_indexes(self):
+        today = timezone.now().date()
+        self.assertIndexedQueries(f'/expenses/?year={today.year}&month={today.month}', {'expense_user_date_idx'})
+
+
+# Expense rollups -------------------------------------------------------------------------------------------------------------------------
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('rollups', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def totals(self, year=2025, month=3):
+        return rollups.category_totals(self.user, year, month)
+
+    def test_add_edit_and_delete_keep_totals(self):
+        self.client.post('/add-expense/', {'title': 'Lunch', 'amount': '12.50', 'category': 'FOOD', 'date': '2025-03-04'})
+        expense = Expense.objects.create(user=self.user, title='Taxi', amount='3.25', category='TRANSPORT',
+                                         date=datetime.date(2025, 3, 5)) # String amount, as a form would leave it
+        self.assertEqual(self.totals(), {'Food': Decimal('12.50'), 'Transport': Decimal('3.25')})
+        expense.amount = '4.75'
+        expense.save()
+        self.assertEqual(self.totals()['Transport'], Decimal('4.75'))
+        expense.date = datetime.date(2025, 4, 1) # Moves to another month
+        expense.save()
+        self.assertEqual(self.totals(), {'Food': Decimal('12.50')})
+        self.assertEqual(self.totals(month=4), {'Transport': Decimal('4.75')})
+        Expense.objects.get(title='Lunch').delete()
+        self.assertEqual(self.totals(), {})
+        self.assertEqual(verify_rollups(), [])
+
+    def test_deleting_the_account_with_expenses(self):
+        Expense.objects.create(user=self.user, title='Lunch', amount=10, category='FOOD', date=datetime.date(2025, 3, 4))
+        self.user.delete()
+        self.assertFalse(ExpenseRollup.objects.exists())
+        self.assertFalse(Expense.objects.exists())
+
+    def test_verify_command_reports_and_rebuild_fixes(self):
+        Expense.objects.create(user=self.user, title='Lunch', amount=10, category='FOOD', date=datetime.date(2025, 3, 4))
+        out = io.StringIO()
+        call_command('rebuild_expense_rollups', '--verify', stdout=out)
+        self.assertIn('match', out.getvalue())
+        ExpenseRollup.objects.update(total=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_expense_rollups', '--verify', stdout=io.StringIO())
+        call_command('rebuild_expense_rollups', stdout=io.StringIO())
+        self.assertEqual(verify_rollups(), [])
+
+
+# Expense import --------------------------------------------------------------------------------------------------------------------------
+class ImportTests(TestCase):
+    CSV = (
+        'title,amount,category,date\n'
+        'Lunch,12.50,food,2025-03-04\n'
+        'Broken,abc,FOOD,2025-03-05\n'
+        'Taxi,3.25,Transport,2025-03-06\n'
+        'No date,5,FOOD,\n'
+        'Groceries,40,FOOD,2025-04-01\n'
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user('importer', password='secret-pass-123')
+
+    def test_command_reports_rejected_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source, errors = Path(directory, 'expenses.csv'), Path(directory, 'errors.csv')
+            source.write_text(self.CSV)
+            out = io.StringIO()
+            call_command('import_expenses', 'importer', str(source), '--errors', str(errors), '--batch-size', '2',
+                         stdout=out)
+            report = errors.read_text().splitlines()
+        self.assertIn('Imported 3 expenses, rejected 2, last row 5.', out.getvalue())
+        self.assertEqual(report[0], 'row,error,title,amount,category,date')
+        self.assertEqual([line.split(',')[0] for line in report[1:]], ['2', '4'])
+        self.assertIn('amount', report[1])
+        self.assertIn('date', report[2])
+        with self.assertRaises(CommandError):
+            call_command('import_expenses', 'nobody', str(source), stdout=io.StringIO())
+
+    def test_start_row_resumes_after_the_last_committed_batch(self):
+        def crash(result):
+            raise RuntimeError("Worker died")
+        with self.assertRaises(RuntimeError):
+            import_expenses(self.user, io.StringIO(self.CSV), batch_size=1, on_batch=crash)
+        committed = list(Expense.objects.values_list('title', flat=True))
+        self.assertEqual(committed, ['Lunch'])
+        result = import_expenses(self.user, io.StringIO(self.CSV), batch_size=1, start_row=1)
+        self.assertEqual((result.imported, result.rejected, result.committed_row), (2, 2, 5))
+        self.assertEqual(sorted(Expense.objects.values_list('title', flat=True)), ['Groceries', 'Lunch', 'Taxi'])
+
+    def test_rollups_match_the_imported_rows(self):
+        import_expenses(self.user, io.StringIO(self.CSV), batch_size=2)
+        self.assertEqual(rollups.category_totals(self.user, 2025, 3), {'Food': Decimal('12.50'), 'Transport': Decimal('3.25')})
+        self.assertEqual(rollups.category_totals(self.user, 2025, 4), {'Food': Decimal('40')})
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_upload_view_summarises_the_import(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('expenses.csv', self.CSV.encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post('/import-expenses/', {'file': upload, 'start_row': '0'})
+        self.assertRedirects(response, '/expenses/', fetch_redirect_response=False)
+        notes = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(notes[0], 'Imported 3 expenses, rejected 2 of 5 rows.')
+        self.assertEqual([note.split(':')[0] for note in notes[1:]], ['Row 2', 'Row 4'])
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 3)
+
+    def test_upload_without_required_columns_is_refused(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('expenses.csv', b'title,category\nLunch,FOOD\n', content_type='text/csv')
+        response = self.client.post('/import-expenses/', {'file': upload})
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ['Import stopped: CSV is missing column(s): amount, date.'])
+
+
+# Toggles ---------------------------------------------------------------------------------------------------------------------------------
+class ToggleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('toggler', password='secret-pass-123')
+        self.client.force_login(self.user)
+        self.todo = Todo.objects.create(user=self.user, title='Call bank')
+
+    def toggle(self, query='', **data):
+        response = self.client.post(f'/toggle-todo/{self.todo.pk}/{query}', data, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_flips_return_the_new_state(self):
+        self.assertEqual(self.toggle(), {'id': self.todo.pk, 'done': True})
+        self.assertIsNotNone(Todo.objects.get(pk=self.todo.pk).completed_at)
+        self.assertEqual(self.toggle(), {'id': self.todo.pk, 'done': False})
+        self.assertIsNone(Todo.objects.get(pk=self.todo.pk).completed_at)
+
+    def test_explicit_values_are_idempotent(self):
+        self.assertTrue(self.toggle(value='true')['done'])
+        self.assertTrue(self.toggle(value='true')['done']) # A second tab sending the same state changes nothing
+        self.assertFalse(self.toggle('?value=false')['done'])
+        self.assertFalse(Todo.objects.get(pk=self.todo.pk).done)
+
+    def test_page_posts_redirect_and_foreign_rows_are_404(self):
+        response = self.client.post(f'/toggle-todo/{self.todo.pk}/', HTTP_REFERER='/planner/')
+        self.assertRedirects(response, '/planner/', fetch_redirect_response=False)
+        foreign = Todo.objects.create(user=User.objects.create_user('someone'), title='Not yours')
+        self.assertEqual(self.client.post(f'/toggle-todo/{foreign.pk}/').status_code, 404)
+        self.assertEqual(self.client.post(f'/toggle-todo/{foreign.pk}/', {'value': 'true'}).status_code, 404)
+        self.assertFalse(Todo.objects.get(pk=foreign.pk).done)
+
+    def statements(self, url, **data):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, data, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'].split()[0] for query in ctx.captured_queries if 'SAVEPOINT' not in query['sql']]
+
+    def test_statements_per_toggle(self):
+        self.client.get('/planner/') # Fills the session and user caches
+        url = f'/toggle-todo/{self.todo.pk}/'
+        self.assertEqual(self.statements(url, value='true'), ['UPDATE']) # Explicit state, nothing to read back
+        self.assertEqual(self.statements(url), ['UPDATE', 'SELECT']) # Flip reads its new state in the same transaction
+        reminder = Reminder.objects.create(user=self.user, title='Pay rent', due_date=timezone.now())
+        self.assertEqual(self.statements(f'/toggle-reminder/{reminder.pk}/'), ['UPDATE', 'SELECT', 'INSERT']) # + journal
+
+
+# Bulk actions ----------------------------------------------------------------------------------------------------------------------------
+class BulkActionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('bulk', password='secret-pass-123')
+        self.client.force_login(self.user)
+        self.todos = [Todo.objects.create(user=self.user, title=f'Task {i}') for i in range(2)]
+
+    def bulk(self, op, **ids):
+        data = {'op': op, **{f'{name}_ids': values for name, values in ids.items()}}
+        if op == 'move':
+            data['date'] = '2030-01-02'
+        response = self.client.post('/bulk/', data, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_results_per_id(self):
+        foreign = Todo.objects.create(user=User.objects.create_user('someone'), title='Not yours')
+        event = ScheduleItem.objects.create(user=self.user, title='Standup', date=timezone.localdate(),
+                                            start_time=datetime.time(9), end_time=datetime.time(10))
+        results = self.bulk('complete', todo=[self.todos[0].pk, foreign.pk, 999999], schedule=[event.pk])
+        self.assertEqual(results['todo'], {str(self.todos[0].pk): 'ok', str(foreign.pk): 'not_found', '999999': 'not_found'})
+        self.assertEqual(results['schedule'], {str(event.pk): 'unsupported'})
+        self.assertFalse(Todo.objects.get(pk=foreign.pk).done)
+        self.assertEqual(self.client.post('/bulk/', {'op': 'archive'}).status_code, 400)
+        self.assertEqual(self.client.post('/bulk/', {'op': 'move', 'date': 'soon'}).status_code, 400)
+
+    def test_complete_and_uncomplete_stamp_completed_at(self):
+        reminder = Reminder.objects.create(user=self.user, title='Pay rent', due_date=timezone.now())
+        self.bulk('complete', todo=[todo.pk for todo in self.todos], reminder=[reminder.pk])
+        self.assertTrue(all(todo.done and todo.completed_at for todo in Todo.objects.all()))
+        reminder.refresh_from_db()
+        self.assertTrue(reminder.is_completed and reminder.completed_at)
+        self.bulk('uncomplete', todo=[todo.pk for todo in self.todos], reminder=[reminder.pk])
+        self.assertFalse(Todo.objects.filter(Q(done=True) | Q(completed_at__isnull=False)).exists())
+        self.assertIsNone(Reminder.objects.get(pk=reminder.pk).completed_at)
+
+    def test_delete(self):
+        foreign = Todo.objects.create(user=User.objects.create_user('someone'), title='Not yours')
+        results = self.bulk('delete', todo=[self.todos[0].pk, foreign.pk])
+        self.assertEqual(set(results['todo'].values()), {'ok', 'not_found'})
+        self.assertEqual(set(Todo.objects.values_list('pk', flat=True)), {self.todos[1].pk, foreign.pk})
+
+    def test_move_redates_rows_and_search_tokens(self):
+        due = timezone.make_aware(datetime.datetime(2025, 5, 6, 14, 30))
+        reminder = Reminder.objects.create(user=self.user, title='Dentist', due_date=due)
+        self.bulk('move', todo=[self.todos[0].pk], reminder=[reminder.pk])
+        self.assertEqual(Todo.objects.get(pk=self.todos[0].pk).planned_date, datetime.date(2030, 1, 2))
+        moved = timezone.localtime(Reminder.objects.get(pk=reminder.pk).due_date)
+        self.assertEqual((moved.date(), moved.time()), (datetime.date(2030, 1, 2), datetime.time(14, 30)))
+        tokens = SearchToken.objects.filter(Q(kind='todo', object_id=self.todos[0].pk) | Q(kind='reminder', object_id=reminder.pk))
+        self.assertEqual(set(tokens.values_list('token', 'date')), {('task', datetime.date(2030, 1, 2)),
+                                                                   ('dentist', datetime.date(2030, 1, 2))})
+
+    def test_one_statement_per_operation(self):
+        many = [Todo.objects.create(user=self.user, title=f'Task {i}').pk for i in range(20)]
+        self.client.get('/planner/') # Fills the session and user caches
+        for op in ('complete', 'uncomplete', 'move'):
+            counts = []
+            for ids in ([todo.pk for todo in self.todos], many):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.bulk(op, todo=ids)
+                writes = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE "main_todo"')]
+                self.assertEqual(len(writes), 1, op)
+                counts.append(len(ctx.captured_queries))
+            self.assertEqual(counts[0], counts[1], op) # Independent of how many rows are selected
+
+
+# Spending analytics ----------------------------------------------------------------------------------------------------------------------
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('analyst', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def analytics(self, **params):
+        response = self.client.get('/api/analytics/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_range_defaults_and_clamping(self):
+        data = self.analytics(end='2025-06')
+        self.assertEqual((data['start'], data['end'], len(data['months'])), ('2024-07', '2025-06', 12))
+        data = self.analytics(start='1990-01', end='2025-06') # Longer than ANALYTICS_MAX_MONTHS
+        self.assertEqual((data['start'], len(data['months'])), ('2015-07', 120))
+        self.assertEqual(data['months'][-1]['month'], '2025-06')
+        data = self.analytics(start='2026-01', end='2025-06') # Start after end
+        self.assertEqual((data['start'], len(data['months'])), ('2025-06', 1))
+        data = self.analytics(start='soon', end='2025-12')
+        self.assertEqual(data['start'], '2025-01')
+
+    def test_budget_line(self):
+        MonthlyBudget.objects.create(user=self.user, year=2025, month=3, total_income=3000, savings_goal=500)
+        Expense.objects.create(user=self.user, title='Power bill', amount=1200, category='UTILITIES',
+                               date=datetime.date(2025, 3, 1))
+        Expense.objects.create(user=self.user, title='Lunch', amount=12.5, category='FOOD', date=datetime.date(2025, 4, 2))
+        months = {row['month']: row for row in self.analytics(start='2025-03', end='2025-04')['months']}
+        self.assertEqual(
+            (months['2025-03']['total'], months['2025-03']['budget'], months['2025-03']['remaining']), (1200, 2500, 1300)
+        )
+        self.assertEqual(months['2025-03']['categories'], {'Utilities': 1200})
+        self.assertEqual(months['2025-04']['categories'], {'Food': 12.5})
+        self.assertIsNone(months['2025-04']['budget']) # No budget row, no line
+        self.assertIsNone(months['2025-04']['remaining'])
+
+        response = self.client.get('/expenses/analytics/', {'start': '2025-03', 'end': '2025-04'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['budget'] for row in response.context['months']], [2500, None])
+
+    def test_queries_do_not_grow_with_the_range(self):
+        for month in range(1, 13):
+            Expense.objects.create(user=self.user, title='Lunch', amount=10, category='FOOD',
+                                   date=datetime.date(2024, month, 1))
+            MonthlyBudget.objects.create(user=self.user, year=2024, month=month, total_income=100)
+        self.client.get('/planner/') # Fills the session and user caches
+        counts = []
+        for start in ('2024-12', '2024-01', '2015-01'):
+            with CaptureQueriesContext(connection) as ctx:
+                self.analytics(start=start, end='2024-12')
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts, [2, 2, 2]) # Rollups and budgets
+
+
+# Recurring schedule ----------------------------------------------------------------------------------------------------------------------
+class RecurrenceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('repeats', password='secret-pass-123')
+
+    def rule(self, **fields):
+        fields = {'title': 'Standup', 'start_time': datetime.time(9), 'end_time': datetime.time(9, 15), **fields}
+        return ScheduleRule.objects.create(user=self.user, **fields)
+
+    def dates(self, rule, start, end):
+        return list(recurrence.occurrence_dates(rule, start, end))
+
+    def test_daily_interval(self):
+        rule = self.rule(start_date=datetime.date(2025, 1, 1), interval=3)
+        self.assertEqual(
+            self.dates(rule, datetime.date(2025, 1, 5), datetime.date(2025, 1, 12)),
+            [datetime.date(2025, 1, 7), datetime.date(2025, 1, 10)],
+        )
+
+    def test_weekly_on_chosen_weekdays_every_other_week(self):
+        rule = self.rule(
+            frequency=ScheduleRule.WEEKLY, weekdays='02', interval=2, start_date=datetime.date(2025, 1, 8), # Wednesday
+        )
+        self.assertEqual(self.dates(rule, datetime.date(2025, 1, 1), datetime.date(2025, 1, 31)), [
+            datetime.date(2025, 1, 8), datetime.date(2025, 1, 20), datetime.date(2025, 1, 22),
+        ])
+
+    def test_monthly_skips_months_without_the_day(self):
+        rule = self.rule(frequency=ScheduleRule.MONTHLY, start_date=datetime.date(2025, 1, 31))
+        self.assertEqual(self.dates(rule, datetime.date(2025, 1, 1), datetime.date(2025, 5, 31)), [
+            datetime.date(2025, 1, 31), datetime.date(2025, 3, 31), datetime.date(2025, 5, 31),
+        ])
+
+    def test_monthly_window_before_the_day_of_month(self):
+        rule = self.rule(frequency=ScheduleRule.MONTHLY, start_date=datetime.date(2026, 1, 13))
+        day = datetime.date(2026, 10, 5)
+        self.assertEqual(self.dates(rule, day, day), [])
+        self.assertEqual(recurrence.expand(self.user, day, day), [])
+        self.assertEqual(self.dates(rule, day, datetime.date(2026, 10, 13)), [datetime.date(2026, 10, 13)])
+
+    def test_month_view_with_a_monthly_rule(self):
+        self.rule(frequency=ScheduleRule.MONTHLY, start_date=datetime.date(2025, 12, 13))
+        self.client.force_login(self.user)
+        response = self.client.get('/planner/month/2026-01-01/') # Padded out to Sunday 1 February
+        self.assertEqual(response.status_code, 200)
+        days = [day for day in response.context['calendar']['days'] if day['schedule']]
+        self.assertEqual([day['day'] for day in days], [13])
+        self.assertEqual(self.client.get('/planner/week/2026-01-05/').status_code, 200)
+
+    def test_count_and_until_set_last_date(self):
+        counted = self.rule(frequency=ScheduleRule.WEEKLY, weekdays='04', start_date=datetime.date(2025, 1, 6), count=5)
+        self.assertEqual(counted.last_date, datetime.date(2025, 1, 20))
+        self.assertEqual(self.dates(counted, datetime.date(2025, 1, 1), datetime.date(2025, 12, 31))[-1], counted.last_date)
+        until = self.rule(start_date=datetime.date(2025, 1, 1), until=datetime.date(2025, 1, 3))
+        self.assertEqual(until.last_date, datetime.date(2025, 1, 3))
+        self.assertIsNone(self.rule(start_date=datetime.date(2025, 1, 1)).last_date)
+
+    def test_old_rules_expand_only_the_window(self):
+        rule = self.rule(start_date=datetime.date(1, 1, 1))
+        day = datetime.date(2025, 6, 1)
+        self.assertEqual(self.dates(rule, day, day), [day])
+
+    def test_expand_applies_exceptions_and_window(self):
+        rule = self.rule(start_date=datetime.date(2025, 1, 1))
+        self.rule(start_date=datetime.date(2025, 2, 1)) # Starts after the window
+        self.rule(start_date=datetime.date(2024, 1, 1), until=datetime.date(2024, 12, 31)) # Ended before it
+        ScheduleException.objects.create(rule=rule, date=datetime.date(2025, 1, 2))
+        occurrences = recurrence.expand(self.user, datetime.date(2025, 1, 1), datetime.date(2025, 1, 3))
+        self.assertEqual([o.date for o in occurrences], [datetime.date(2025, 1, 1), datetime.date(2025, 1, 3)])
+
+    def test_planner_shows_and_skips_occurrences(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/add-schedule/', {
+            'title': 'Standup', 'start_time': '09:00', 'end_time': '09:15', 'view_date': '2025-01-06',
+            'frequency': 'WEEKLY', 'weekdays': ['0', '2'], 'interval': '1',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ScheduleItem.objects.count(), 0) # No per-day rows
+        items = self.client.get('/planner/2025-01-08/').context['schedule_items']
+        self.assertEqual([(item.title, item.date) for item in items], [('Standup', datetime.date(2025, 1, 8))])
+        self.client.get(f'/skip-occurrence/{items[0].rule_id}/2025-01-08/')
+        self.assertEqual(self.client.get('/planner/2025-01-08/').context['schedule_items'], [])
+        self.assertEqual(len(self.client.get('/planner/2025-01-13/').context['schedule_items']), 1)
+
+
+# Week and month planner ------------------------------------------------------------------------------------------------------------------
+class CalendarTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('calendar', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def fill(self, start, days):
+        # An event, a deadline and a task on every day from start
+        for offset in range(days):
+            day = start + datetime.timedelta(days=offset)
+            ScheduleItem.objects.create(user=self.user, title=f'Event {day}', date=day,
+                                        start_time=datetime.time(9), end_time=datetime.time(10))
+            Reminder.objects.create(user=self.user, title=f'Due {day}',
+                                    due_date=timezone.make_aware(datetime.datetime.combine(day, datetime.time(12))))
+            Todo.objects.create(user=self.user, title=f'Task {day}', planned_date=day)
+
+    def test_week_groups_rows_by_day(self):
+        self.fill(datetime.date(2025, 1, 1), 3)
+        ScheduleRule.objects.create(user=self.user, title='Gym', start_time=datetime.time(7), end_time=datetime.time(8),
+                                    start_date=datetime.date(2025, 1, 2), until=datetime.date(2025, 1, 2))
+        calendar = self.client.get('/planner/week/2025-01-01/').context['calendar']
+        self.assertEqual(calendar['url'], '/planner/week/2024-12-30/') # Weeks start on Monday
+        self.assertEqual([day['date'] for day in calendar['days']][::6], ['2024-12-30', '2025-01-05'])
+        thursday = calendar['days'][3]
+        self.assertEqual([event['title'] for event in thursday['schedule']], ['Gym', 'Event 2025-01-02'])
+        self.assertEqual([reminder['title'] for reminder in thursday['reminders']], ['Due 2025-01-02'])
+        self.assertEqual([todo['title'] for todo in thursday['todos']], ['Task 2025-01-02'])
+        self.assertEqual(calendar['days'][0]['todos'], [])
+
+    def test_adjacent_ranges_are_prefetched(self):
+        self.fill(datetime.date(2025, 1, 27), 1) # Monday of the next week, and inside January's padded grid
+        data = self.client.get('/planner/week/2025-01-21/?format=json').json()
+        self.assertEqual(data['prev']['url'], '/planner/week/2025-01-13/')
+        self.assertEqual(data['current']['next_url'], data['next']['url'])
+        self.assertEqual(data['next']['days'][0]['todos'][0]['title'], 'Task 2025-01-27')
+        self.assertFalse(any(day['todos'] for day in data['current']['days']))
+        month = self.client.get('/planner/month/2025-02-10/?format=json').json()
+        self.assertEqual(month['current']['label'], 'February 2025')
+        self.assertEqual(month['prev']['days'][0]['date'], '2024-12-30') # January padded to whole weeks
+        self.assertTrue(month['current']['days'][0]['outside'])
+        self.assertEqual(month['current']['days'][0]['todos'][0]['title'], 'Task 2025-01-27')
+
+    def test_month_links_land_on_the_next_and_previous_month(self):
+        data = self.client.get('/planner/month/2024-01-15/?format=json').json()
+        self.assertEqual(data['current']['url'], '/planner/month/2024-01-01/')
+        self.assertEqual(data['next']['url'], data['current']['next_url'])
+        for link, label in ((data['current']['next_url'], 'February 2024'), (data['current']['prev_url'], 'December 2023')):
+            self.assertEqual(self.client.get(link).context['calendar']['label'], label)
+        self.assertEqual(self.client.get(data['current']['url']).context['calendar']['label'], 'January 2024')
+
+    def test_query_count_does_not_depend_on_range_length(self):
+        self.fill(datetime.date(2025, 1, 1), 60)
+        ScheduleRule.objects.create(user=self.user, title='Gym', start_time=datetime.time(7), end_time=datetime.time(8),
+                                    start_date=datetime.date(2025, 1, 1))
+        counts = {}
+        for url in ('/planner/week/2025-01-15/', '/planner/month/2025-01-15/'):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts[url] = len(main_queries(ctx.captured_queries))
+        self.assertEqual(set(counts.values()), {5}, counts) # Events, rules, exceptions, deadlines, tasks
+
+
+# Conflicts and free slots ----------------------------------------------------------------------------------------------------------------
+class SchedulingTests(TestCase):
+    day = datetime.date(2025, 3, 3)
+
+    def setUp(self):
+        self.user = User.objects.create_user('busy', password='secret-pass-123')
+        self.client.force_login(self.user)
+        for title, start, end in [('Class', 9, 11), ('Lab', 10, 12), ('Lunch', 12, 13)]:
+            ScheduleItem.objects.create(
+                user=self.user, title=title, date=self.day, start_time=datetime.time(start), end_time=datetime.time(end)
+            )
+        ScheduleRule.objects.create(
+            user=self.user, title='Run', start_date=self.day, start_time=datetime.time(18), end_time=datetime.time(19)
+        )
+
+    def conflict_titles(self, start, end, **params):
+        response = self.client.get('/schedule/conflicts/', {'date': self.day.isoformat(), 'start': start, 'end': end, **params})
+        return [event['title'] for event in response.json()['conflicts']]
+
+    def test_conflicts_are_strict_overlaps(self):
+        self.assertEqual(self.conflict_titles('10:30', '12:00'), ['Class', 'Lab'])
+        self.assertEqual(self.conflict_titles('13:00', '14:00'), []) # Touching is not overlapping
+        self.assertEqual(self.conflict_titles('18:30', '20:00'), ['Run'])
+        lab = ScheduleItem.objects.get(title='Lab')
+        self.assertEqual(self.conflict_titles('11:30', '12:30', exclude=lab.pk), ['Lunch'])
+        self.assertEqual(self.client.get('/schedule/conflicts/?date=bad').status_code, 400)
+
+    def test_adding_an_overlapping_event_warns(self):
+        response = self.client.post('/add-schedule/', {
+            'title': 'Call', 'start_time': '12:30', 'end_time': '13:30', 'view_date': self.day.isoformat(),
+        }, follow=True)
+        self.assertIn('Overlaps with Lunch (12:00-13:00)', [str(message) for message in response.context['messages']])
+        self.assertTrue(ScheduleItem.objects.filter(title='Call').exists())
+
+    def test_free_slots_sweep(self):
+        response = self.client.get('/schedule/free-slots/', {
+            'start': self.day.isoformat(), 'days': 2, 'from': '08:00', 'to': '20:00', 'min': 30,
+        })
+        slots = [(slot['start'][5:16], slot['end'][5:16]) for slot in response.json()['slots']]
+        self.assertEqual(slots, [
+            ('03-03T08:00', '03-03T09:00'), ('03-03T13:00', '03-03T18:00'), ('03-03T19:00', '03-03T20:00'),
+            ('03-04T08:00', '03-04T18:00'), ('03-04T19:00', '03-04T20:00'),
+        ])
+        self.assertEqual(self.client.get('/schedule/free-slots/?days=400').status_code, 400)
+
+
+# Reminder notifications ------------------------------------------------------------------------------------------------------------------
+class ReminderSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now().replace(microsecond=0)
+        self.user = User.objects.create_user('notified', password='secret-pass-123')
+        self.scheduler = ReminderScheduler(clock=lambda: self.now)
+
+    def advance(self, **delta):
+        self.now += datetime.timedelta(**delta)
+        return self.scheduler.run_once()
+
+    def reminder(self, minutes, **fields):
+        return Reminder.objects.create(
+            user=self.user, title='Pay rent', due_date=self.now + datetime.timedelta(minutes=minutes), **fields
+        )
+
+    def test_due_reminders_notify_once(self):
+        reminder = self.reminder(10)
+        self.reminder(5, is_completed=True)
+        self.scheduler.start()
+        self.advance(minutes=5)
+        self.assertFalse(Notification.objects.exists())
+        self.advance(minutes=5)
+        self.assertEqual(list(Notification.objects.values_list('reminder', flat=True)), [reminder.pk])
+        restarted = ReminderScheduler(clock=lambda: self.now) # notified_for survives restarts
+        restarted.start()
+        restarted.run_once()
+        self.assertEqual(Notification.objects.count(), 1)
+        self.client.force_login(self.user)
+        self.assertEqual([n.title for n in self.client.get('/').context['notifications']], ['Pay rent'])
+
+    def test_changes_arrive_through_the_journal(self):
+        self.scheduler.start()
+        created = self.reminder(2)
+        moved = self.reminder(60)
+        moved.due_date = self.now + datetime.timedelta(minutes=3)
+        moved.save()
+        completed = self.reminder(1)
+        self.client.force_login(self.user)
+        self.client.post(f'/toggle-reminder/{completed.pk}/', {'value': 'true'})
+        self.advance(minutes=5)
+        self.assertEqual(
+            set(Notification.objects.values_list('reminder', flat=True)), {created.pk, moved.pk}
+        )
+        self.assertEqual(self.scheduler.apply_changes(), 0) # Journal consumed
+
+    def test_changes_committed_out_of_id_order_are_not_skipped(self):
+        self.scheduler.start()
+        self.reminder(60)
+        self.assertEqual(self.scheduler.apply_changes(), 1)
+        late = self.reminder(90)
+        ReminderChange.objects.all().delete()
+        Reminder.objects.filter(pk=late.pk).update(due_date=self.now + datetime.timedelta(minutes=2))
+        ReminderChange.objects.create(pk=1, reminder_id=late.pk) # Id drawn before the applied change, committed after
+        self.advance(minutes=3)
+        self.assertEqual(list(Notification.objects.values_list('reminder', flat=True)), [late.pk])
+        self.assertFalse(ReminderChange.objects.exists())
+
+    def test_journal_is_capped_without_a_scheduler(self):
+        with mock.patch.multiple(notifications, JOURNAL_LIMIT=5, JOURNAL_PRUNE_EVERY=1):
+            notifications.record_changes(range(1, 8))
+            notifications.record_changes([8, 9])
+        self.assertEqual(list(ReminderChange.objects.values_list('reminder_id', flat=True)), [5, 6, 7, 8, 9])
+
+    def test_notifications_invalidate_other_processes(self):
+        reminder = self.reminder(1)
+        version = caching.data_version(self.user.pk)
+        with mock.patch('main.caching.bump_user_version'), self.captureOnCommitCallbacks(execute=True):
+            self.scheduler.fire(reminder.due_date, reminder.pk) # Runs in its own process in production
+        self.assertNotEqual(caching.data_version(self.user.pk), version)
+
+    def test_idle_steps_cost_one_query(self):
+        for i in range(50):
+            owner = User.objects.create_user(f'user{i}')
+            Reminder.objects.create(user=owner, title='Later', due_date=self.now + datetime.timedelta(hours=6))
+        self.scheduler.start()
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as ctx:
+                wait = self.advance(seconds=5)
+            self.assertEqual(len(ctx.captured_queries), 1) # Only the journal poll, whatever the number of users
+            self.assertEqual(wait, self.scheduler.poll_seconds)
+
+
+# Live events -----------------------------------------------------------------------------------------------------------------------------
+class LiveEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('live', password='secret-pass-123')
+
+    def setUp(self):
+        events.reset_broker()
+        self.addCleanup(events.reset_broker)
+
+    @override_settings(EVENT_BROKER='main.tests.RecordingBroker')
+    def test_mutating_views_publish_after_commit(self):
+        self.client.force_login(self.user)
+        todo = Todo.objects.create(user=self.user, title='Read')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/toggle-todo/{todo.pk}/', HTTP_ACCEPT='application/json')
+            self.client.post('/add-expense/', {'title': 'Bus', 'amount': '2.50', 'category': 'TRANSPORT', 'date': '2025-01-02'})
+        published = events.get_broker().published
+        self.assertEqual(published[0], (self.user.pk, {'model': 'todo', 'action': 'toggled', 'id': todo.pk, 'value': True}))
+        self.assertEqual(published[1][1]['model'], 'expense')
+        self.assertEqual(published[1][1]['category'], 'Transport')
+        self.assertEqual(self.client.get('/events/').status_code, 204) # Streams need the ASGI app
+
+    async def open_stream(self):
+        response = await self.async_client.get('/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        return stream
+
+    async def disconnect(self, *streams):
+        # What the ASGI handler does when clients go away: cancel the pending reads
+        reads = [asyncio.ensure_future(anext(stream)) for stream in streams]
+        await asyncio.sleep(0)
+        for read in reads:
+            read.cancel()
+        await asyncio.gather(*reads, return_exceptions=True)
+
+    async def test_stream_delivers_user_events(self):
+        await self.async_client.aforce_login(self.user)
+        stream = await self.open_stream()
+        broker = events.get_broker()
+        broker.publish(self.user.pk + 1, {'model': 'todo', 'action': 'added', 'id': 1}) # Someone else's
+        broker.publish(self.user.pk, {'model': 'todo', 'action': 'deleted', 'id': 7})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(json.loads(chunk.decode().removeprefix('data: ')), {'model': 'todo', 'action': 'deleted', 'id': 7})
+        await self.disconnect(stream)
+        self.assertEqual(broker.connections(), 0)
+
+    async def test_idle_connections_cost_almost_no_cpu(self):
+        await self.async_client.aforce_login(self.user)
+        streams = [await self.open_stream() for _ in range(300)]
+        waiting = [asyncio.ensure_future(anext(stream)) for stream in streams] # Parked on their queues
+        await asyncio.sleep(0.1)
+        self.assertEqual(events.get_broker().connections(), 300)
+        started = time.process_time()
+        await asyncio.sleep(1)
+        self.assertLess(time.process_time() - started, 0.1) # CPU seconds for one idle second of 300 streams
+        events.get_broker().publish(self.user.pk, {'model': 'todo', 'action': 'added', 'id': 1})
+        self.assertEqual(len(await asyncio.gather(*waiting)), 300) # Still live, one broadcast reaches all
+        await self.disconnect(*streams)
+        self.assertEqual(events.get_broker().connections(), 0)
+
+
+# Dashboard cache -------------------------------------------------------------------------------------------------------------------------
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def assertDashboardCached(self):
+        self.client.get('/')
+        session = self.client.session
+        session['last_login'] = 'yesterday'
+        session.save()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/')
+        self.assertEqual(len(main_queries(ctx.captured_queries)), 1) # Only the change markers
+        self.assertEqual(response.context['last_login'], 'yesterday') # Session value is never cached
+        self.assertEqual(caching.cache_stats('dashboard')['hits'], 1)
+
+    def test_repeat_load_runs_one_query(self):
+        self.assertDashboardCached()
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={'default': backend}):
+                self.assertDashboardCached()
+
+    def test_writes_invalidate(self):
+        self.client.get('/')
+        with self.captureOnCommitCallbacks(execute=True):
+            todo = Todo.objects.create(user=self.user, title='Fresh task')
+        self.assertIn(todo, self.client.get('/').context['recent_todos'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/delete-todo/{todo.pk}/')
+        self.assertNotIn(todo, self.client.get('/').context['recent_todos'])
+        self.assertEqual(caching.cache_stats('dashboard'), {'hits': 0, 'misses': 3, 'hit_ratio': 0.0})
+
+    def test_writes_from_other_processes_invalidate(self):
+        # The reminder scheduler and other workers run in their own processes, their cache bumps never reach this
+        # one (LocMemCache), so the entry has to notice their rows in the database
+        reminder = Reminder.objects.create(user=self.user, title='Pay rent', due_date=timezone.now())
+        todo = Todo.objects.create(user=self.user, title='Old task')
+        self.client.get('/')
+        with mock.patch('main.caching.bump_user_version'), self.captureOnCommitCallbacks(execute=True):
+            ReminderScheduler(clock=timezone.now).fire(reminder.due_date, reminder.pk)
+        self.assertEqual([n.title for n in self.client.get('/').context['notifications']], ['Pay rent'])
+
+        with mock.patch('main.caching.bump_user_version'), self.captureOnCommitCallbacks(execute=True):
+            todo.delete() # Another web worker, bumping only its own cache
+        self.assertNotIn(todo, self.client.get('/').context['recent_todos'])
+
+
+# Async pages -----------------------------------------------------------------------------------------------------------------------------
+ASYNC_PAGES = {'dashboard', 'planner', 'planner_page', 'planner_week', 'planner_week_page', 'planner_month', 'planner_month_page'}
+
+class AsyncPageUrls:
+    # main/urls.py as served with ASYNC_VIEWS=true
+    urlpatterns = [
+        path(str(pattern.pattern), getattr(async_views, pattern.callback.__name__), pattern.default_args, name=pattern.name)
+        if pattern.name in ASYNC_PAGES else pattern
+        for pattern in urls.urlpatterns
+    ]
+
+
+class AsyncPageTests(TransactionTestCase): # gather_queries reads on pool threads, which only see committed rows
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('async', password='secret-pass-123')
+        today = timezone.localdate()
+        Todo.objects.create(user=self.user, title='Call bank')
+        Reminder.objects.create(user=self.user, title='Pay rent', due_date=timezone.now() + datetime.timedelta(hours=1))
+        Expense.objects.create(user=self.user, title='Lunch', amount=12, category='FOOD', date=today)
+        ScheduleItem.objects.create(user=self.user, title='Standup', date=today, start_time=datetime.time(9),
+                                    end_time=datetime.time(10))
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+
+    def summary(self, context, names):
+        # Model lists as (model, pk) pairs so sync and async contexts compare by content
+        def plain(value):
+            if isinstance(value, list) and value and hasattr(value[0], '_meta'):
+                return [(item._meta.model_name, item.pk, getattr(item, 'is_recurring', False)) for item in value]
+            return value
+        return {name: plain(context[name]) for name in names}
+
+    async def get(self, url):
+        with override_settings(ROOT_URLCONF=AsyncPageUrls):
+            response = await self.async_client.get(url)
+            self.assertEqual(response.resolver_match.func.__module__, 'main.async_views', url) # Resolved lazily
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    async def test_pages_match_the_sync_views(self):
+        pages = {
+            '/': ['chart_labels', 'chart_data', 'recent_todos', 'reminders', 'todays_schedule', 'total_spent'],
+            '/planner/': ['schedule_items', 'reminders', 'earlier_reminders', 'simple_todos', 'view_date'],
+            '/planner/week/': ['calendar'],
+        }
+        for url, names in pages.items():
+            expected = await sync_to_async(self.client.get)(url)
+            response = await self.get(url)
+            self.assertEqual(self.summary(response.context, names), self.summary(expected.context, names), url)
+        self.assertContains(response, 'Standup')
+
+    async def test_dashboard_is_served_from_the_cache_until_a_write(self):
+        with mock.patch('main.async_views.gather_queries', wraps=async_views.gather_queries) as gathered:
+            await self.get('/')
+            await self.get('/')
+            self.assertEqual(gathered.call_count, 1) # Second request hit the cache
+            await Todo.objects.acreate(user=self.user, title='New task') # Commits, bumping the user's version
+            response = await self.get('/')
+            self.assertEqual(gathered.call_count, 2)
+        self.assertIn('New task', [todo.title for todo in response.context['recent_todos']])
+        self.assertEqual(caching.cache_stats('dashboard')['hits'], 1)
+
+
+# JSON API --------------------------------------------------------------------------------------------------------------------------------
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('api', password='secret-pass-123')
+        self.client.login(username='api', password='secret-pass-123') # Real login, so sessions and users are cached
+        self.today = timezone.localdate()
+        Todo.objects.create(user=self.user, title='Write report', priority='HIGH')
+        Expense.objects.create(user=self.user, title='Lunch', amount='12.50', category='FOOD', date=self.today)
+
+    def test_field_selection_and_compact_body(self):
+        response = self.client.get('/api/v1/planner/?fields=title')
+        self.assertNotIn(b', ', response.content) # No whitespace between items
+        self.assertEqual(response.json()['todos'], [{'id': Todo.objects.get().pk, 'title': 'Write report'}])
+        self.assertEqual(self.client.get('/api/v1/planner/?fields=colour').status_code, 400)
+        data = self.client.get(f'/api/v1/expenses/?year={self.today.year}&month={self.today.month}').json()
+        self.assertEqual(data['total_spent'], 12.5)
+        self.assertEqual([expense['title'] for expense in data['expenses']], ['Lunch'])
+        self.assertEqual(self.client.get('/api/v1/expenses/?month=13').status_code, 400)
+        self.assertFalse(MonthlyBudget.objects.exists()) # Reads never create a budget row
+
+    @override_settings(API_ETAG_MAX_AGE=10 ** 9) # No bucket change between the two requests
+    def test_unchanged_data_returns_304_with_one_query(self):
+        for url in ('/api/v1/dashboard/', '/api/v1/planner/', '/api/v1/expenses/'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('no-cache', first['Cache-Control'])
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(len(ctx), 1, ctx.captured_queries) # Change markers only, session and user are cached
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get('/api/v1/planner/')['ETag']
+        self.assertNotEqual(self.client.get('/api/v1/planner/?fields=title')['ETag'], etag) # Body depends on the query
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/add-todo/', {'title': 'Call bank', 'view_date': self.today.isoformat()})
+        response = self.client.get('/api/v1/planner/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['todos']), 2)
+
+    def test_writes_without_a_cache_bump_change_the_etag(self):
+        # As seen by a worker whose local cache never heard of the write (scheduler, archive sweep, other workers)
+        dashboard, planner = self.client.get('/api/v1/dashboard/')['ETag'], self.client.get('/api/v1/planner/')['ETag']
+        Todo.objects.update(title='Renamed', updated_at=timezone.now()) # update() sends no signals
+        Notification.objects.bulk_create([Notification(user=self.user, title='Due', due_date=timezone.now())])
+        response = self.client.get('/api/v1/planner/', HTTP_IF_NONE_MATCH=planner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['todos'][0]['title'], 'Renamed')
+        response = self.client.get('/api/v1/dashboard/', HTTP_IF_NONE_MATCH=dashboard)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notifications'][0]['title'], 'Due')
+        etag = response['ETag']
+        Todo.objects.all()._raw_delete(Todo.objects.db) # Like the archive sweep, which leaves tombstones
+        Tombstone.objects.create(user=self.user, kind=Tombstone.TODO, object_id=1)
+        self.assertEqual(self.client.get('/api/v1/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(API_ETAG_MAX_AGE=1)
+    def test_etags_expire(self):
+        etag = self.client.get('/api/v1/planner/')['ETag']
+        with mock.patch('main.api.time.time', return_value=time.time() + 2):
+            self.assertEqual(self.client.get('/api/v1/planner/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# Change feed -----------------------------------------------------------------------------------------------------------------------------
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('sync', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def feed(self, since=None, **params):
+        response = self.client.get('/api/v1/changes/', {**({'since': since} if since else {}), **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def keys(self, data):
+        return [(change['kind'], change['id'], change['deleted']) for change in data['changes']]
+
+    def test_only_changes_after_the_cursor_come_back(self):
+        todo = Todo.objects.create(user=self.user, title='Call bank')
+        expense = Expense.objects.create(user=self.user, title='Lunch', amount=10, category='FOOD',
+                                         date=timezone.localdate())
+        Todo.objects.create(user=self.user, title='Untouched')
+        full = self.feed()
+        self.assertEqual(len(full['changes']), 3)
+        self.assertEqual(full['changes'][1]['data']['title'], 'Lunch')
+
+        self.client.post(f'/toggle-todo/{todo.pk}/', {'value': 'true'}) # update() path
+        expense_id = expense.pk
+        expense.delete()
+        event = ScheduleItem.objects.create(user=self.user, title='Standup', date=timezone.localdate(),
+                                            start_time=datetime.time(9), end_time=datetime.time(10))
+        delta = self.feed(full['cursor'])
+        self.assertEqual(self.keys(delta), [('todo', todo.pk, False), ('expense', expense_id, True),
+                                            ('schedule', event.pk, False)]) # In the order they happened
+        self.assertTrue(delta['changes'][0]['data']['done'])
+        self.assertFalse(delta['has_more'])
+        empty = self.feed(delta['cursor'])
+        self.assertEqual(empty['changes'], []) # Nothing new, the cursor keeps its position
+        self.assertEqual(self.feed(empty['cursor'])['changes'], [])
+
+    def test_pages_split_rows_with_the_same_timestamp(self):
+        for i in range(4):
+            Todo.objects.create(user=self.user, title=f'Task {i}')
+            Reminder.objects.create(user=self.user, title=f'Due {i}', due_date=timezone.now())
+        stamp = timezone.now()
+        Todo.objects.update(updated_at=stamp)
+        Reminder.objects.update(updated_at=stamp)
+        seen, cursor = [], None
+        while True:
+            page = self.feed(cursor, limit=3, fields='title')
+            seen.extend(self.keys(page))
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len(set(seen)), 8) # Every row once, none skipped at page edges
+        self.assertEqual(seen[:4], [('todo', pk, False) for pk in Todo.objects.order_by('pk').values_list('pk', flat=True)])
+
+    def test_archived_and_bulk_changed_rows_are_reported(self):
+        old = Todo.objects.create(user=self.user, title='Old task', done=True)
+        Todo.objects.filter(pk=old.pk).update(completed_at=timezone.now() - datetime.timedelta(days=90))
+        moved = Todo.objects.create(user=self.user, title='Move me')
+        cursor = self.feed()['cursor']
+        self.client.post('/bulk/', {'op': 'move', 'date': '2030-01-01', 'todo_ids': [moved.pk]})
+        archive_completed()
+        self.assertEqual(self.keys(self.feed(cursor)), [('todo', moved.pk, False), ('todo', old.pk, True)])
+
+    def test_bad_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/api/v1/changes/?since=nonsense').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/changes/?limit=ten').status_code, 400)
+
+    def test_deleting_the_account_leaves_no_tombstones(self):
+        Todo.objects.create(user=self.user, title='Call bank')
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    @override_settings(SYNC_SETTLE_SECONDS=30)
+    def test_rows_inside_the_settle_window_wait_for_a_later_sync(self):
+        settled = Todo.objects.create(user=self.user, title='Settled')
+        Todo.objects.filter(pk=settled.pk).update(updated_at=timezone.now() - datetime.timedelta(minutes=1))
+        fresh = Todo.objects.create(user=self.user, title='Still committing elsewhere')
+        first = self.feed()
+        self.assertEqual(self.keys(first), [('todo', settled.pk, False)]) # The cursor stops before fresh
+        with mock.patch('main.sync.timezone.now', return_value=timezone.now() + datetime.timedelta(minutes=1)):
+            self.assertEqual(self.keys(self.feed(first['cursor'])), [('todo', fresh.pk, False)])
+
+    def test_old_tombstones_are_pruned_and_old_cursors_must_resync(self):
+        kept, dropped = Tombstone.objects.bulk_create([
+            Tombstone(user=self.user, kind=Tombstone.TODO, object_id=1),
+            Tombstone(user=self.user, kind=Tombstone.TODO, object_id=2),
+        ])
+        old = timezone.now() - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 1)
+        Tombstone.objects.filter(pk=dropped.pk).update(deleted_at=old)
+        out = io.StringIO()
+        call_command('archive_completed', stdout=out)
+        self.assertIn('Pruned 1 tombstones', out.getvalue())
+        self.assertEqual(list(Tombstone.objects.values_list('pk', flat=True)), [kept.pk])
+
+        response = self.client.get('/api/v1/changes/', {'since': encode_cursor(old.isoformat(), 0, 1, old.isoformat())})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.json()['resync'])
+
+    def test_idle_accounts_do_not_expire_their_cursors(self):
+        todo = Todo.objects.create(user=self.user, title='Written long ago')
+        long_ago = timezone.now() - datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS + 30)
+        Todo.objects.filter(pk=todo.pk).update(updated_at=long_ago)
+        full = self.feed()
+        self.assertEqual(self.keys(full), [('todo', todo.pk, False)])
+        self.assertEqual(self.feed(full['cursor'])['changes'], []) # Not 410: the client synced just now
+        later = timezone.now() + datetime.timedelta(days=settings.SYNC_TOMBSTONE_DAYS - 1)
+        with mock.patch('main.sync.timezone.now', return_value=later): # Polling keeps refreshing the cursor
+            cursor = self.feed(full['cursor'])['cursor']
+        with mock.patch('main.sync.timezone.now', return_value=later + datetime.timedelta(days=2)):
+            self.assertEqual(self.feed(cursor)['changes'], [])
+            stale = self.client.get('/api/v1/changes/', {'since': full['cursor']}) # Client gone for the whole window
+            self.assertEqual(stale.status_code, 410)
+
+
+# Cached sessions and users ---------------------------------------------------------------------------------------------------------------
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('session', password='secret-pass-123')
+        self.client.post('/login/', {'username': 'session', 'password': 'secret-pass-123'})
+
+    def test_warm_requests_run_no_auth_queries(self):
+        self.client.get('/planner/') # Fills the user cache
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/planner/')
+        tables = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('django_session', tables)
+        self.assertNotIn('auth_user', tables)
+
+    def test_login_time_lives_in_the_session(self):
+        response = self.client.get('/')
+        self.assertNotIn('last_login', response.cookies)
+        self.assertNotEqual(response.context['last_login'], 'Never')
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get('/planner/')
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.set_password('another-pass-456')
+            user.save()
+        self.assertRedirects(self.client.get('/planner/'), '/login/?next=/planner/')
+
+    def test_logout_drops_the_cached_user(self):
+        self.client.get('/planner/')
+        self.assertIsNotNone(cache.get(backends.USER_KEY.format(self.user.pk)))
+        self.client.get('/logout/')
+        self.assertIsNone(cache.get(backends.USER_KEY.format(self.user.pk)))
+        self.assertRedirects(self.client.get('/planner/'), '/login/?next=/planner/')
+
+
+# Archive ---------------------------------------------------------------------------------------------------------------------------------
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('archivist', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def completed(self, model, count, days_ago, **fields):
+        # Completed rows with completion times pushed into the past
+        flag = 'done' if model is Todo else 'is_completed'
+        for i in range(count):
+            row = model.objects.create(user=self.user, title=f'{model.__name__} {days_ago}-{i}', **{flag: True}, **fields)
+            model.objects.filter(pk=row.pk).update(completed_at=timezone.now() - datetime.timedelta(days=days_ago))
+
+    def test_archiving_invalidates_other_processes(self):
+        self.completed(Todo, 1, 90)
+        version = caching.data_version(self.user.pk)
+        with mock.patch('main.caching.bump_user_version'): # The sweep's own cache is not the web worker's
+            archive_completed()
+        self.assertNotEqual(caching.data_version(self.user.pk), version)
+
+    def test_completion_time_follows_the_flag(self):
+        todo = Todo.objects.create(user=self.user, title='Stamp me')
+        self.assertIsNone(todo.completed_at)
+        self.client.post(f'/toggle-todo/{todo.pk}/')
+        todo.refresh_from_db()
+        self.assertTrue(todo.done)
+        stamped = todo.completed_at
+        self.assertIsNotNone(stamped)
+        self.client.post(f'/toggle-todo/{todo.pk}/', {'value': 'true'}) # Repeat keeps the first stamp
+        todo.refresh_from_db()
+        self.assertEqual(todo.completed_at, stamped)
+        self.client.post(f'/toggle-todo/{todo.pk}/')
+        todo.refresh_from_db()
+        self.assertIsNone(todo.completed_at)
+        reminder = Reminder.objects.create(user=self.user, title='Saved done', due_date=timezone.now(), is_completed=True)
+        self.assertIsNotNone(reminder.completed_at) # Model saves are stamped by the pre_save receiver
+
+    def test_moves_only_old_completed_rows_in_batches(self):
+        self.completed(Todo, 5, days_ago=40)
+        self.completed(Todo, 2, days_ago=5)
+        Todo.objects.create(user=self.user, title='Open')
+        due = timezone.now() - datetime.timedelta(days=60)
+        self.completed(Reminder, 3, days_ago=45, due_date=due)
+        notified = Reminder.objects.filter(is_completed=True).first()
+        notification = Notification.objects.create(user=self.user, reminder=notified, title='Due', due_date=due)
+
+        with CaptureQueriesContext(connection) as ctx:
+            moved = archive_completed(days=30, batch_size=2)
+        self.assertEqual(moved, {'todo': 5, 'reminder': 3})
+        deletes = [q for q in ctx.captured_queries if q['sql'].startswith(('DELETE FROM "main_todo"', 'DELETE FROM "main_reminder"'))]
+        self.assertEqual(len(deletes), 5) # One per batch
+        self.assertEqual(Todo.objects.count(), 3)
+        self.assertEqual(Reminder.objects.count(), 0)
+        notification.refresh_from_db()
+        self.assertIsNone(notification.reminder_id)
+        archived = ArchivedItem.objects.get(kind='reminder', original_id=notified.pk)
+        self.assertEqual((archived.title, archived.date), (notified.title, due))
+        self.assertEqual(archive_completed(days=30), {'todo': 0, 'reminder': 0})
+
+    def test_command(self):
+        self.completed(Todo, 2, days_ago=10)
+        out = io.StringIO()
+        call_command('archive_completed', '--days', '7', stdout=out)
+        self.assertIn('Archived 2 todos and 0 reminders', out.getvalue())
+
+    def test_browse_and_search(self):
+        self.completed(Todo, 30, days_ago=40)
+        self.completed(Reminder, 1, days_ago=40, due_date=timezone.now())
+        other = User.objects.create_user('other', password='secret-pass-123')
+        Todo.objects.create(user=other, title='Todo 40-0 of someone else', done=True)
+        archive_completed(days=0)
+
+        first = self.client.get('/archive/?format=json').json()
+        self.assertEqual(len(first['items']), 25)
+        second = self.client.get(f"/archive/?format=json&cursor={first['next_cursor']}").json()
+        self.assertEqual(len(second['items']), 6)
+        self.assertIsNone(second['next_cursor'])
+        found = self.client.get('/archive/?format=json&q=todo 40-1').json()['items'] # 40-1 and 40-10 .. 40-19
+        self.assertEqual(len(found), 11)
+        self.assertEqual(self.client.get('/archive/?format=json&kind=reminder').json()['items'][0]['kind'], 'reminder')
+        self.assertContains(self.client.get('/archive/?q=Reminder'), 'Reminder 40-0')
+
+
+# Search ----------------------------------------------------------------------------------------------------------------------------------
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('finder', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def results(self, query, **params):
+        return self.client.get('/search/', {'q': query, 'format': 'json', **params}).json()
+
+    def test_signals_keep_the_index_in_sync(self):
+        todo = Todo.objects.create(user=self.user, title='Pay the rent')
+        self.assertEqual(sorted(SearchToken.objects.values_list('token', flat=True)), ['pay', 'rent', 'the'])
+        todo.title = 'Call landlord'
+        todo.save()
+        self.assertEqual(sorted(SearchToken.objects.values_list('token', flat=True)), ['call', 'landlord'])
+        todo.delete()
+        self.assertFalse(SearchToken.objects.exists())
+
+    def test_ranked_across_models(self):
+        today = timezone.now().date()
+        Todo.objects.create(user=self.user, title='Pay rent')
+        Reminder.objects.create(user=self.user, title='Renew passport', due_date=timezone.now())
+        Expense.objects.create(user=self.user, title='Rent', amount=900, date=today - datetime.timedelta(days=40))
+        ScheduleItem.objects.create(user=self.user, title='Payroll meeting', date=today + datetime.timedelta(days=5),
+                                    start_time=datetime.time(9), end_time=datetime.time(10))
+        Todo.objects.create(user=User.objects.create_user('other'), title='Rent bike') # Other users never match
+
+        def found(query):
+            return [(result['kind'], result['title']) for result in self.results(query)['results']]
+
+        self.assertEqual(found('rent'), [('todo', 'Pay rent'), ('expense', 'Rent')]) # Newest first
+        self.assertEqual(len(found('ren')), 3)
+        self.assertEqual(found('pay'), [('todo', 'Pay rent'), ('schedule', 'Payroll meeting')]) # Whole word beats newer
+        self.assertEqual(found('pay ren'), [('todo', 'Pay rent')]) # Every word has to match
+        self.assertEqual(found('p'), []) # Too short to search
+
+    def test_pagination(self):
+        Todo.objects.bulk_create([Todo(user=self.user, title=f'Water plants {i}') for i in range(45)])
+        search.rebuild_index(self.user)
+        pages = [self.results('water', page=page) for page in (1, 2, 3)]
+        self.assertEqual([len(page['results']) for page in pages], [20, 20, 5])
+        self.assertEqual([page['has_next'] for page in pages], [True, True, False])
+        ids = {result['id'] for page in pages for result in page['results']}
+        self.assertEqual(len(ids), 45)
+
+    def test_imports_and_bulk_moves_are_indexed(self):
+        lines = io.StringIO('title,amount,category,date\nBakery run,12,FOOD,2025-01-02\n')
+        import_expenses(self.user, lines)
+        self.assertEqual(self.results('bakery')['results'][0]['date'], '2025-01-02')
+        todo = Todo.objects.create(user=self.user, title='Move me')
+        self.client.post('/bulk/', {'op': 'move', 'date': '2025-03-04', 'todo_ids': [todo.pk]})
+        self.assertEqual(self.results('move')['results'][0]['date'], '2025-03-04')
+
+    def test_rebuild_command(self):
+        Todo.objects.bulk_create([Todo(user=self.user, title='Bulk created task')]) # No signals
+        self.assertEqual(self.results('bulk')['results'], [])
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 search tokens', out.getvalue())
+        self.assertEqual(len(self.results('bulk')['results']), 1)
+
+
+# Export ----------------------------------------------------------------------------------------------------------------------------------
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('exporter', password='secret-pass-123')
+        self.client.force_login(self.user)
+
+    def add_expenses(self, count, day=datetime.date(2025, 1, 15)):
+        Expense.objects.bulk_create(
+            [Expense(user=self.user, title=f'Item {i}', amount=i + 1, date=day) for i in range(count)], batch_size=1000
+        )
+
+    def streamed_peak(self, url):
+        # Peak traced memory while draining the response, plus the number of bytes sent
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        tracemalloc.start()
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, size
+
+    def test_ndjson_gzip_round_trip_with_date_filter(self):
+        self.add_expenses(3)
+        self.add_expenses(2, day=datetime.date(2025, 3, 1))
+        Todo.objects.create(user=self.user, title='Other model')
+        response = self.client.get('/export/?format=ndjson&model=expenses&gzip=1&start=2025-02-01&end=2025-03-31')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['model'], 'expenses')
+        self.assertEqual(records[0]['date'], '2025-03-01')
+
+    def test_csv_rejects_several_models(self):
+        self.assertEqual(self.client.get('/export/?format=csv&model=expenses&model=todos').status_code, 400)
+
+    def test_peak_memory_does_not_grow_with_rows(self):
+        self.add_expenses(4000) # Several export chunks already, so both runs hold the same buffers
+        small_peak, small_size = self.streamed_peak('/export/?format=csv&model=expenses')
+        self.add_expenses(36000)
+        large_peak, large_size = self.streamed_peak('/export/?format=csv&model=expenses')
+        self.assertGreater(large_size, 9 * small_size)
+        self.assertLess(large_peak, small_peak * 1.5) # 10x the rows, same working set
+
+
+# Static assets ---------------------------------------------------------------------------------------------------------------------------
+class StaticAssetTests(TestCase):
+    def test_pages_load_no_third_party_scripts(self):
+        user = User.objects.create_user('static', password='secret-pass-123')
+        self.client.force_login(user)
+        for url in ('/', '/expenses/analytics/'):
+            html = self.client.get(url).content.decode()
+            self.assertNotIn('cdn.jsdelivr.net', html)
+            self.assertRegex(html, r'<script src="/static/js/vendor/chartjs/chart\.umd\.min(\.\w+)?\.js" defer>')
+            self.assertNotIn('<style>', html) # Styles ship as cacheable static files
+
+
+# Load data -------------------------------------------------------------------------------------------------------------------------------
+class SeedLoadDataTests(TestCase):
+    def seed(self, *extra):
+        call_command('seed_load_data', '--users', '2', '--expenses', '50', '--todos', '40', '--reminders', '10',
+                     '--schedule', '10', '--rules', '6', *extra, stdout=io.StringIO())
+
+    def test_creates_users_with_requested_volumes(self):
+        self.seed()
+        users = User.objects.filter(username__in=['load0', 'load1'])
+        self.assertEqual(users.count(), 2)
+        for user in users:
+            self.assertEqual(Expense.objects.filter(user=user).count(), 50)
+            self.assertEqual(Todo.objects.filter(user=user).count(), 40)
+            self.assertEqual(ScheduleRule.objects.filter(user=user).count(), 6)
+        self.assertTrue(self.client.login(username='load0', password='load-pass-123'))
+        self.assertEqual(verify_rollups(), []) # Rollups rebuilt after the bulk inserts
+        for rule in ScheduleRule.objects.all():
+            self.assertEqual(rule.last_date, recurrence.last_date(rule)) # Same as the pre_save receiver would store
+        days = set(Todo.objects.values_list('planned_date', flat=True))
+        self.assertGreater(len(days), 5) # Spread over the planner, not all planned for today
+
+    def test_existing_users_need_clear(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed('--clear', '--seed', '2')
+        self.assertEqual(Expense.objects.count(), 100)
+
+    def test_other_users_rollups_are_left_alone(self):
+        owner = User.objects.create_user('real')
+        Expense.objects.create(user=owner, title='Lunch', amount=10, category='FOOD', date=datetime.date(2025, 3, 4))
+        ExpenseRollup.objects.filter(user=owner).update(total=99) # Drifted, for the verify command to report
+        self.seed()
+        self.assertEqual(ExpenseRollup.objects.get(user=owner).total, 99) # Only the seeded accounts were rebuilt
+
+
+# Performance instrumentation -------------------------------------------------------------------------------------------------------------
+TIMED_TEMPLATES = [{**settings.TEMPLATES[0], 'BACKEND': 'main.instrumentation.TimedDjangoTemplates'}]
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('timed', password='secret-pass-123')
+        self.client.force_login(self.user)
+        stats_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(stats_dir.cleanup)
+        self.addCleanup(instrumentation.reset)
+        self.settings_override = override_settings(
+            PERF_INSTRUMENTATION=True, TEMPLATES=TIMED_TEMPLATES, PERF_STATS_DIR=stats_dir.name, PERF_SLOW_REQUEST_MS=10000,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.stats_dir = stats_dir.name
+
+    def timings(self, response):
+        return dict(part.split(';dur=') for part in
+                    (entry.split(';desc=')[0].strip() for entry in response['Server-Timing'].split(',')))
+
+    def test_disabled_middleware_is_not_loaded(self):
+        with override_settings(PERF_INSTRUMENTATION=False):
+            self.assertNotIn('Server-Timing', self.client.get('/'))
+            with self.assertRaises(MiddlewareNotUsed):
+                PerformanceMiddleware(lambda request: None)
+
+    def test_server_timing_splits_db_template_and_view_time(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/planner/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'tpl', 'view', 'total'})
+        self.assertIn(f'desc="{len(captured)} queries"', response['Server-Timing'])
+        self.assertGreater(float(timings['tpl']), 0)
+        self.assertGreaterEqual(float(timings['total']), float(timings['db']) + float(timings['tpl']))
+
+    def test_repeated_queries_are_logged_as_one_shape(self):
+        todos = [Todo.objects.create(user=self.user, title=f'Task {i}') for i in range(12)]
+
+        def view(request):
+            for todo in todos:
+                Todo.objects.filter(pk=todo.pk).first() # One query per row
+            return HttpResponse()
+
+        request = RequestFactory().get('/loop/')
+        request.resolver_match = None
+        with self.assertLogs('main.performance', 'WARNING') as logs:
+            PerformanceMiddleware(view)(request)
+        entry = logs.records[0].performance
+        self.assertIn('Repeated queries', logs.output[0])
+        self.assertEqual(entry['queries'], 12)
+        self.assertEqual(entry['repeated_queries'][0]['count'], 12)
+
+    def test_slow_requests_are_logged(self):
+        with override_settings(PERF_SLOW_REQUEST_MS=0), self.assertLogs('main.performance', 'WARNING') as logs:
+            self.client.get('/')
+        entry = logs.records[0].performance
+        self.assertIn('Slow request', logs.output[0])
+        self.assertEqual(entry['view'], 'dashboard')
+        self.assertEqual(entry['status'], 200)
+
+    def test_histograms_are_dumped_per_view(self):
+        for _ in range(3):
+            self.client.get('/')
+        self.client.get('/planner/')
+        instrumentation.flush()
+        out = io.StringIO()
+        call_command('dump_performance_stats', '--dir', self.stats_dir, '--json', stdout=out)
+        views = json.loads(out.getvalue())['views']
+        self.assertEqual(views['dashboard']['count'], 3)
+        self.assertEqual(sum(views['dashboard']['buckets']), 3)
+        self.assertEqual(views['planner']['count'], 1)
+        out = io.StringIO()
+        call_command('dump_performance_stats', '--dir', self.stats_dir, '--reset', stdout=out)
+        self.assertIn('dashboard', out.getvalue())
+        self.assertEqual(list(Path(self.stats_dir).glob('*.json')), [])
@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+if settings.ASYNC_VIEWS:
+    from . import async_views as page_views # Concurrent queries under ASGI
+else:
+    page_views = views
 
 
 urlpatterns = [
@@ -9,19 +15,41 @@ urlpatterns = [
     path('logout/', views.logout_user, name='logout'),
     
     # Pages
-    path('', views.dashboard, name='dashboard'),
+    path('', page_views.dashboard, name='dashboard'),
     path('expenses/', views.expenses_page, name='expenses'),
-    path('planner/', views.planner_page, name='planner'),
-    path('planner/<str:date_str>/', views.planner_page, name='planner_page'),
+    path('expenses/analytics/', views.analytics_page, name='analytics'),
+    path('api/analytics/', views.analytics_api, name='analytics_api'),
+    path('planner/', page_views.planner_page, name='planner'),
+    path('planner/week/', page_views.planner_range, {'span': 'week'}, name='planner_week'),
+    path('planner/week/<str:date_str>/', page_views.planner_range, {'span': 'week'}, name='planner_week_page'),
+    path('planner/month/', page_views.planner_range, {'span': 'month'}, name='planner_month'),
+    path('planner/month/<str:date_str>/', page_views.planner_range, {'span': 'month'}, name='planner_month_page'),
+    path('planner/<str:date_str>/', page_views.planner_page, name='planner_page'),
+    path('search/', views.search_page, name='search'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('events/', async_views.event_stream, name='events'), # Live updates (SSE)
+
+    # Read-only JSON API
+    path('api/v1/dashboard/', api.dashboard, name='api_dashboard'),
+    path('api/v1/planner/', api.planner, name='api_planner'),
+    path('api/v1/planner/<str:date_str>/', api.planner, name='api_planner_page'),
+    path('api/v1/expenses/', api.expenses, name='api_expenses'),
+    path('api/v1/changes/', api.changes, name='api_changes'),
 
     # Actions - Budget & Expenses
     path('update-budget/', views.update_budget, name='update_budget'),
     path('add-expense/', views.add_expense, name='add_expense'),
     path('delete-expense/<int:pk>/', views.delete_expense, name='delete_expense'),
+    path('import-expenses/', views.import_expenses_upload, name='import_expenses'),
+    path('export/', views.export_data, name='export_data'),
 
     # Actions - Schedule 
     path('add-schedule/', views.add_schedule_event, name='add_schedule_event'), 
     path('delete-schedule/<int:pk>/', views.delete_schedule_event, name='delete_schedule_event'),
+    path('skip-occurrence/<int:pk>/<str:date_str>/', views.skip_occurrence, name='skip_occurrence'),
+    path('delete-schedule-rule/<int:pk>/', views.delete_schedule_rule, name='delete_schedule_rule'),
+    path('schedule/conflicts/', views.schedule_conflicts, name='schedule_conflicts'),
+    path('schedule/free-slots/', views.free_slots, name='free_slots'),
 
     # Actions - Todos
     path('add-todo/', views.add_todo, name='add_todo'),
@@ -32,4 +60,10 @@ urlpatterns = [
     path('add-reminder/', views.add_reminder, name='add_reminder'),
     path('delete-reminder/<int:pk>/', views.delete_reminder, name='delete_reminder'),
     path('toggle-reminder/<int:pk>/', views.toggle_reminder, name='toggle_reminder'),
+    path('reminders/completed/', views.completed_reminders, name='completed_reminders'),
+    path('archive/', views.archive_page, name='archive'),
+    path('read-notification/<int:pk>/', views.read_notification, name='read_notification'),
+
+    # Actions - Bulk
+    path('bulk/', views.bulk_action, name='bulk_action'),
 ]
\ No newline at end of file
@@ -1,19 +1,42 @@
+import calendar
 import datetime
+import io
 from datetime import datetime, timedelta, date
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
 from django.utils import timezone
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.http import (
+    Http404, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+)
 from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
-from .models import MonthlyBudget, Expense, Todo, ScheduleItem, Reminder
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from .models import ArchivedItem, MonthlyBudget, Expense, Todo, ScheduleItem, ScheduleException, ScheduleRule, Reminder, Notification
+from . import caching, events, notifications, recurrence, rollups, scheduling, search, sync
+from .pagination import decode_cursor, encode_cursor
+from .exporters import EXPORT_FORMATS, EXPORT_MODELS, export_stream
+from .importers import format_errors, import_expenses
 from .forms import (
-    TodoForm, ExpenseForm, MonthlyBudgetForm, ScheduleItemForm, ReminderForm,
+    TodoForm, ExpenseForm, ExpenseImportForm, MonthlyBudgetForm, ScheduleItemForm, ScheduleRuleForm, ReminderForm,
     CustomLoginForm, CustomRegisterForm
 )
 
+REMINDER_WINDOW_DAYS = 30 # Open reminders shown either side of the planner day
+COMPLETED_REMINDERS_PAGE_SIZE = 20
+ARCHIVE_PAGE_SIZE = 25
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE = 50 # Deep pages of a ranked list are never useful, keep OFFSET bounded
+IMPORT_ERRORS_SHOWN = 10 # Rejected rows listed after an upload
+ANALYTICS_MAX_MONTHS = 120
+FREE_SLOTS_MAX_DAYS = 31
+
+def _wants_json(request):
+    return request.GET.get('format') == 'json' or 'application/json' in request.headers.get('Accept', '')
+
 # Authentication -------------------------------------------------------------------------------------------------------------------------
 def register(request):
     if request.method == "POST":
@@ -32,65 +55,297 @@ def login_user(request):
         if form.is_valid():
             user = form.get_user() # Retrieve validated user
             login(request, user) # Start session
-            response = HttpResponseRedirect(reverse("dashboard"))
-            response.set_cookie('last_login', str(datetime.now())) # Persist login time in cookie
-            return response
+            request.session['last_login'] = str(datetime.now()) # Rides along with the session, no extra cookie
+            return HttpResponseRedirect(reverse("dashboard"))
     else:
         form = CustomLoginForm()
     return render(request, 'auth_login.html', {'form': form})
 
 def logout_user(request):
-    logout(request) # Terminate session
+    logout(request) # Terminate session (also drops the cached user)
     response = HttpResponseRedirect(reverse('login'))
-    response.delete_cookie('last_login') # Clear tracking cookie
+    response.delete_cookie('last_login') # Left behind by older logins that still used a cookie
     return response
 
 # Dashboard -------------------------------------------------------------------------------------------------------------------------
-@login_required(login_url='/login/')
-def dashboard(request):
-    now = timezone.now() # Get current server time
-    # Filter expenses by current month and year
-    expenses = Expense.objects.filter(user=request.user, date__year=now.year, date__month=now.month)
-    category_totals = {}
-    for expense in expenses:
-        category = expense.get_category_display() 
-        category_totals[category] = category_totals.get(category, 0) + float(expense.amount) # Sum by category
-    
-    context = {
+def _dashboard_queries(user, now):
+    # Independent queries behind the dashboard, each returns a fully evaluated result
+    return {
+        'category_totals': lambda: rollups.category_totals(user, now.year, now.month), # Pre-aggregated month totals
+        'recent_todos': lambda: list(
+            Todo.objects.filter(user=user, done=False, planned_date__lte=now.date()).order_by('-planned_date', '-id')[:5]
+        ), # Get 5 pending planned up to today, newest day first
+        'reminders': lambda: list(Reminder.objects.filter(user=user, is_completed=False).order_by('due_date')[:5]), # Get 5 upcoming
+        'todays_schedule': lambda: list(ScheduleItem.objects.filter(user=user, date=now.date()).order_by('start_time')), # Get today's events
+        'todays_occurrences': lambda: recurrence.expand(user, now.date(), now.date()), # Repeating events firing today
+        'notifications': lambda: list(Notification.objects.filter(user=user, read=False).order_by('-created_at')[:5]),
+    }
+
+def _merge_schedule(items, occurrences):
+    return sorted([*items, *occurrences], key=lambda item: item.start_time) # One-off and repeating events on one timeline
+
+def _dashboard_context(results, now):
+    category_totals = results['category_totals']
+    return {
         'chart_labels': list(category_totals.keys()), # Keys for chart axis
-        'chart_data': list(category_totals.values()), # Values for chart series
-        'recent_todos': Todo.objects.filter(user=request.user, done=False).order_by('-created_time')[:5], # Get 5 latest pending
-        'reminders': Reminder.objects.filter(user=request.user, is_completed=False).order_by('due_date')[:5], # Get 5 upcoming
-        'todays_schedule': ScheduleItem.objects.filter(user=request.user, date=now.date()).order_by('start_time'), # Get today's events
+        'chart_data': [float(total) for total in category_totals.values()], # Values for chart series
+        'recent_todos': results['recent_todos'],
+        'reminders': results['reminders'],
+        'todays_schedule': _merge_schedule(results['todays_schedule'], results['todays_occurrences']),
+        'notifications': results['notifications'], # Written by run_reminder_scheduler
         'total_spent': int(sum(category_totals.values())), # Grand total of expenses
         'current_month_name': now.strftime('%B'), # Format: "January", "February"
-        'last_login': request.COOKIES.get('last_login', 'Never'), # Read from browser storage
     }
+
+@login_required(login_url='/login/')
+def dashboard(request):
+    now = timezone.now() # Get current server time
+    queries = _dashboard_queries(request.user, now)
+    context = caching.cached_for_user(
+        request.user.pk, 'dashboard', lambda: _dashboard_context({name: query() for name, query in queries.items()}, now),
+        timeout=settings.DASHBOARD_CACHE_TIMEOUT, suffix=now.date().isoformat(), # New entry every day
+    )
+    context = {**context, 'last_login': request.session.get('last_login', 'Never')} # Set at login
     return render(request, 'main/dashboard.html', context)
+
+@user_passes_test(lambda user: user.is_staff, login_url='/login/')
+def cache_stats(request):
+    return JsonResponse({'dashboard': caching.cache_stats('dashboard')})
+
 # Planner -------------------------------------------------------------------------------------------------------------------------------
-@login_required(login_url='/login/')
-def planner_page(request, date_str=None):
+def _planner_date(date_str):
     if date_str:
         try:
-            view_date = datetime.strptime(date_str, '%Y-%m-%d').date() # Parse URL date
+            return datetime.strptime(date_str, '%Y-%m-%d').date() # Parse URL date
         except ValueError:
-            view_date = timezone.now().date() # Go back to today on bad format
-    else:
-        view_date = timezone.now().date() # Default to today
+            pass # Go back to today on bad format
+    return timezone.now().date() # Default to today
 
-    context = {
+def _planner_queries(user, view_date):
+    # Only open reminders due inside the window around view_date, completed ones load on demand
+    window_start = timezone.make_aware(datetime.combine(view_date - timedelta(days=REMINDER_WINDOW_DAYS), datetime.min.time()))
+    window_end = timezone.make_aware(datetime.combine(view_date + timedelta(days=REMINDER_WINDOW_DAYS + 1), datetime.min.time()))
+    open_reminders = Reminder.objects.filter(user=user, is_completed=False)
+    return {
+        'schedule_items': lambda: list(ScheduleItem.objects.filter(user=user, date=view_date).order_by('start_time')),
+        'occurrences': lambda: recurrence.expand(user, view_date, view_date),
+        'reminders': lambda: list(open_reminders.filter(due_date__gte=window_start, due_date__lt=window_end).order_by('due_date')),
+        'earlier_reminders': lambda: open_reminders.filter(due_date__lt=window_start).count(), # Overdue before the window
+        'simple_todos': lambda: list(Todo.objects.filter(user=user, planned_date=view_date).order_by('done', '-id')),
+    }
+
+def _planner_context(results, view_date):
+    results = dict(results)
+    occurrences = results.pop('occurrences')
+    return {
+        **results,
+        'schedule_items': _merge_schedule(results['schedule_items'], occurrences),
         'view_date': view_date,
         'is_today': view_date == timezone.now().date(), # Check if viewing today
         'prev_day': (view_date - timedelta(days=1)).strftime('%Y-%m-%d'), # Calculate previous date
         'next_day': (view_date + timedelta(days=1)).strftime('%Y-%m-%d'), # Calc next date
-        'schedule_items': ScheduleItem.objects.filter(user=request.user, date=view_date).order_by('start_time'),
-        'reminders': Reminder.objects.filter(user=request.user).order_by('is_completed', 'due_date'),
-        'simple_todos': Todo.objects.filter(user=request.user, created_time__date=view_date).order_by('done', '-created_time'),
+        'earlier_day': (view_date - timedelta(days=2 * REMINDER_WINDOW_DAYS)).strftime('%Y-%m-%d'),
         'schedule_form': ScheduleItemForm(initial={'date': view_date}), 
+        'rule_form': ScheduleRuleForm(initial={'interval': 1}),
         'todo_form': TodoForm(), 
         'reminder_form': ReminderForm(initial={'due_date': view_date}), 
     }
-    return render(request, 'main/planner.html', context)
+
+@login_required(login_url='/login/')
+def planner_page(request, date_str=None):
+    view_date = _planner_date(date_str)
+    results = {name: query() for name, query in _planner_queries(request.user, view_date).items()}
+    return render(request, 'main/planner.html', _planner_context(results, view_date))
+
+def _calendar_range(span, anchor):
+    # First and last day shown for the week or month holding anchor, months padded out to whole weeks
+    if span == 'week':
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6)
+    first = anchor.replace(day=1)
+    last = first.replace(day=calendar.monthrange(first.year, first.month)[1])
+    return first - timedelta(days=first.weekday()), last + timedelta(days=6 - last.weekday())
+
+def _calendar_neighbours(span, anchor):
+    # Anchors of the previous and next range
+    if span == 'week':
+        return anchor - timedelta(days=7), anchor + timedelta(days=7)
+    first = anchor.replace(day=1)
+    return (first - timedelta(days=1)).replace(day=1), (first + timedelta(days=31)).replace(day=1)
+
+def _calendar_queries(user, start, end):
+    # One range read per model over [start, end], the query count never depends on the range length
+    window_start = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+    window_end = timezone.make_aware(datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return {
+        'schedule_items': lambda: list(
+            ScheduleItem.objects.filter(user=user, date__gte=start, date__lte=end).order_by('date', 'start_time')
+        ),
+        'occurrences': lambda: recurrence.expand(user, start, end),
+        'reminders': lambda: list(
+            Reminder.objects.filter(user=user, is_completed=False, due_date__gte=window_start, due_date__lt=window_end)
+            .order_by('due_date')
+        ),
+        'todos': lambda: list(
+            Todo.objects.filter(user=user, planned_date__gte=start, planned_date__lte=end).order_by('done', '-id')
+        ),
+    }
+
+def _calendar_days(results, start, end):
+    # Group the range reads by day in a single pass over each list, keeping every list's order
+    days = {start + timedelta(days=offset): {'schedule': [], 'reminders': [], 'todos': []}
+            for offset in range((end - start).days + 1)}
+    for event in _merge_schedule(results['schedule_items'], results['occurrences']):
+        days[event.date]['schedule'].append({
+            'title': event.title, 'start_time': event.start_time.strftime('%H:%M'),
+            'end_time': event.end_time.strftime('%H:%M'), 'recurring': getattr(event, 'is_recurring', False),
+        })
+    for reminder in results['reminders']:
+        due = timezone.localtime(reminder.due_date)
+        days[due.date()]['reminders'].append({
+            'id': reminder.pk, 'title': reminder.title, 'time': due.strftime('%H:%M'), 'priority': reminder.priority,
+        })
+    for todo in results['todos']:
+        days[todo.planned_date]['todos'].append({'id': todo.pk, 'title': todo.title, 'done': todo.done})
+    return days
+
+def _calendar_url(span, anchor):
+    # Canonical page of the range: the Monday of a week, the 1st of a month (its grid starts in the month before)
+    first = _calendar_range(span, anchor)[0] if span == 'week' else anchor.replace(day=1)
+    return reverse(f'planner_{span}_page', args=[first.isoformat()])
+
+def _calendar_payload(span, anchor, days):
+    # JSON-ready range, rendered by calendar.html on load and by its script when navigating
+    start, end = _calendar_range(span, anchor)
+    prev_anchor, next_anchor = _calendar_neighbours(span, anchor)
+    today = timezone.localdate()
+    if span == 'week':
+        label = f"{start.strftime('%d %b')} - {end.strftime('%d %b %Y')}"
+    else:
+        label = anchor.strftime('%B %Y')
+    return {
+        'span': span,
+        'label': label,
+        'url': _calendar_url(span, anchor),
+        'prev_url': _calendar_url(span, prev_anchor),
+        'next_url': _calendar_url(span, next_anchor),
+        'days': [
+            {'date': day.isoformat(), 'day': day.day, 'url': reverse('planner_page', args=[day.isoformat()]),
+             'today': day == today, 'outside': span == 'month' and day.month != anchor.month, **days[day]}
+            for day in (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+        ],
+    }
+
+def _calendar_window(span, anchor):
+    # Previous, current and next range are read together, so Prev/Next render from the page's own JSON
+    prev_anchor, next_anchor = _calendar_neighbours(span, anchor)
+    return _calendar_range(span, prev_anchor)[0], _calendar_range(span, next_anchor)[1]
+
+def _calendar_response(request, span, anchor, results):
+    days = _calendar_days(results, *_calendar_window(span, anchor))
+    prev_anchor, next_anchor = _calendar_neighbours(span, anchor)
+    data = {
+        'current': _calendar_payload(span, anchor, days),
+        'prev': _calendar_payload(span, prev_anchor, days),
+        'next': _calendar_payload(span, next_anchor, days),
+    }
+    if _wants_json(request):
+        return JsonResponse(data)
+    return render(request, 'main/calendar.html', {
+        'calendar': data['current'], 'calendar_data': data, 'weekdays': list(calendar.day_abbr), 'anchor': anchor,
+    })
+
+@login_required(login_url='/login/')
+def planner_range(request, span, date_str=None):
+    # Week or month calendar, span comes from the URL pattern
+    anchor = _planner_date(date_str)
+    results = {name: query() for name, query in _calendar_queries(request.user, *_calendar_window(span, anchor)).items()}
+    return _calendar_response(request, span, anchor, results)
+
+@login_required(login_url='/login/')
+def completed_reminders(request):
+    # Keyset-paginated completed reminders, newest deadline first
+    reminders = Reminder.objects.filter(user=request.user, is_completed=True).order_by('-due_date', '-id')
+    cursor = decode_cursor(request.GET.get('cursor'), 2)
+    if cursor:
+        try:
+            due, pk = datetime.fromisoformat(cursor[0]), int(cursor[1])
+        except ValueError:
+            due = None
+        if due:
+            reminders = reminders.filter(Q(due_date__lt=due) | Q(due_date=due, id__lt=pk))
+
+    page = list(reminders[:COMPLETED_REMINDERS_PAGE_SIZE + 1]) # One extra row tells us if there is more
+    next_cursor = None
+    if len(page) > COMPLETED_REMINDERS_PAGE_SIZE:
+        page = page[:COMPLETED_REMINDERS_PAGE_SIZE]
+        next_cursor = encode_cursor(page[-1].due_date.isoformat(), page[-1].pk)
+
+    if _wants_json(request):
+        return JsonResponse({
+            'reminders': [
+                {'id': r.pk, 'title': r.title, 'due_date': r.due_date.isoformat(), 'priority': r.priority}
+                for r in page
+            ],
+            'next_cursor': next_cursor,
+        })
+    return render(request, 'main/partials/completed_reminders.html', {'reminders': page, 'next_cursor': next_cursor})
+
+@login_required(login_url='/login/')
+def archive_page(request):
+    # Archived todos and reminders, newest completion first, keyset-paginated on archive_user_completed_idx
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind', '')
+    items = ArchivedItem.objects.filter(user=request.user).order_by('-completed_at', '-id')
+    if kind in dict(ArchivedItem.KIND_CHOICES):
+        items = items.filter(kind=kind)
+    if query:
+        items = items.filter(title__icontains=query)
+    cursor = decode_cursor(request.GET.get('cursor'), 2)
+    if cursor:
+        try:
+            completed, pk = datetime.fromisoformat(cursor[0]), int(cursor[1])
+        except ValueError:
+            completed = None
+        if completed:
+            items = items.filter(Q(completed_at__lt=completed) | Q(completed_at=completed, id__lt=pk))
+
+    page = list(items[:ARCHIVE_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(page) > ARCHIVE_PAGE_SIZE:
+        page = page[:ARCHIVE_PAGE_SIZE]
+        next_cursor = encode_cursor(page[-1].completed_at.isoformat(), page[-1].pk)
+
+    if _wants_json(request):
+        return JsonResponse({
+            'items': [
+                {'id': item.pk, 'kind': item.kind, 'title': item.title, 'priority': item.priority,
+                 'date': item.date.isoformat(), 'completed_at': item.completed_at.isoformat()}
+                for item in page
+            ],
+            'next_cursor': next_cursor,
+        })
+    return render(request, 'main/archive.html', {
+        'items': page, 'next_cursor': next_cursor, 'query': query, 'kind': kind, 'kinds': ArchivedItem.KIND_CHOICES,
+    })
+
+@login_required(login_url='/login/')
+def search_page(request):
+    # Ranked title search over todos, reminders, expenses and schedule items (main/search.py)
+    query = request.GET.get('q', '').strip()
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), SEARCH_MAX_PAGE)
+    except ValueError:
+        page = 1
+    results, has_next = search.search(request.user, query, page, SEARCH_PAGE_SIZE) if query else ([], False)
+    has_next = has_next and page < SEARCH_MAX_PAGE
+
+    if _wants_json(request):
+        return JsonResponse({
+            'query': query, 'page': page, 'has_next': has_next,
+            'results': [{**result, 'date': result['date'].isoformat()} for result in results],
+        })
+    return render(request, 'main/search.html', {'query': query, 'results': results, 'page': page, 'has_next': has_next})
 
 # Expenses -------------------------------------------------------------------------------------------------------------------------------
 @login_required(login_url='/login/')
@@ -104,12 +359,8 @@ def expenses_page(request):
     expenses = Expense.objects.filter(user=request.user, date__year=current_year, date__month=current_month).order_by('-date')
 
     spendable = budget_obj.spendable_budget() # Income - Savings Goal (create monthly budger)
-    total_spent = expenses.aggregate(Sum('amount'))['amount__sum'] or 0 # sum all spending 
-    
-    category_totals = {}
-    for expense in expenses:
-        cat = expense.get_category_display()
-        category_totals[cat] = category_totals.get(cat, 0) + float(expense.amount)
+    category_totals = rollups.category_totals(request.user, current_year, current_month)
+    total_spent = sum(category_totals.values()) # sum all spending 
 
     context = {
         'budget': budget_obj,
@@ -119,14 +370,161 @@ def expenses_page(request):
         'remaining': int(spendable - total_spent), # Calc leftover cash
         'budget_form': MonthlyBudgetForm(instance=budget_obj), # Link form to record
         'expense_form': ExpenseForm(initial={'date': date(current_year, current_month, 1)}), # Default to month start
+        'import_form': ExpenseImportForm(),
         'month_name': date(current_year, current_month, 1).strftime('%B'),
         'current_year': current_year, 'current_month': current_month,
         'chart_labels': list(category_totals.keys()),
-        'chart_data': list(category_totals.values()),
+        'chart_data': [float(total) for total in category_totals.values()],
     }
     return render(request, 'main/expenses.html', context)
 
+# Analytics ------------------------------------------------------------------------------------------------------------------------------
+def _analytics_range(request):
+    # (start, end) as (year, month) from ?start=YYYY-MM&end=YYYY-MM, default the last 12 months
+    def parse(value, default):
+        try:
+            parsed = datetime.strptime(value or '', '%Y-%m')
+            return parsed.year, parsed.month
+        except ValueError:
+            return default
+    now = timezone.now()
+    end = parse(request.GET.get('end'), (now.year, now.month))
+    default_start = (end[0] - 1, end[1] + 1) if end[1] < 12 else (end[0], 1)
+    start = min(parse(request.GET.get('start'), default_start), end)
+    if (end[0] - start[0]) * 12 + end[1] - start[1] >= ANALYTICS_MAX_MONTHS: # Clamp very long ranges
+        months = end[0] * 12 + end[1] - ANALYTICS_MAX_MONTHS # Zero-based month index of the new start
+        start = (months // 12, months % 12 + 1)
+    return start, end
+
+def _spending_analytics(user, start, end):
+    # One rollup query plus one budget query, whatever the length of the range
+    totals = rollups.monthly_totals(user, start, end)
+    budgets = {
+        (budget.year, budget.month): budget.spendable_budget()
+        for budget in MonthlyBudget.objects.filter(user=user, year__gte=start[0], year__lte=end[0])
+    }
+    months = []
+    for year, month in rollups.month_range(start, end):
+        categories = totals.get((year, month), {})
+        spent = sum(categories.values())
+        budget = budgets.get((year, month))
+        months.append({
+            'month': f'{year}-{month:02d}',
+            'categories': {label: float(total) for label, total in categories.items()},
+            'total': float(spent),
+            'budget': float(budget) if budget is not None else None, # Income - savings goal
+            'remaining': float(budget - spent) if budget is not None else None,
+        })
+    return months
+
+@login_required(login_url='/login/')
+def analytics_page(request):
+    start, end = _analytics_range(request)
+    context = {
+        'months': _spending_analytics(request.user, start, end),
+        'categories': [label for _, label in Expense.CATEGORY_CHOICES],
+        'start': f'{start[0]}-{start[1]:02d}',
+        'end': f'{end[0]}-{end[1]:02d}',
+    }
+    return render(request, 'main/analytics.html', context)
+
+@login_required(login_url='/login/')
+def analytics_api(request):
+    start, end = _analytics_range(request)
+    return JsonResponse({
+        'start': f'{start[0]}-{start[1]:02d}',
+        'end': f'{end[0]}-{end[1]:02d}',
+        'months': _spending_analytics(request.user, start, end),
+    })
+
+# Scheduling -----------------------------------------------------------------------------------------------------------------------------
+def _parse_time(value):
+    return datetime.strptime(value, '%H:%M').time()
+
+def _event_json(event):
+    return {
+        'id': None if getattr(event, 'is_recurring', False) else event.pk,
+        'rule_id': getattr(event, 'rule_id', None),
+        'title': event.title,
+        'date': event.date.isoformat(),
+        'start_time': event.start_time.strftime('%H:%M'),
+        'end_time': event.end_time.strftime('%H:%M'),
+    }
+
+@login_required(login_url='/login/')
+def schedule_conflicts(request):
+    try:
+        day = datetime.strptime(request.GET['date'], '%Y-%m-%d').date()
+        start, end = _parse_time(request.GET['start']), _parse_time(request.GET['end'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("date (YYYY-MM-DD), start and end (HH:MM) are required")
+    exclude = request.GET.get('exclude', '')
+    events = scheduling.conflicts(request.user, day, start, end, exclude=int(exclude) if exclude.isdigit() else None)
+    return JsonResponse({'conflicts': [_event_json(event) for event in events]})
+
+@login_required(login_url='/login/')
+def free_slots(request):
+    try:
+        start_date = _planner_date(request.GET.get('start'))
+        days = int(request.GET.get('days', 1))
+        day_start = _parse_time(request.GET.get('from', '00:00'))
+        day_end = _parse_time(request.GET['to']) if request.GET.get('to') else None # Default runs to midnight
+        min_minutes = int(request.GET.get('min', 0))
+    except ValueError:
+        return HttpResponseBadRequest("Invalid free slot parameters")
+    if not 1 <= days <= FREE_SLOTS_MAX_DAYS:
+        return HttpResponseBadRequest(f"days must be between 1 and {FREE_SLOTS_MAX_DAYS}")
+    slots = scheduling.free_slots(
+        request.user, start_date, start_date + timedelta(days=days - 1), day_start, day_end, min_minutes
+    )
+    return JsonResponse({'slots': [
+        {'start': begin.isoformat(), 'end': finish.isoformat(), 'minutes': int((finish - begin).total_seconds() // 60)}
+        for begin, finish in slots
+    ]})
+
 # Add, Delete, toggle --------------------------------------------------------------------------------------------------------------------
+def _completion_stamp(field, value):
+    # completed_at for a completion flag UPDATE: stamped when an open row completes, kept on repeats, cleared on reopen
+    opened = When(**{field: False}, then=Value(timezone.now()))
+    if value is None: # Flip, the CASE reads the flag as it was before the UPDATE
+        return Case(opened, default=Value(None), output_field=DateTimeField())
+    return Case(opened, default=F('completed_at'), output_field=DateTimeField()) if value else None
+
+def _flip(rows, changes, field):
+    # Flip and read the new flag back in one transaction, None when no row matched
+    with transaction.atomic():
+        return rows.values_list(field, flat=True).first() if rows.update(**changes) else None
+
+def _toggle(request, model, pk, field):
+    # Single conditional UPDATE, an explicit value=true/false sets the state so two tabs can't undo each other
+    rows = model.objects.filter(pk=pk, user=request.user)
+    value = request.POST.get('value', request.GET.get('value'))
+    if value in ('true', 'false'):
+        value = value == 'true'
+        changes = {field: value}
+    else:
+        value = None
+        changes = {field: ~F(field)} # SET field = NOT field
+    if model in (Todo, Reminder):
+        changes['completed_at'] = _completion_stamp(field, value) # Archival age
+    if model in sync.KINDS:
+        changes['updated_at'] = timezone.now() # auto_now only runs on save()
+    if value is None:
+        state = _flip(rows, changes, field) # Flips report the state they ended in
+    else:
+        state = value if rows.update(**changes) else None
+    if state is None:
+        raise Http404
+    if model is Reminder:
+        notifications.record_changes([pk]) # Lets the reminder scheduler re-arm reopened deadlines
+    transaction.on_commit(lambda: caching.bump_user_version(request.user.pk)) # update() skips model signals
+    events.publish(request.user.pk, model._meta.model_name, 'toggled', id=pk, value=state)
+
+    if _wants_json(request):
+        return JsonResponse({'id': pk, field: state})
+    referer = request.META.get('HTTP_REFERER') # Get previous page URL
+    return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
+
 @login_required(login_url='/login/')
 def add_schedule_event(request):
     date_str = request.POST.get('view_date')
@@ -143,36 +541,54 @@ def add_schedule_event(request):
                 messages.error(request, "End time must be after start time.") # Validate duration
                 return redirect('planner_page', date_str=date_str)
 
+            day = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
+            clashes = scheduling.conflicts(request.user, day, start_t, end_t)
+            if clashes: # Saved anyway, but never silently
+                messages.warning(request, "Overlaps with " + ", ".join(
+                    f"{clash.title} ({clash.start_time:%H:%M}-{clash.end_time:%H:%M})" for clash in clashes
+                ))
+
+        if request.POST.get('frequency'):
+            rule_form = ScheduleRuleForm(request.POST)
+            if rule_form.is_valid():
+                rule = rule_form.save(commit=False)
+                rule.user = request.user
+                rule.start_date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
+                rule.save() # Occurrences are expanded when a window is rendered
+                events.publish(request.user.pk, 'schedulerule', 'added', id=rule.pk)
+            else:
+                messages.error(request, "Could not save the repeating event.")
+            return redirect('planner_page', date_str=date_str if date_str else timezone.now().strftime('%Y-%m-%d'))
+
         form = ScheduleItemForm(request.POST)
         if form.is_valid(): 
             item = form.save(commit=False) # Hold save for manual fields
             item.user = request.user 
             item.date = datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
             item.save() # Commit to DB
+            events.publish(request.user.pk, 'scheduleitem', 'added', id=item.pk)
         else:
             if title and start_str and end_str:
-                ScheduleItem.objects.create(
+                item = ScheduleItem.objects.create(
                     user=request.user,
                     title=title,
                     start_time=start_str,
                     end_time=end_str,
                     date=datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else timezone.now().date()
                 )
+                events.publish(request.user.pk, 'scheduleitem', 'added', id=item.pk)
                 
     return redirect('planner_page', date_str=date_str if date_str else timezone.now().strftime('%Y-%m-%d'))
 
 @login_required(login_url='/login/')
 def toggle_reminder(request, pk):
-    reminder = get_object_or_404(Reminder, pk=pk, user=request.user)
-    reminder.is_completed = not reminder.is_completed 
-    reminder.save()
-    referer = request.META.get('HTTP_REFERER') # Get previous page URL
-    return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
+    return _toggle(request, Reminder, pk, 'is_completed')
 
 @login_required(login_url='/login/')
 def delete_reminder(request, pk):
     reminder = get_object_or_404(Reminder, pk=pk, user=request.user)
     reminder.delete() # Remove from DB
+    events.publish(request.user.pk, 'reminder', 'deleted', id=pk)
     referer = request.META.get('HTTP_REFERER')
     return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
 
@@ -185,6 +601,7 @@ def add_reminder(request):
             reminder = form.save(commit=False)
             reminder.user = request.user # Link to current user
             reminder.save()
+            events.publish(request.user.pk, 'reminder', 'added', id=reminder.pk)
     return redirect('planner_page', date_str=date_str)
 
 @login_required(login_url='/login/')
@@ -195,27 +612,47 @@ def add_todo(request):
         if form.is_valid(): 
             todo = form.save(commit=False)
             todo.user = request.user
-            todo.created_time = datetime.strptime(date_str, '%Y-%m-%d') # Tag to specific date
+            todo.planned_date = datetime.strptime(date_str, '%Y-%m-%d').date() # Tag to specific date
             todo.save()
+            events.publish(request.user.pk, 'todo', 'added', id=todo.pk)
     return redirect('planner_page', date_str=date_str)
 
+@login_required(login_url='/login/')
+def read_notification(request, pk):
+    return _toggle(request, Notification, pk, 'read')
+
 @login_required(login_url='/login/')
 def toggle_todo(request, pk):
-    todo = get_object_or_404(Todo, pk=pk, user=request.user)
-    todo.done = not todo.done # Mark complete/incomplete
-    todo.save()
-    referer = request.META.get('HTTP_REFERER')
-    return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
+    return _toggle(request, Todo, pk, 'done') # Mark complete/incomplete
 
 @login_required(login_url='/login/')
 def delete_todo(request, pk):
     get_object_or_404(Todo, pk=pk, user=request.user).delete() 
+    events.publish(request.user.pk, 'todo', 'deleted', id=pk)
     referer = request.META.get('HTTP_REFERER')
     return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
 
 @login_required(login_url='/login/')
 def delete_schedule_event(request, pk):
     get_object_or_404(ScheduleItem, pk=pk, user=request.user).delete()
+    events.publish(request.user.pk, 'scheduleitem', 'deleted', id=pk)
+    referer = request.META.get('HTTP_REFERER')
+    return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
+
+@login_required(login_url='/login/')
+def skip_occurrence(request, pk, date_str):
+    rule = get_object_or_404(ScheduleRule, pk=pk, user=request.user)
+    day = _planner_date(date_str)
+    ScheduleException.objects.get_or_create(rule=rule, date=day) # Cancel just this day
+    transaction.on_commit(lambda: caching.bump_user_version(request.user.pk))
+    events.publish(request.user.pk, 'schedulerule', 'skipped', id=pk, date=day)
+    referer = request.META.get('HTTP_REFERER')
+    return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=day.strftime('%Y-%m-%d'))
+
+@login_required(login_url='/login/')
+def delete_schedule_rule(request, pk):
+    get_object_or_404(ScheduleRule, pk=pk, user=request.user).delete() # Whole series, exceptions cascade
+    events.publish(request.user.pk, 'schedulerule', 'deleted', id=pk)
     referer = request.META.get('HTTP_REFERER')
     return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
 
@@ -226,17 +663,148 @@ def add_expense(request):
         if form.is_valid():
             expense = form.save(commit=False)
             expense.user = request.user
-            expense.save()
+            with transaction.atomic(): # Expense row and its rollup commit together
+                expense.save()
+            events.publish(
+                request.user.pk, 'expense', 'added', id=expense.pk, amount=expense.amount,
+                category=expense.get_category_display(), date=expense.date,
+            )
             return redirect(f'/expenses/?year={expense.date.year}&month={expense.date.month}') # Redirect to correct month
     return redirect('expenses')
 
+@login_required(login_url='/login/')
+@require_POST
+def import_expenses_upload(request):
+    form = ExpenseImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, "Choose a CSV file to import.")
+        return redirect('expenses')
+
+    errors = []
+    def on_error(row_number, row, row_errors):
+        if len(errors) < IMPORT_ERRORS_SHOWN: # Keep memory flat for files full of bad rows
+            errors.append(f"Row {row_number}: {format_errors(row_errors)}")
+
+    lines = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='') # Decode while streaming
+    try:
+        result = import_expenses(
+            request.user, lines, batch_size=settings.IMPORT_BATCH_SIZE,
+            start_row=form.cleaned_data['start_row'] or 0, on_error=on_error,
+        )
+    except ValueError as exc: # Missing columns or undecodable bytes
+        messages.error(request, f"Import stopped: {exc}")
+        return redirect('expenses')
+
+    messages.success(request, f"Imported {result.imported} expenses, rejected {result.rejected} of {result.last_row} rows.")
+    if result.imported:
+        events.publish(request.user.pk, 'expense', 'imported', count=result.imported)
+    for error in errors:
+        messages.error(request, error)
+    return redirect('expenses')
+
 @login_required(login_url='/login/')
 def delete_expense(request, pk):
     exp = get_object_or_404(Expense, pk=pk, user=request.user)
     y, m = exp.date.year, exp.date.month # Store date for redirect before delete
-    exp.delete()
+    with transaction.atomic():
+        exp.delete()
+    events.publish(request.user.pk, 'expense', 'deleted', id=pk)
     return redirect(f'/expenses/?year={y}&month={m}')
 
+# Export ---------------------------------------------------------------------------------------------------------------------------------
+@login_required(login_url='/login/')
+def export_data(request):
+    fmt = request.GET.get('format', 'csv')
+    names = request.GET.getlist('model') or (['expenses'] if fmt == 'csv' else list(EXPORT_MODELS))
+    if fmt not in EXPORT_FORMATS or any(name not in EXPORT_MODELS for name in names):
+        return HttpResponseBadRequest("Unknown export format or model.")
+    if fmt == 'csv' and len(names) != 1:
+        return HttpResponseBadRequest("CSV exports one model at a time, use NDJSON for several.")
+    try:
+        start, end = (
+            datetime.strptime(request.GET[key], '%Y-%m-%d').date() if request.GET.get(key) else None
+            for key in ('start', 'end')
+        )
+    except ValueError:
+        return HttpResponseBadRequest("Dates must be YYYY-MM-DD.")
+    gzip = request.GET.get('gzip') in ('1', 'true')
+
+    response = StreamingHttpResponse(
+        export_stream(request.user, fmt, names, start, end, gzip=gzip),
+        content_type='application/gzip' if gzip else ('text/csv' if fmt == 'csv' else 'application/x-ndjson'),
+    )
+    filename = f"lifetracker-{'-'.join(names) if fmt == 'csv' else 'data'}.{fmt}{'.gz' if gzip else ''}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# Bulk actions ---------------------------------------------------------------------------------------------------------------------------
+BULK_MODELS = {
+    'todo': (Todo, 'done'), # Completion flag per model, None when the model has none
+    'reminder': (Reminder, 'is_completed'),
+    'schedule': (ScheduleItem, None),
+}
+BULK_OPERATIONS = ('complete', 'uncomplete', 'delete', 'move')
+
+def _bulk_apply(user, model, flag, ids, op, move_date):
+    # One user-scoped UPDATE/DELETE for the owned ids, returns {id: result}
+    rows = model.objects.filter(user=user, pk__in=ids)
+    if op in ('complete', 'uncomplete') and flag is None:
+        return {pk: 'unsupported' for pk in ids}
+
+    if model is Reminder and op == 'move':
+        reminders = list(rows.only('id', 'due_date'))
+        now = timezone.now()
+        for reminder in reminders: # Keep each reminder's time of day
+            local_due = timezone.localtime(reminder.due_date)
+            reminder.due_date = timezone.make_aware(datetime.combine(move_date, local_due.time()))
+            reminder.updated_at = now
+        Reminder.objects.bulk_update(reminders, ['due_date', 'updated_at']) # Single UPDATE ... CASE
+        found = {reminder.pk for reminder in reminders}
+        search.redate(Reminder, found, move_date)
+    else:
+        found = set(rows.values_list('pk', flat=True))
+        rows = model.objects.filter(pk__in=found)
+        if op == 'delete':
+            rows.delete()
+        elif op == 'move':
+            rows.update(**{'planned_date' if model is Todo else 'date': move_date, 'updated_at': timezone.now()})
+            search.redate(model, found, move_date)
+        else:
+            rows.update(**{flag: op == 'complete', 'completed_at': _completion_stamp(flag, op == 'complete'),
+                           'updated_at': timezone.now()})
+    if model is Reminder and op != 'delete': # Deletes are journalled by the model signals
+        notifications.record_changes(found)
+    return {pk: 'ok' if pk in found else 'not_found' for pk in ids}
+
+@login_required(login_url='/login/')
+@require_POST
+def bulk_action(request):
+    op = request.POST.get('op')
+    if op not in BULK_OPERATIONS:
+        return JsonResponse({'error': f"Unknown operation '{op}'."}, status=400)
+    move_date = None
+    if op == 'move':
+        try:
+            move_date = datetime.strptime(request.POST.get('date', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'error': "Moving needs a date in YYYY-MM-DD format."}, status=400)
+
+    results = {}
+    with transaction.atomic():
+        for name, (model, flag) in BULK_MODELS.items():
+            ids = [int(pk) for pk in request.POST.getlist(f'{name}_ids') if pk.isdigit()]
+            if ids:
+                results[name] = _bulk_apply(request.user, model, flag, ids, op, move_date)
+        transaction.on_commit(lambda: caching.bump_user_version(request.user.pk))
+    events.publish(request.user.pk, 'bulk', op, results=results)
+
+    if _wants_json(request):
+        return JsonResponse({'op': op, 'results': results})
+    done = sum(result == 'ok' for model_results in results.values() for result in model_results.values())
+    messages.success(request, f"{op.capitalize()}: {done} item{'s' if done != 1 else ''} updated.")
+    referer = request.META.get('HTTP_REFERER')
+    return HttpResponseRedirect(referer) if referer else redirect('planner_page', date_str=timezone.now().strftime('%Y-%m-%d'))
+
 @login_required(login_url='/login/')
 def update_budget(request):
     if request.method == "POST":
@@ -244,6 +812,8 @@ def update_budget(request):
         month = request.POST.get('month')
         budget = get_object_or_404(MonthlyBudget, user=request.user, year=year, month=month)
         form = MonthlyBudgetForm(request.POST, instance=budget) 
-        if form.is_valid(): form.save()
+        if form.is_valid():
+            form.save()
+            events.publish(request.user.pk, 'budget', 'updated', year=budget.year, month=budget.month)
         return redirect(f'/expenses/?year={year}&month={month}')
     return redirect('expenses')
\ No newline at end of file
@@ -0,0 +1,47 @@
+/* Live updates: apply the user's change events from /events/ to the open page instead of reloading it */
+(() => {
+    const url = document.currentScript.dataset.url;
+    if (!window.EventSource || !document.querySelector('[data-live], [data-item]')) return;
+    let refreshTimer = null;
+
+    /* Fetch this page again (the dashboard comes from the per-user cache) and swap in every live region */
+    async function refreshRegions() {
+        const response = await fetch(window.location.href);
+        if (!response.ok) return;
+        const fresh = new DOMParser().parseFromString(await response.text(), 'text/html');
+        document.querySelectorAll('[data-live]').forEach((region) => {
+            const replacement = fresh.querySelector(`[data-live="${region.dataset.live}"]`);
+            if (replacement) region.innerHTML = replacement.innerHTML;
+        });
+        document.dispatchEvent(new CustomEvent('live:refreshed'));
+    }
+
+    function scheduleRefresh() {
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(refreshRegions, 300); // Coalesce bursts such as bulk actions and imports
+    }
+
+    /* Patch items already on the page, returns false when the event needs a region refresh instead */
+    function patch(event) {
+        const items = document.querySelectorAll(`[data-item="${event.model}-${event.id}"]`);
+        if (!items.length) return false;
+        if (event.action === 'deleted' || (event.model === 'notification' && event.value)) {
+            items.forEach((item) => item.remove());
+            return event.action !== 'deleted'; // Totals and short lists still need the refresh
+        }
+        if (event.action !== 'toggled') return false;
+        items.forEach((item) => {
+            item.classList.toggle('is-done', event.value);
+            const link = item.matches('[data-toggle]') ? item : item.querySelector('[data-toggle]');
+            if (link) link.dataset.value = String(event.value);
+            const mark = item.querySelector('[data-mark]');
+            if (mark) mark.textContent = event.value ? '●' : '○';
+        });
+        return true;
+    }
+
+    const source = new EventSource(url);
+    source.onmessage = (message) => {
+        if (!patch(JSON.parse(message.data))) scheduleRefresh();
+    };
+})();